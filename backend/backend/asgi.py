@@ -0,0 +1,18 @@
+"""
+ASGI config for backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+# Установка переменной окружения для настроек Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+# Создание ASGI-приложения (потоковые ответы, в том числе поток изменений дашборда)
+application = get_asgi_application()
\ No newline at end of file
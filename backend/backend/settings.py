@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 
@@ -18,19 +19,39 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
+def env_bool(name, default=False):
+    """Читает логический флаг из переменной окружения (1/true/yes/on)."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default=''):
+    """Читает список значений через запятую из переменной окружения."""
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
 # Секретный ключ для production не должен быть公开
-SECRET_KEY = 'django-insecure-___________________________________v=<KEY>'
+SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-___________________________________v=<KEY>')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-# Включение режима отладки (только для разработки)
-DEBUG = True
+# Включение режима отладки (только для разработки, в production DEBUG=0)
+DEBUG = env_bool('DEBUG', True)
+
+# WhiteNoise обязателен в production; при разработке без установленного
+# пакета статические файлы раздает runserver (django.contrib.staticfiles)
+USE_WHITENOISE = not DEBUG or importlib.util.find_spec('whitenoise') is not None
 
-# Разрешенные хосты для подключения к приложению
-ALLOWED_HOSTS = []
+# Разрешенные хосты для подключения к приложению (через запятую)
+ALLOWED_HOSTS = env_list('ALLOWED_HOSTS')
+
+# Доверенные источники для CSRF за обратным прокси (https://example.com)
+CSRF_TRUSTED_ORIGINS = env_list('CSRF_TRUSTED_ORIGINS')
 
 
 # Application definition
@@ -48,6 +69,12 @@ INSTALLED_APPS = [
 # Список промежуточного ПО (middleware)
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Метрики запросов (Server-Timing, /metrics/ в формате Prometheus)
+    'dashboard.middleware.RequestMetricsMiddleware',
+    # Сжатие JSON-ответов brotli/gzip по Accept-Encoding
+    'dashboard.middleware.ResponseCompressionMiddleware',
+    # Раздача статических файлов в production (сжатые копии, долгий кэш)
+    *(['whitenoise.middleware.WhiteNoiseMiddleware'] if USE_WHITENOISE else []),
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,7 +89,8 @@ ROOT_URLCONF = 'backend.urls'
 # Настройки шаблонов
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с учетом времени рендеринга в метриках запросов
+        'BACKEND': 'dashboard.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'frontend/templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,17 +107,141 @@ TEMPLATES = [
 # WSGI-приложение
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# ASGI-приложение (uvicorn/daphne: backend.asgi:application)
+ASGI_APPLICATION = 'backend.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
-# Настройки базы данных (по умолчанию используется SQLite для разработки)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Настройки базы данных (по умолчанию используется SQLite для разработки,
+# DB_ENGINE=postgresql - PostgreSQL с параметрами из переменных POSTGRES_*)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+# Пул соединений на стороне сервера: DB_POOL=pgbouncer - подключение через
+# PgBouncer (режим transaction) вместо прямого подключения к PostgreSQL
+DB_POOL = os.environ.get('DB_POOL', '')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'isdr'),
+            'USER': os.environ.get('POSTGRES_USER', 'user'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        }
+    }
+    if DB_POOL == 'pgbouncer':
+        DATABASES['default'].update({
+            'HOST': os.environ.get('PGBOUNCER_HOST', 'pgbouncer'),
+            'PORT': os.environ.get('PGBOUNCER_PORT', '6432'),
+            # Именованные курсоры (QuerySet.iterator) не переживают смену
+            # серверного соединения между транзакциями
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+        })
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Ожидание блокировки записи (секунды), задает PRAGMA busy_timeout
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+        }
     }
+
+# Время жизни соединения в секундах: 0 - новое соединение на каждый запрос,
+# none - без ограничения. Под ASGI (воркеры uvicorn) соединения привязаны к
+# потоку запроса и не переиспользуются, поэтому там используйте DB_POOL.
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '0')
+DATABASES['default']['CONN_MAX_AGE'] = (
+    None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+)
+
+# Проверка постоянного соединения перед первым запросом в каждом запросе
+# (разорванное соединение заменяется новым, а не приводит к ошибке)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env_bool('DB_CONN_HEALTH_CHECKS', True)
+
+# Режим производительности SQLite: PRAGMA при каждом открытии соединения
+# (см. dashboard/database.py). SQLITE_TUNING=0 оставляет настройки SQLite
+# по умолчанию.
+SQLITE_TUNING = env_bool('SQLITE_TUNING', True)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Отрицательное значение - размер кэша страниц в КиБ
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+# SQLITE_READ_REPLICA=1 - второе подключение к тому же файлу только для
+# чтения; представления чтения направляются на него маршрутизатором
+if DB_ENGINE != 'postgresql' and env_bool('SQLITE_READ_REPLICA', False):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': Path(DATABASES['default']['NAME']).resolve().as_uri() + '?mode=ro',
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['dashboard.database.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# default - кэш процесса для ответов дашборда (ключи содержат штамп версии
+# данных). shared - общий для всех процессов кэш штампов версий данных и
+# последних дат: Redis при заданном REDIS_URL (нужен пакет redis), иначе
+# таблица базы данных (создается командой createcachetable)
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'dashboard',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'dashboard_cache',
+    },
 }
 
+# Время жизни закэшированных ответов и последних дат дашборда (секунды)
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Время, на которое процесс запоминает штампы версий и последние даты из
+# общего кэша (секунды): изменения данных видны другим процессам с такой
+# задержкой, зато обычный запрос не обращается к общему кэшу
+DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT = float(os.environ.get('DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT', 2))
+
+# Аналитический куб KPI в памяти процесса (dashboard/cube.py, нужен numpy):
+# карточки и графики дашборда считаются без запросов к агрегатам
+KPI_CUBE = env_bool('KPI_CUBE', False)
+
+# Наибольшее количество точек в рядах графиков по датам (dashboard/charts.py):
+# длинные периоды строятся по неделям или месяцам и прореживаются
+CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS', 120))
+
+# Сжатие JSON-ответов (dashboard/middleware.py); выключите, если ответы
+# сжимает обратный прокси
+RESPONSE_COMPRESSION = env_bool('RESPONSE_COMPRESSION', True)
+
+# Метрики запросов (dashboard/metrics.py): время ответа - для всех запросов,
+# SQL и шаблоны - для доли REQUEST_METRICS_SAMPLE_RATE. Текст самого долгого
+# SQL-запроса попадает в Server-Timing только с REQUEST_METRICS_QUERY_TEXT=1.
+# /metrics/ доступен персоналу или по заголовку Authorization: Bearer <токен>
+REQUEST_METRICS = env_bool('REQUEST_METRICS', True)
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 0.1))
+REQUEST_METRICS_QUERY_TEXT = env_bool('REQUEST_METRICS_QUERY_TEXT', False)
+REQUEST_METRICS_TOKEN = os.environ.get('REQUEST_METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -130,6 +282,24 @@ STATICFILES_DIRS = [
     BASE_DIR / 'frontend' / 'static',
 ]
 
+# Каталог collectstatic для production
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# В production имена статических файлов содержат хэш содержимого, рядом
+# лежат сжатые gzip/brotli копии, а WhiteNoise отдает их с кэшем на год
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage'
+            if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 # Тип поля по умолчанию для первичных ключей
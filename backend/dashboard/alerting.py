@@ -0,0 +1,188 @@
+"""
+Проверка правил уведомлений (AlertRule) по записям KPI.
+
+Правила группируются по показателю. Для каждого показателя выполняется
+один запрос: условия всех его правил объединяются через OR, и база данных
+возвращает только записи, на которых сработало хотя бы одно правило. Какие
+именно правила сработали, определяется по уже выбранному значению без
+дополнительных запросов. Срабатывания сохраняются в AlertEvent пакетной
+вставкой; пара (правило, запись) уникальна, поэтому повторная проверка тех
+же дат не создает дубликатов.
+
+В инкрементальном режиме каждое правило проверяет только записи, измененные
+после его контрольной точки (AlertRule.checked_until - время изменения
+KPIRecord.updated_at последней проверенной записи), поэтому время проверки
+зависит от объема новых и обновленных данных, а не от размера таблицы.
+Время изменения назначается до фиксации транзакции записи, и запись может
+стать видимой уже после проверки более поздних записей. Поэтому записи за
+ALERT_CHECKPOINT_WINDOW до контрольной точки проверяются повторно, а
+дубликаты событий отбрасывает уникальный индекс (правило, запись). При
+изменении условия правила его контрольная точка сбрасывается (см.
+signals.py), и заново проверяется только это правило.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import operator
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import AlertEvent, AlertRule, KPIRecord
+
+
+# Поле KPIRecord для каждого показателя правила
+ALERT_INDICATOR_FIELDS = {
+    'downtime': 'downtime_hours',
+    'defect_rate': 'defect_rate',
+    'equipment_load': 'equipment_load',
+    'output': 'output',
+    'inventory_level': 'inventory_level',
+    'plan_completion': 'plan_completion',
+    'quality_index': 'quality_index',
+}
+
+# Условие правила: поиск Django и функция сравнения
+ALERT_CONDITIONS = {
+    'gt': ('gt', operator.gt),
+    'lt': ('lt', operator.lt),
+    'gte': ('gte', operator.ge),
+    'lte': ('lte', operator.le),
+    'eq': ('exact', operator.eq),
+}
+
+# Размер пакета вставки событий и чтения записей
+ALERT_BATCH_SIZE = 2000
+
+# Окно повторной проверки перед контрольной точкой: транзакции записи,
+# зафиксированные позже предыдущей проверки, и расхождение часов процессов
+ALERT_CHECKPOINT_WINDOW = timedelta(minutes=5)
+
+
+def rule_condition(rule):
+    """
+    Возвращает условие фильтра KPIRecord, при котором срабатывает правило.
+
+    Args:
+        rule (AlertRule): Правило уведомления
+
+    Returns:
+        Q: Условие по полю показателя
+    """
+    field = ALERT_INDICATOR_FIELDS[rule.indicator]
+    lookup, _ = ALERT_CONDITIONS[rule.condition]
+    return Q(**{f'{field}__{lookup}': rule.threshold})
+
+
+def rule_matches(rule, value):
+    """Проверяет значение показателя по условию правила."""
+    _, compare = ALERT_CONDITIONS[rule.condition]
+    return value is not None and compare(value, rule.threshold)
+
+
+def _rescan_from(rule):
+    """Возвращает время изменения, после которого правило проверяет записи заново."""
+    if rule.checked_until is None:
+        return None
+    return rule.checked_until - ALERT_CHECKPOINT_WINDOW
+
+
+def evaluate_alert_rules(rules=None, start_date=None, end_date=None, incremental=False):
+    """
+    Проверяет правила по записям KPI и сохраняет новые срабатывания.
+
+    Args:
+        rules (iterable): Правила для проверки (None - все правила)
+        start_date (date): Начало диапазона дат (None - с первой записи)
+        end_date (date): Конец диапазона дат (None - до последней записи)
+        incremental (bool): Проверять только записи, измененные после
+            контрольных точек правил, и сдвинуть контрольные точки
+
+    Returns:
+        dict: Количество проверенных правил, найденных срабатываний,
+        новых событий и время изменения последней проверенной записи
+    """
+    started = timezone.now()
+    rules = list(AlertRule.objects.all() if rules is None else rules)
+
+    rules_by_indicator = defaultdict(list)
+    for rule in rules:
+        if rule.indicator in ALERT_INDICATOR_FIELDS and rule.condition in ALERT_CONDITIONS:
+            rules_by_indicator[rule.indicator].append(rule)
+
+    records = KPIRecord.objects.order_by()
+    if start_date is not None:
+        records = records.filter(date__gte=start_date)
+    if end_date is not None:
+        records = records.filter(date__lte=end_date)
+
+    # Снимок последнего изменения: записи, измененные во время проверки, войдут в следующий запуск
+    high_water = None
+    if incremental:
+        high_water = KPIRecord.objects.aggregate(last=Max('updated_at'))['last']
+        if high_water is None:
+            rules_by_indicator.clear()
+        else:
+            records = records.filter(updated_at__lte=high_water)
+
+    matches = 0
+    events = []
+    for indicator, indicator_rules in rules_by_indicator.items():
+        field = ALERT_INDICATOR_FIELDS[indicator]
+        rescan_from = {rule.id: _rescan_from(rule) if incremental else None for rule in indicator_rules}
+
+        indicator_records = records
+        condition = Q()
+        for rule in indicator_rules:
+            if rescan_from[rule.id] is not None:
+                condition |= rule_condition(rule) & Q(updated_at__gt=rescan_from[rule.id])
+            else:
+                condition |= rule_condition(rule)
+
+        # Диапазон по индексу времени изменения от самой ранней контрольной точки показателя
+        if None not in rescan_from.values():
+            indicator_records = records.filter(updated_at__gt=min(rescan_from.values()))
+
+        rows = (
+            indicator_records.filter(condition)
+            .values_list('id', 'shop_id', 'date', 'updated_at', field)
+            .iterator(chunk_size=ALERT_BATCH_SIZE)
+        )
+        for record_id, shop_id, day, updated_at, value in rows:
+            for rule in indicator_rules:
+                if rescan_from[rule.id] is not None and updated_at <= rescan_from[rule.id]:
+                    continue
+                if not rule_matches(rule, value):
+                    continue
+                matches += 1
+                events.append(AlertEvent(
+                    rule_id=rule.id,
+                    record_id=record_id,
+                    shop_id=shop_id,
+                    date=day,
+                    value=value,
+                    threshold=rule.threshold,
+                ))
+                if len(events) >= ALERT_BATCH_SIZE:
+                    AlertEvent.objects.bulk_create(events, ignore_conflicts=True)
+                    events = []
+
+    if events:
+        AlertEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+    # update() не вызывает сигналы AlertRule, поэтому контрольная точка не сбрасывается
+    rule_ids = [rule.id for rule in rules]
+    if incremental and rule_ids and high_water is not None:
+        AlertRule.objects.filter(id__in=rule_ids).update(
+            checked_until=high_water,
+            evaluated_at=timezone.now(),
+        )
+        for rule in rules:
+            rule.checked_until = high_water
+
+    return {
+        'rules': len(rules),
+        'matches': matches,
+        # Повторно найденные срабатывания окна не вставляются (ignore_conflicts)
+        'created': AlertEvent.objects.filter(rule_id__in=rule_ids, created_at__gte=started).count(),
+        'checked_until': high_water,
+    }
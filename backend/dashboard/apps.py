@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'dashboard'
\ No newline at end of file
+    name = 'dashboard'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (пересчет агрегатов KPI, PRAGMA SQLite,
+        # учет SQL-запросов в метриках)
+        from . import database, metrics, signals  # noqa: F401
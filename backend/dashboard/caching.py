@@ -0,0 +1,278 @@
+"""
+Кэширование служебных значений и ответов дашборда через кэш Django.
+
+Последние даты KPI и складских остатков нужны каждому представлению для
+расчета периода. Значения хранятся в кэше и сбрасываются при записи в
+соответствующие таблицы (сигналы и массовые загрузки), поэтому обычный
+запрос страницы не вычисляет их по таблицам данных.
+
+Для каждого источника данных хранится штамп версии. Он меняется при любой
+записи и входит в ключи закэшированных ответов и в ETag, поэтому старые
+ответы перестают использоваться без явного удаления. Штамп меняется после
+фиксации транзакции записи: до этого другие соединения видят прежние
+данные и не должны сохранять их ответы под новым штампом.
+
+Запись может выполнить любой процесс (воркер сервера, команда загрузки),
+поэтому штампы и последние даты хранятся в общем кэше 'shared' (Redis или
+таблица базы данных, см. CACHES), а сами ответы - в кэше процесса. Процесс
+запоминает прочитанные из общего кэша значения на
+DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT секунд, поэтому обычный запрос не
+обращается к общему кэшу. Последние даты хранятся под ключом со штампом
+версии и всегда соответствуют ему. Если таблица общего кэша не создана
+(createcachetable), процесс пишет предупреждение в журнал и хранит штампы
+в своем кэше.
+"""
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Max
+from django.utils.connection import ConnectionProxy
+
+from .models import InventoryRecord, KPIRecord
+
+
+logger = logging.getLogger(__name__)
+
+LATEST_DATE_MODELS = {
+    'kpi': KPIRecord,
+    'inventory': InventoryRecord,
+}
+
+# Признак пустой таблицы (None в кэше неотличим от промаха)
+_EMPTY = 'empty'
+
+# Общий для всех процессов кэш штампов версий и последних дат
+SHARED_CACHE_ALIAS = 'shared'
+shared_cache = ConnectionProxy(caches, SHARED_CACHE_ALIAS)
+
+# Результат проверки таблицы общего кэша (один раз на процесс)
+_shared_cache_ready = None
+
+_deferred = threading.local()
+
+
+def _check_shared_cache():
+    backend = caches[SHARED_CACHE_ALIAS]
+    if not isinstance(backend, DatabaseCache):
+        return True
+    connection = connections[router.db_for_write(backend.cache_model_class)]
+    try:
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+    except DatabaseError:
+        logger.warning('Не удалось проверить таблицу общего кэша %s', backend._table, exc_info=True)
+        return False
+    if backend._table in tables:
+        return True
+    logger.warning(
+        'Таблица общего кэша %s не создана (python manage.py createcachetable): '
+        'штампы версий данных хранятся в кэше процесса',
+        backend._table,
+    )
+    return False
+
+
+def _shared_backend():
+    """
+    Возвращает общий кэш или кэш процесса, если таблица общего кэша не создана.
+
+    Обращение к отсутствующей таблице прерывало бы транзакцию PostgreSQL,
+    поэтому таблица проверяется заранее.
+    """
+    global _shared_cache_ready
+    if _shared_cache_ready is None:
+        _shared_cache_ready = _check_shared_cache()
+    return shared_cache if _shared_cache_ready else cache
+
+
+def _local_key(key):
+    return f'dashboard:local:{key}'
+
+
+def _shared_get(key):
+    local_key = _local_key(key)
+    value = cache.get(local_key)
+    if value is None:
+        value = _shared_backend().get(key)
+        if value is not None:
+            cache.set(local_key, value, settings.DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT)
+    return value
+
+
+def _shared_set_many(values, timeout):
+    _shared_backend().set_many(values, timeout)
+    cache.set_many(
+        {_local_key(key): value for key, value in values.items()},
+        settings.DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT,
+    )
+
+
+def _latest_date_key(source, version):
+    return f'dashboard:latest_date:{source}:{version}'
+
+
+def get_latest_date(source):
+    """
+    Возвращает последнюю дату записей источника из кэша или базы данных.
+
+    Args:
+        source (str): Источник данных ('kpi' или 'inventory')
+
+    Returns:
+        date: Последняя дата или None, если записей нет
+    """
+    key = _latest_date_key(source, get_data_version(source))
+    cached = _shared_get(key)
+    if cached is not None:
+        return None if cached == _EMPTY else cached
+
+    model = LATEST_DATE_MODELS[source]
+    latest = model.objects.aggregate(latest=Max('date'))['latest']
+    _shared_set_many({key: _EMPTY if latest is None else latest}, settings.DASHBOARD_CACHE_TIMEOUT)
+    return latest
+
+
+def get_latest_kpi_date():
+    """Возвращает последнюю дату записей KPIRecord"""
+    return get_latest_date('kpi')
+
+
+def get_latest_inventory_date():
+    """Возвращает последнюю дату записей InventoryRecord"""
+    return get_latest_date('inventory')
+
+
+def _data_version_key(source):
+    return f'dashboard:data_version:{source}'
+
+
+def get_data_version(source):
+    """
+    Возвращает текущий штамп версии данных источника.
+
+    Штамп хранится в общем кэше без срока жизни, поэтому изменение данных в
+    одном процессе видно остальным не позже чем через
+    DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT секунд.
+
+    Args:
+        source (str): Источник данных ('kpi' или 'inventory')
+
+    Returns:
+        str: Штамп версии
+    """
+    key = _data_version_key(source)
+    version = _shared_get(key)
+    if version is None:
+        backend = _shared_backend()
+        backend.add(key, uuid.uuid4().hex[:12], None)
+        version = backend.get(key)
+        cache.set(_local_key(key), version, settings.DASHBOARD_SHARED_CACHE_LOCAL_TIMEOUT)
+    return version
+
+
+def mark_data_changed(*sources):
+    """
+    Отмечает изменение данных: меняет штампы версий (последние даты хранятся
+    под ключом со штампом и вычисляются заново).
+
+    Внутри транзакции изменение применяется после ее фиксации
+    (transaction.on_commit), вне транзакции - сразу.
+
+    Args:
+        *sources (str): Источники данных (без аргументов - все)
+    """
+    sources = sources or tuple(LATEST_DATE_MODELS)
+    pending = getattr(_deferred, 'sources', None)
+    if pending is not None:
+        pending.update(sources)
+        return
+    transaction.on_commit(lambda: _apply_data_changes(sources))
+
+
+def _apply_data_changes(sources):
+    _shared_set_many({_data_version_key(source): uuid.uuid4().hex[:12] for source in sources}, None)
+
+
+@contextmanager
+def deferred_data_changes():
+    """
+    Откладывает смену штампов версий до выхода из блока.
+
+    Массовое удаление записей вызывает обработчики post_delete для каждой
+    записи; внутри блока штамп каждого источника меняется один раз (после
+    фиксации транзакции, в которой выполняется блок).
+    """
+    if getattr(_deferred, 'sources', None) is not None:
+        yield
+        return
+
+    _deferred.sources = set()
+    try:
+        yield
+        sources = _deferred.sources
+    finally:
+        _deferred.sources = None
+    if sources:
+        mark_data_changed(*sources)
+
+
+def response_cache_key(namespace, source, params):
+    """
+    Формирует ключ кэша ответа по нормализованным параметрам и версии данных.
+
+    Args:
+        namespace (str): Имя закэшированного ответа
+        source (str): Источник данных, от которого зависит ответ
+        params (dict): Нормализованные параметры запроса
+
+    Returns:
+        str: Ключ кэша (он же используется как ETag)
+    """
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return f'dashboard:{namespace}:{get_data_version(source)}:{digest}'
+
+
+def cached_response_payload(cache_key, compose):
+    """
+    Возвращает закэшированные данные ответа, при промахе вычисляет их.
+
+    Args:
+        cache_key (str): Ключ из response_cache_key()
+        compose (callable): Функция расчета данных ответа
+
+    Returns:
+        dict: Данные ответа
+    """
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = compose()
+        cache.set(cache_key, payload, settings.DASHBOARD_CACHE_TIMEOUT)
+    return payload
+
+
+async def acached_response_payload(cache_key, compose):
+    """
+    Асинхронный вариант cached_response_payload().
+
+    Args:
+        cache_key (str): Ключ из response_cache_key()
+        compose (callable): Функция, возвращающая корутину расчета данных
+
+    Returns:
+        dict: Данные ответа
+    """
+    payload = await cache.aget(cache_key)
+    if payload is None:
+        payload = await compose()
+        await cache.aset(cache_key, payload, settings.DASHBOARD_CACHE_TIMEOUT)
+    return payload
@@ -0,0 +1,132 @@
+"""
+Ограничение количества точек в рядах графиков по датам.
+
+Гранулярность ряда (день, неделя, месяц) выбирается по длине диапазона
+дат: берется самая мелкая, при которой точек не больше лимита. Если и
+помесячный ряд длиннее лимита, он прореживается алгоритмом LTTB
+(Largest-Triangle-Three-Buckets): из каждого интервала оставляется точка,
+образующая наибольший треугольник с соседними, поэтому пики и провалы
+графика сохраняются.
+"""
+from datetime import date
+
+from django.conf import settings
+
+from .rollups import ROLLUP_GRAINS, bucket_start
+
+
+# Наименьший лимит точек, который может запросить клиент
+CHART_MIN_POINTS = 10
+
+# Знаков после запятой в дробных значениях графиков
+CHART_DIGITS = 1
+
+
+def chart_max_points(value=None):
+    """
+    Возвращает лимит точек графика.
+
+    Args:
+        value (str): Запрошенный лимит (параметр points); пустое или
+            некорректное значение - лимит по умолчанию
+
+    Returns:
+        int: Лимит в пределах от CHART_MIN_POINTS до CHART_MAX_POINTS
+    """
+    limit = getattr(settings, 'CHART_MAX_POINTS', 120)
+    if value is None or not str(value).isdigit():
+        return limit
+    return min(max(int(value), CHART_MIN_POINTS), limit)
+
+
+def bucket_count(start_date, end_date, grain):
+    """Возвращает количество интервалов гранулярности grain в диапазоне дат."""
+    if end_date < start_date:
+        return 0
+    if grain == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    span = (bucket_start(end_date, grain) - bucket_start(start_date, grain)).days
+    return span // 7 + 1 if grain == 'week' else span + 1
+
+
+def chart_grain(start_date, end_date, max_points=None, minimum='day'):
+    """
+    Выбирает гранулярность ряда графика для диапазона дат.
+
+    Args:
+        start_date (date): Начало диапазона (включительно)
+        end_date (date): Конец диапазона (включительно)
+        max_points (int): Лимит точек (по умолчанию CHART_MAX_POINTS)
+        minimum (str): Самая мелкая допустимая гранулярность
+
+    Returns:
+        str: Гранулярность из ROLLUP_GRAINS
+    """
+    max_points = max_points or chart_max_points()
+    for grain in ROLLUP_GRAINS[ROLLUP_GRAINS.index(minimum):]:
+        if bucket_count(start_date, end_date, grain) <= max_points:
+            return grain
+    return ROLLUP_GRAINS[-1]
+
+
+def lttb_indices(xs, ys, threshold):
+    """
+    Выбирает точки ряда алгоритмом Largest-Triangle-Three-Buckets.
+
+    Первая и последняя точки сохраняются всегда, остальные точки делятся
+    на threshold - 2 интервала, из каждого берется одна.
+
+    Args:
+        xs (list): Координаты по оси X (по возрастанию)
+        ys (list): Значения
+        threshold (int): Количество точек результата
+
+    Returns:
+        list: Индексы выбранных точек по возрастанию
+    """
+    length = len(xs)
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    every = (length - 2) / (threshold - 2)
+    selected = [0]
+    anchor = 0
+    for bucket in range(threshold - 2):
+        # Среднее следующего интервала - третья вершина треугольника
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, length)
+        next_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        next_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        anchor_x, anchor_y = xs[anchor], ys[anchor]
+        best_area = -1
+        for index in range(int(bucket * every) + 1, next_start):
+            area = abs(
+                (anchor_x - next_x) * (ys[index] - anchor_y)
+                - (anchor_x - xs[index]) * (next_y - anchor_y)
+            )
+            if area > best_area:
+                best_area, anchor = area, index
+        selected.append(anchor)
+
+    selected.append(length - 1)
+    return selected
+
+
+def downsample_series(series, max_points):
+    """
+    Прореживает ряд {дата YYYY-MM-DD: значение} до max_points точек (LTTB).
+
+    Args:
+        series (dict): Ряд по датам в порядке возрастания
+        max_points (int): Лимит точек
+
+    Returns:
+        dict: Исходный ряд, если он не длиннее лимита, иначе прореженный
+    """
+    if not max_points or len(series) <= max_points:
+        return series
+    labels = list(series)
+    values = list(series.values())
+    xs = [date.fromisoformat(label).toordinal() for label in labels]
+    return {labels[index]: values[index] for index in lttb_indices(xs, values, max_points)}
@@ -0,0 +1,296 @@
+"""
+Аналитический куб KPI в памяти процесса (необязательный, нужен numpy).
+
+Суммы полей KPI хранятся в массиве NumPy с осями цех x день x показатель,
+количество записей - в массиве цех x день. Куб заполняется дневными
+агрегатами KPIRollup (одна строка на цех и день) и обновляется по штампу
+версии данных KPI: при смене штампа дочитываются только агрегаты с ID
+больше прочитанного (пересчет агрегата удаляет строку и вставляет новую
+с большим ID). Если дневных агрегатов в базе меньше, чем заполненных
+ячеек куба (записи удалены), куб загружается заново.
+
+Карточки и графики дашборда считаются срезом куба: выбранные цеха - маска
+оси цехов, суммы за диапазон дат и интервалы графиков - точные суммы
+(math.fsum) дневных значений среза, поэтому после округления они совпадают
+с расчетом по агрегатам в базе данных.
+Включается настройкой KPI_CUBE; numpy - необязательная зависимость
+(requirements-optional.txt). Без numpy дашборд читает агрегаты из базы, а
+процесс один раз пишет предупреждение в журнал.
+"""
+from datetime import timedelta
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+from .caching import get_data_version
+from .charts import CHART_DIGITS, downsample_series
+from .models import KPIRollup, Shop
+from .rollups import ROLLUP_FIELDS, bucket_start
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+# Поля KPI с целыми суммами
+CUBE_INTEGER_FIELDS = {'output', 'inventory_level', 'dse_volume', 'cabinets_produced'}
+
+# Запас оси дней при расширении куба
+CUBE_DAYS_PADDING = 31
+
+_FIELD_INDEX = {field: index for index, field in enumerate(ROLLUP_FIELDS)}
+
+
+class KPICube:
+    """
+    Куб сумм KPI по цехам и дням.
+
+    Обновление меняет массивы на месте под блокировкой, поэтому срез
+    копирует свои дни и цеха (select).
+
+    Атрибуты:
+        origin (date): Дата первого дня оси дней
+        shop_ids (ndarray): ID цехов оси цехов
+        sums (ndarray): Суммы полей ROLLUP_FIELDS, форма (цеха, дни, поля)
+        counts (ndarray): Количество записей, форма (цеха, дни)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.reset()
+
+    def reset(self):
+        """Очищает куб."""
+        self.origin = None
+        self.shop_ids = np.zeros(0, dtype=np.int64)
+        self.shop_index = {}
+        self.shop_names = {}
+        self.sums = np.zeros((0, 0, len(ROLLUP_FIELDS)))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.watermark = 0
+
+    def refresh(self):
+        """
+        Дочитывает изменения, если сменился штамп версии данных KPI.
+
+        Штамп читается до запроса агрегатов: изменения, записанные во время
+        обновления, будут дочитаны при следующем обращении.
+        """
+        version = get_data_version('kpi')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self._apply(self._fetch())
+            day_rollups = KPIRollup.objects.filter(grain='day').count()
+            if day_rollups != np.count_nonzero(self.counts):
+                self.reset()
+                self._apply(self._fetch())
+            self.shop_names = dict(Shop.objects.values_list('id', 'name'))
+            self.version = version
+
+    def _fetch(self):
+        return list(
+            KPIRollup.objects.filter(grain='day', id__gt=self.watermark)
+            .order_by('id')
+            .values_list('id', 'shop_id', 'period_start', 'record_count', *[f'{field}_sum' for field in ROLLUP_FIELDS])
+        )
+
+    def _apply(self, rows):
+        if not rows:
+            return
+        ids, shop_ids, days, counts, *sums = zip(*rows)
+        self._extend(set(shop_ids), min(days), max(days))
+
+        shop_positions = np.fromiter((self.shop_index[shop_id] for shop_id in shop_ids), np.int64, len(rows))
+        day_positions = np.fromiter(((day - self.origin).days for day in days), np.int64, len(rows))
+        self.sums[shop_positions, day_positions] = np.column_stack(sums)
+        self.counts[shop_positions, day_positions] = counts
+        self.watermark = max(ids)
+
+    def _extend(self, shop_ids, first_day, last_day):
+        """Расширяет оси куба под новые цеха и даты."""
+        new_shops = sorted(shop_ids - self.shop_index.keys())
+        if self.origin is None:
+            self.origin = first_day
+        start_padding = (self.origin - first_day).days
+        start_padding = start_padding + CUBE_DAYS_PADDING if start_padding > 0 else 0
+        end_padding = (last_day - self.origin).days + 1 - self.counts.shape[1]
+        end_padding = end_padding + CUBE_DAYS_PADDING if end_padding > 0 else 0
+        if not (new_shops or start_padding or end_padding):
+            return
+
+        self.sums = np.pad(self.sums, ((0, len(new_shops)), (start_padding, end_padding), (0, 0)))
+        self.counts = np.pad(self.counts, ((0, len(new_shops)), (start_padding, end_padding)))
+        self.origin -= timedelta(days=start_padding)
+        for shop_id in new_shops:
+            self.shop_index[shop_id] = len(self.shop_index)
+        self.shop_ids = np.fromiter(self.shop_index, np.int64, len(self.shop_index))
+
+    def select(self, start_date, end_date, shop_ids=None):
+        """
+        Возвращает срез куба.
+
+        Args:
+            start_date (date): Начало диапазона (включительно)
+            end_date (date): Конец диапазона (включительно)
+            shop_ids (list): Список ID цехов (пустой - все цеха)
+
+        Returns:
+            KPICubeSlice: Срез куба
+        """
+        self.refresh()
+        with self.lock:
+            origin = self.origin or start_date
+            days = self.counts.shape[1]
+            first = min(max((start_date - origin).days, 0), days)
+            last = max(min((end_date - origin).days + 1, days), first)
+            if shop_ids:
+                positions = np.flatnonzero(np.isin(self.shop_ids, [int(shop_id) for shop_id in shop_ids]))
+            else:
+                positions = np.arange(len(self.shop_ids))
+            # Выборка по массиву позиций - копия, обновление куба ее не меняет
+            return KPICubeSlice(
+                origin + timedelta(days=first),
+                [self.shop_names.get(int(shop_id), '') for shop_id in self.shop_ids[positions]],
+                self.sums[positions, first:last],
+                self.counts[positions, first:last],
+            )
+
+
+class KPICubeSlice:
+    """
+    Срез куба по диапазону дат и цехам.
+
+    Значения совпадают с расчетом по агрегатам KPIRollup
+    (aggregate_kpi_summary, prepare_chart_data).
+
+    Атрибуты:
+        sums (ndarray): Суммы полей по дням, форма (цеха, дни, поля)
+        counts (ndarray): Количество записей, форма (цеха, дни)
+    """
+
+    def __init__(self, start_date, shop_names, sums, counts):
+        self.start_date = start_date
+        self.shop_names = shop_names
+        self.sums = sums
+        self.counts = counts
+        self.shop_counts = counts.sum(axis=1)
+
+    def totals(self):
+        """
+        Возвращает суммы среза в виде строки агрегата.
+
+        Returns:
+            dict: record_count и суммы <поле>_sum
+        """
+        totals = {'record_count': int(self.counts.sum())}
+        for index, field in enumerate(ROLLUP_FIELDS):
+            totals[f'{field}_sum'] = _value(field, math.fsum(self.sums[:, :, index].ravel().tolist()))
+        return totals
+
+    def chart_data(self, grain, max_points=None):
+        """
+        Возвращает ряды графиков дашборда (как prepare_chart_data).
+
+        Args:
+            grain (str): Гранулярность рядов по датам
+            max_points (int): Лимит точек рядов по датам
+
+        Returns:
+            dict: Ряды по цехам и по датам
+        """
+        downtime_by_shop = {}
+        plan_totals = {}
+        downtime = self.sums[:, :, _FIELD_INDEX['downtime_hours']].tolist()
+        plan = self.sums[:, :, _FIELD_INDEX['plan_completion']].tolist()
+        for name, count, shop_downtime, shop_plan in zip(self.shop_names, self.shop_counts.tolist(), downtime, plan):
+            if not count:
+                continue
+            downtime_by_shop[name] = downtime_by_shop.get(name, 0) + math.fsum(shop_downtime)
+            plan_sum, plan_count = plan_totals.get(name, (0, 0))
+            plan_totals[name] = (plan_sum + math.fsum(shop_plan), plan_count + count)
+
+        production_by_date = {}
+        inventory_by_date = {}
+        days = self.counts.shape[1]
+        if days:
+            # Начала интервалов гранулярности внутри диапазона
+            axis = np.arange(days) + np.datetime64(self.start_date, 'D')
+            if grain == 'month':
+                labels = axis.astype('datetime64[M]')
+            elif grain == 'week':
+                # 1970-01-01 - четверг: сдвиг на 3 дня дает недели с понедельника
+                labels = (axis.astype(np.int64) + 3) // 7
+            else:
+                labels = axis
+            starts = np.concatenate(([0], np.flatnonzero(labels[1:] != labels[:-1]) + 1))
+
+            # Суммы целых полей в float64 точны
+            output = np.add.reduceat(self.sums[:, :, _FIELD_INDEX['output']].sum(axis=0), starts)
+            # Остатки - средний уровень цеха по его дням с данными, средние цехов складываются
+            inventory = np.add.reduceat(self.sums[:, :, _FIELD_INDEX['inventory_level']], starts, axis=1)
+            shop_counts = np.add.reduceat(self.counts, starts, axis=1)
+            for bucket, start in enumerate(starts.tolist()):
+                reported = shop_counts[:, bucket] > 0
+                if not reported.any():
+                    continue
+                date_str = bucket_start(self.start_date + timedelta(days=start), grain).strftime('%Y-%m-%d')
+                production_by_date[date_str] = _value('output', output[bucket])
+                levels = inventory[reported, bucket] / shop_counts[reported, bucket]
+                inventory_by_date[date_str] = _value('inventory_level', math.fsum(levels.tolist()))
+
+        return {
+            'downtime_by_shop': {
+                name: round(downtime, CHART_DIGITS) for name, downtime in sorted(downtime_by_shop.items())
+            },
+            'production_by_date': downsample_series(production_by_date, max_points),
+            'plan_by_shop': {
+                name: round(plan_sum / plan_count, CHART_DIGITS) if plan_count else 0
+                for name, (plan_sum, plan_count) in sorted(plan_totals.items())
+            },
+            'inventory_by_date': downsample_series(inventory_by_date, max_points),
+        }
+
+
+def _value(field, value):
+    return int(round(value)) if field in CUBE_INTEGER_FIELDS else float(value)
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+# Предупреждение о недоступном кубе пишется один раз на процесс
+_numpy_warning_logged = False
+
+
+def get_kpi_cube():
+    """
+    Возвращает куб KPI процесса.
+
+    Returns:
+        KPICube: Куб или None, если он выключен (KPI_CUBE) или numpy не установлен
+    """
+    global _cube, _numpy_warning_logged
+    if not getattr(settings, 'KPI_CUBE', False):
+        return None
+    if np is None:
+        if not _numpy_warning_logged:
+            _numpy_warning_logged = True
+            logger.warning(
+                'KPI_CUBE включен, но numpy не установлен (pip install -r requirements-optional.txt): '
+                'карточки и графики дашборда считаются по агрегатам в базе данных'
+            )
+        return None
+    if _cube is None:
+        with _cube_lock:
+            if _cube is None:
+                _cube = KPICube()
+    return _cube
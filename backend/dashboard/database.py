@@ -0,0 +1,163 @@
+"""
+Режим производительности SQLite и чтение через соединение только для чтения.
+
+При каждом открытии соединения с SQLite выполняются PRAGMA из настройки
+SQLITE_PRAGMAS: журнал WAL (читатели не ждут писателя, писатель не ждет
+читателей), synchronous=NORMAL (без fsync на каждую транзакцию, надежно
+в режиме WAL), отображение файла в память и размер кэша страниц.
+busy_timeout берется из OPTIONS['timeout'] соединения, поэтому увеличенное
+ожидание у процессов генерации (см. _bulk.init_worker_process) сохраняется.
+
+При SQLITE_READ_REPLICA=1 в настройках есть второе подключение 'replica'
+к тому же файлу в режиме только для чтения. Представления чтения
+помечаются декоратором use_read_replica, и ReadReplicaRouter направляет
+их запросы на это подключение: они не занимают блокировку записи и не
+попадают в транзакции загрузки данных. Внутри транзакции основного
+подключения чтение остается на нем, чтобы видеть незафиксированные записи.
+"""
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Подключение только для чтения (settings.DATABASES)
+READ_REPLICA_ALIAS = 'replica'
+
+# Признак представления чтения; sync_to_async передает его в потоки
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def is_read_only_connection(connection):
+    """Проверяет, открыт ли файл SQLite в режиме только для чтения (mode=ro)."""
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Применяет PRAGMA режима производительности к новому соединению SQLite.
+
+    Args:
+        connection (BaseDatabaseWrapper): Открытое соединение
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_TUNING', False):
+        return
+
+    pragmas = {'busy_timeout': int(connection.settings_dict['OPTIONS'].get('timeout', 5) * 1000)}
+    pragmas.update(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if is_read_only_connection(connection):
+        # Режим журнала хранится в файле и меняется только при записи
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('synchronous', None)
+        pragmas['query_only'] = 'ON'
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def replica_enabled():
+    """Проверяет, настроено ли подключение только для чтения."""
+    return READ_REPLICA_ALIAS in settings.DATABASES
+
+
+def use_read_replica(view):
+    """
+    Декоратор представления, которое только читает данные.
+
+    Запросы представления (и функций, запущенных им через sync_to_async)
+    выполняются через подключение только для чтения, если оно настроено.
+    Потоковые ответы читают данные после выхода из представления, поэтому
+    их набор запросов закрепляется через pin_read_database.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+def read_database():
+    """Возвращает подключение, через которое сейчас выполняется чтение."""
+    if _replica_reads.get() and replica_enabled() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return READ_REPLICA_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+def pin_read_database(queryset):
+    """
+    Закрепляет за набором запросов текущее подключение для чтения.
+
+    Args:
+        queryset (QuerySet): Набор запросов потокового ответа
+
+    Returns:
+        QuerySet: Набор запросов с явным подключением
+    """
+    return queryset.using(read_database())
+
+
+def bind_read_database(func):
+    """
+    Закрепляет за функцией текущий выбор подключения для чтения.
+
+    Потоковый ответ вызывает функцию после выхода из представления, когда
+    признак use_read_replica уже сброшен.
+
+    Args:
+        func (callable): Функция без аргументов
+
+    Returns:
+        callable: Функция, которая читает через то же подключение, что и представление
+    """
+    replica_reads = _replica_reads.get()
+
+    @wraps(func)
+    def wrapper():
+        token = _replica_reads.set(replica_reads)
+        try:
+            return func()
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Маршрутизатор баз данных: чтение представлений use_read_replica - через
+    подключение только для чтения, запись и миграции - через основное.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_database()
+        return alias if alias == READ_REPLICA_ALIAS else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба подключения работают с одним файлом базы данных
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, READ_REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_REPLICA_ALIAS
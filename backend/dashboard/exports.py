@@ -0,0 +1,214 @@
+"""
+Потоковая выгрузка отчета KPI в CSV и XLSX.
+
+Строки читаются из базы данных порциями через QuerySet.iterator() и сразу
+отдаются клиенту, поэтому расход памяти не зависит от длины периода.
+XLSX собирается без сторонних библиотек: лист пишется в ZIP-архив
+построчно, архив выдается частями по мере сжатия.
+"""
+import csv
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+from .pagination import KPI_REPORT_ORDERING
+
+
+# Колонки выгрузки: заголовок и поле KPIRecord (как в таблице отчетов)
+REPORT_EXPORT_COLUMNS = (
+    ('Дата', 'date'),
+    ('Цех', 'shop__name'),
+    ('Объем выпуска', 'output'),
+    ('Часы простоя', 'downtime_hours'),
+    ('Процент брака', 'defect_rate'),
+    ('Общий уровень остатков', 'inventory_level'),
+    ('Изготовлено шкафов', 'cabinets_produced'),
+    ('Выполнение плана (%)', 'plan_completion'),
+)
+
+# Количество строк, читаемых из базы данных за один раз
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def iter_report_rows(queryset):
+    """
+    Возвращает итератор строк отчета в порядке таблицы отчетов.
+
+    Args:
+        queryset (QuerySet): Отфильтрованные записи KPIRecord
+
+    Returns:
+        iterator: Кортежи значений колонок REPORT_EXPORT_COLUMNS
+    """
+    return (
+        queryset.order_by(*KPI_REPORT_ORDERING)
+        .values_list(*[field for _, field in REPORT_EXPORT_COLUMNS])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """Псевдофайл, который возвращает записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """
+    Выдает CSV по строкам.
+
+    Args:
+        rows (iterable): Строки из iter_report_rows()
+
+    Yields:
+        str: Очередная строка CSV (первой идет BOM для Excel)
+    """
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow([header for header, _ in REPORT_EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkBuffer:
+    """
+    Файл без поддержки seek для zipfile: копит записанные байты до выдачи.
+
+    zipfile пишет в такой файл последовательно (с дескрипторами данных
+    после каждого элемента архива).
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Отчет" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Стиль 1 - встроенный формат даты (numFmtId 14)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+
+_XLSX_SHEET_FOOTER = '</sheetData></worksheet>'
+
+# Начало отсчета дат Excel
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(rows):
+    """
+    Выдает XLSX-файл частями по мере записи строк.
+
+    Args:
+        rows (iterable): Строки из iter_report_rows()
+
+    Yields:
+        bytes: Очередная часть ZIP-архива
+    """
+    output = _ChunkBuffer()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _XLSX_STYLES)
+        yield output.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_XLSX_SHEET_HEADER.encode('utf-8'))
+            sheet.write(_xlsx_row([header for header, _ in REPORT_EXPORT_COLUMNS]).encode('utf-8'))
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if output.chunks:
+                    yield output.drain()
+            sheet.write(_XLSX_SHEET_FOOTER.encode('utf-8'))
+
+    yield output.drain()
@@ -0,0 +1,395 @@
+"""
+Загрузка файла учета шкафов (main/uchet.xlsm) в складские позиции и остатки.
+
+Лист читается потоково без сторонних библиотек: XML листа распаковывается
+из ZIP-архива порциями и разбирается XMLParser с приемником событий, без
+построения дерева элементов, поэтому расход памяти не зависит от размера
+книги. В памяти хранится только таблица общих строк (sharedStrings.xml).
+
+Строка листа - один шкаф. Шкаф становится складской позицией с артикулом
+"KKS шкафа" и категорией по типу шкафа. Для выбранного цеха и даты среза
+создается запись остатков:
+    demand    - 1, если шкаф еще не отгружен (факт этапа "отгрузка");
+    quantity  - 1, если шкаф собран (факт этапа "сборка шкафа") и не отгружен;
+    reserved  - 1, если шкаф упакован (факт этапа "Упаковывание") и не отгружен;
+    shortage  - потребность минус собранные шкафы.
+
+Артикулы сопоставляются с позициями по словарю, загруженному одним
+запросом; новые позиции создаются пакетно. Записи остатков вставляются
+пакетами с обновлением при конфликте по ключу (item, shop, date), поэтому
+повторная загрузка за ту же дату заменяет значения без дубликатов.
+"""
+from datetime import date, timedelta
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+
+from django.db import transaction
+
+from .models import InventoryCategory, InventoryItem, InventoryRecord
+
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Начало отсчета дат Excel
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+_ROW_TAG = f'{_SHEET_NS}row'
+_CELL_TAG = f'{_SHEET_NS}c'
+_VALUE_TAGS = (f'{_SHEET_NS}v', f'{_SHEET_NS}t')
+
+# Размер порции XML листа, передаваемой разборщику (байты)
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Колонки шапки листа: ключ и начало заголовка (без учета регистра и переносов)
+UCHET_COLUMNS = {
+    'order': 'заказ',
+    'building': 'здание',
+    'section': 'kks секции',
+    'sku': 'kks шкафа',
+    'cabinet_type': 'тип шкафа',
+    'due_date': 'срок отгрузки',
+    'safety_class': 'класс безопасности',
+    'manufacturer': 'изготовитель',
+}
+
+# Этапы, факт которых определяет остатки (колонка "Факт" справа от "План")
+UCHET_STAGES = {
+    'assembled': 'сборка шкафа',
+    'packed': 'упаковывание',
+    'shipped': 'отгрузка',
+}
+
+# Значение колонки "Здание" у строки-образца в начале листа
+UCHET_EXAMPLE_MARK = 'пример'
+
+# Значение "не указан" в колонках-справочниках
+UCHET_EMPTY_VALUES = {'', 'не указан'}
+
+# Размер пакета записи
+IMPORT_BATCH_SIZE = 1000
+
+
+def _normalize(value):
+    return ' '.join(str(value).split()).lower() if value is not None else ''
+
+
+def excel_date(value):
+    """
+    Преобразует дату Excel (число дней) в date.
+
+    Returns:
+        date: Дата или None для пустого и нечислового значения
+    """
+    try:
+        serial = float(value)
+    except (TypeError, ValueError):
+        return None
+    if serial <= 0:
+        return None
+    return _EXCEL_EPOCH + timedelta(days=int(serial))
+
+
+def _read_shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as source:
+        for _, element in ET.iterparse(source):
+            if element.tag == f'{_SHEET_NS}si':
+                strings.append(''.join(text.text or '' for text in element.iter(f'{_SHEET_NS}t')))
+                element.clear()
+    return strings
+
+
+def _sheet_path(archive, sheet_name=None):
+    """Возвращает путь XML листа в архиве (по умолчанию первого листа)."""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    sheets = workbook.find(f'{_SHEET_NS}sheets')
+    for sheet in sheets:
+        if sheet_name is None or sheet.get('name') == sheet_name:
+            relation_id = sheet.get(f'{_REL_NS}id')
+            break
+    else:
+        raise ValueError(f'Лист "{sheet_name}" не найден')
+
+    relations = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for relation in relations.iter(f'{_PACKAGE_REL_NS}Relationship'):
+        if relation.get('Id') == relation_id:
+            target = relation.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise ValueError(f'Не найден файл листа "{sheet_name}"')
+
+
+class _SheetRowTarget:
+    """
+    Приемник событий XMLParser: собирает значения ячеек строки листа.
+
+    Дерево элементов не строится: разборщик вызывает start/data/end, и
+    готовые строки копятся в rows до выдачи вызывающим кодом.
+    """
+
+    def __init__(self, shared_strings):
+        self.shared_strings = shared_strings
+        self.rows = []
+        self.columns = {}
+        self.row_number = None
+        self.values = None
+        self.cell = None
+        self.text = None
+
+    def _column_index(self, reference):
+        # Номер колонки (с 1) по адресу ячейки вида "AB12", с кэшем по буквам
+        letters = reference.rstrip('0123456789')
+        index = self.columns.get(letters)
+        if index is None:
+            index = 0
+            for letter in letters:
+                index = index * 26 + ord(letter) - 64
+            self.columns[letters] = index
+        return index
+
+    def start(self, tag, attrib):
+        if tag == _CELL_TAG:
+            self.cell = (self._column_index(attrib['r']), attrib.get('t'))
+        elif tag in _VALUE_TAGS:
+            self.text = []
+        elif tag == _ROW_TAG:
+            self.row_number = int(attrib['r'])
+            self.values = {}
+
+    def data(self, text):
+        if self.text is not None:
+            self.text.append(text)
+
+    def end(self, tag):
+        if tag in _VALUE_TAGS:
+            index, cell_type = self.cell
+            value = ''.join(self.text)
+            self.text = None
+            if cell_type == 's':
+                value = self.shared_strings[int(value)]
+            elif cell_type == 'e':
+                return
+            elif cell_type == 'inlineStr' and index in self.values:
+                # Встроенная строка из нескольких фрагментов форматирования
+                value = self.values[index] + value
+            if value != '':
+                self.values[index] = value
+        elif tag == _ROW_TAG:
+            if self.values:
+                self.rows.append((self.row_number, self.values))
+            self.values = None
+
+    def close(self):
+        pass
+
+
+def iter_xlsx_rows(path, sheet_name=None):
+    """
+    Потоково читает строки листа XLSX/XLSM.
+
+    Args:
+        path (str|file): Путь к файлу или файловый объект
+        sheet_name (str): Название листа (None - первый лист)
+
+    Yields:
+        tuple: (номер строки, {номер колонки с 1: значение}) для непустых
+        строк; значения - str (числа и даты в записи Excel, формулы -
+        последним вычисленным значением)
+    """
+    with zipfile.ZipFile(path) as archive:
+        target = _SheetRowTarget(_read_shared_strings(archive))
+        parser = ET.XMLParser(target=target)
+        with archive.open(_sheet_path(archive, sheet_name)) as source:
+            while chunk := source.read(_READ_CHUNK_SIZE):
+                parser.feed(chunk)
+                if target.rows:
+                    yield from target.rows
+                    target.rows = []
+        parser.close()
+        yield from target.rows
+
+
+def iter_uchet_cabinets(rows):
+    """
+    Выбирает шкафы из строк листа файла учета.
+
+    Шапка определяется по заголовку "KKS шкафа", колонки этапов - по
+    строке с названиями этапов над шапкой. Строки до шапки, строка номеров
+    колонок и строка-образец пропускаются.
+
+    Args:
+        rows (iterable): Строки из iter_xlsx_rows()
+
+    Yields:
+        dict: Поля шкафа (UCHET_COLUMNS) и даты факта этапов (UCHET_STAGES)
+
+    Raises:
+        ValueError: Если в листе нет шапки или колонок этапов
+    """
+    columns = None
+    stages = {}
+    for _, values in rows:
+        if columns is None:
+            titles = {_normalize(value): index for index, value in values.items()}
+            for key, title in UCHET_STAGES.items():
+                if title in titles:
+                    # Колонка "Факт" следует за колонкой "План" этапа
+                    stages[key] = titles[title] + 1
+            if UCHET_COLUMNS['sku'] in titles:
+                columns = {
+                    key: index
+                    for key, title in UCHET_COLUMNS.items()
+                    for text, index in titles.items()
+                    if text.startswith(title)
+                }
+                missing = set(UCHET_STAGES) - set(stages)
+                if missing:
+                    raise ValueError(f'Не найдены колонки этапов: {", ".join(sorted(missing))}')
+            continue
+
+        # Строка номеров колонок под шапкой
+        if values.get(columns['sku']) == str(columns['sku']):
+            continue
+
+        cabinet = {key: values.get(index, '').strip() for key, index in columns.items()}
+        if not cabinet['sku'] or _normalize(cabinet.get('building')) == UCHET_EXAMPLE_MARK:
+            continue
+        # Даты в листе - числа дней Excel
+        cabinet['due_date'] = excel_date(cabinet.get('due_date'))
+        for key, index in stages.items():
+            cabinet[key] = excel_date(values.get(index))
+        yield cabinet
+
+    if columns is None:
+        raise ValueError('Не найдена шапка листа (колонка "KKS шкафа")')
+
+
+def _cabinet_category_name(cabinet):
+    cabinet_type = cabinet.get('cabinet_type', '')
+    if _normalize(cabinet_type) in UCHET_EMPTY_VALUES:
+        return 'Шкафы без типа'
+    return f'Шкафы {cabinet_type}'
+
+
+def _cabinet_description(cabinet):
+    parts = [
+        ('Заказ', cabinet.get('order')),
+        ('секция', cabinet.get('section')),
+        ('класс безопасности', cabinet.get('safety_class')),
+        ('изготовитель', cabinet.get('manufacturer')),
+        ('срок отгрузки', cabinet['due_date'].isoformat() if cabinet.get('due_date') else ''),
+    ]
+    return ', '.join(f'{label} {value}' for label, value in parts if _normalize(value) not in UCHET_EMPTY_VALUES)
+
+
+def _cabinet_stock(cabinet, snapshot_date):
+    """Возвращает поля записи остатков шкафа на дату среза."""
+    def done(stage):
+        return cabinet[stage] is not None and cabinet[stage] <= snapshot_date
+
+    demand = 0 if done('shipped') else 1
+    quantity = demand if done('assembled') else 0
+    reserved = quantity if done('packed') else 0
+    return {
+        'quantity': quantity,
+        'reserved': reserved,
+        'demand': demand,
+        'shortage': demand - quantity,
+    }
+
+
+class UchetImporter:
+    """
+    Пакетная загрузка шкафов файла учета в InventoryItem и InventoryRecord.
+
+    Словари артикулов и категорий загружаются один раз при создании;
+    позиции, которых нет в словаре, создаются пакетно и добавляются в него.
+    """
+
+    def __init__(self, shop, snapshot_date, batch_size=IMPORT_BATCH_SIZE):
+        self.shop = shop
+        self.snapshot_date = snapshot_date
+        self.batch_size = batch_size
+        self.item_ids = dict(InventoryItem.objects.values_list('sku', 'id'))
+        self.category_ids = {}
+        for category_id, name in InventoryCategory.objects.order_by('id').values_list('id', 'name'):
+            self.category_ids.setdefault(name, category_id)
+        self.stats = {'cabinets': 0, 'items_created': 0, 'records': 0}
+
+    def load(self, cabinets):
+        """
+        Загружает шкафы пакетами по batch_size.
+
+        Args:
+            cabinets (iterable): Шкафы из iter_uchet_cabinets()
+
+        Returns:
+            dict: Количество шкафов, созданных позиций и записанных остатков
+        """
+        batch = []
+        for cabinet in cabinets:
+            batch.append(cabinet)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+        return self.stats
+
+    def _category_id(self, cabinet):
+        name = _cabinet_category_name(cabinet)
+        if name not in self.category_ids:
+            self.category_ids[name] = InventoryCategory.objects.create(
+                name=name,
+                description='Шкафы из файла учета',
+            ).id
+        return self.category_ids[name]
+
+    def _write(self, batch):
+        # Повторы артикула в пакете: остается последняя строка листа
+        cabinets = {cabinet['sku'][:50]: cabinet for cabinet in batch}
+
+        with transaction.atomic():
+            new_items = [
+                InventoryItem(
+                    sku=sku,
+                    name=(sku if 'шкаф' in sku.lower() else f'Шкаф {sku}')[:200],
+                    category_id=self._category_id(cabinet),
+                    unit='pcs',
+                    description=_cabinet_description(cabinet),
+                )
+                for sku, cabinet in cabinets.items()
+                if sku not in self.item_ids
+            ]
+            if new_items:
+                InventoryItem.objects.bulk_create(new_items, ignore_conflicts=True)
+                self.item_ids.update(
+                    InventoryItem.objects.filter(sku__in=[item.sku for item in new_items])
+                    .values_list('sku', 'id')
+                )
+                self.stats['items_created'] += len(new_items)
+
+            records = [
+                InventoryRecord(
+                    item_id=self.item_ids[sku],
+                    shop=self.shop,
+                    date=self.snapshot_date,
+                    **_cabinet_stock(cabinet, self.snapshot_date),
+                )
+                for sku, cabinet in cabinets.items()
+            ]
+            InventoryRecord.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['item', 'shop', 'date'],
+                update_fields=['quantity', 'reserved', 'demand', 'shortage'],
+            )
+
+        self.stats['cabinets'] += len(batch)
+        self.stats['records'] += len(records)
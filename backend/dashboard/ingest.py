@@ -0,0 +1,498 @@
+"""
+Загрузка записей KPI и остатков пакетами NDJSON или CSV.
+
+Тело запроса читается потоково: NDJSON - один JSON-объект на строку, CSV -
+первая строка с заголовками (разделитель ",", ";" или табуляция). Колонки -
+имена полей KPIRecord/InventoryRecord; цех задается названием (shop) или
+ID (shop_id), складская позиция - артикулом (sku) или ID (item_id). Даты -
+в формате ГГГГ-ММ-ДД.
+
+Проверка идет по колонкам, а не по строкам: значения колонки приводятся к
+типу поля один раз для каждого различного значения (даты и цеха в пакете
+повторяются), цеха и позиции сопоставляются одним запросом на весь пакет.
+Строки с ошибками отклоняются, остальные записываются.
+
+Запись идет командой INSERT ... ON CONFLICT DO UPDATE (как у
+bulk_create(update_conflicts=True)) по ключам (shop, date) и
+(item, shop, date): повторная отправка того же пакета обновляет те же
+записи, поэтому загрузку можно безопасно повторять. Поля, которых нет в
+строке, у существующей записи не меняются, у новой равны нулю.
+"""
+from collections import defaultdict
+from datetime import date
+import codecs
+import csv
+import json
+import math
+import time
+
+from django.db import NotSupportedError, connections, router, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .caching import mark_data_changed
+from .models import InventoryItem, InventoryRecord, KPIRecord, Shop
+from .rollups import refresh_inventory_rollups, refresh_kpi_rollups
+
+
+# Количество строк в одном executemany
+INGEST_BATCH_SIZE = 5000
+
+# Максимальное количество строк в одном запросе
+INGEST_MAX_ROWS = 200000
+
+# Количество ошибок, возвращаемых в ответе
+INGEST_MAX_ERRORS = 50
+
+# Типы содержимого тела запроса
+INGEST_CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+class IngestError(ValueError):
+    """Тело запроса не может быть разобрано целиком."""
+
+
+def _value_fields(model, keys):
+    """Возвращает {имя поля: целое ли число} для полей значений модели."""
+    return {
+        field.name: field.get_internal_type() == 'IntegerField'
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in keys and not getattr(field, 'auto_now', False)
+    }
+
+
+# Поля значений KPIRecord и InventoryRecord (без ключа записи)
+KPI_VALUE_FIELDS = _value_fields(KPIRecord, ('shop', 'date'))
+INVENTORY_VALUE_FIELDS = _value_fields(InventoryRecord, ('item', 'shop', 'date'))
+
+
+def _upsert(model, rows, value_fields, unique_fields, batch_size):
+    """
+    Записывает строки с обновлением существующих записей по ключу.
+
+    Выполняется та же команда INSERT ... ON CONFLICT DO UPDATE, что и у
+    bulk_create(update_conflicts=True), но через executemany с одним
+    подготовленным запросом: bulk_create собирает SQL для каждого пакета
+    заново, а на SQLite пакет ограничен 999 параметрами (около 60 строк).
+
+    Строки группируются по набору переданных полей: у существующей записи
+    обновляются только они, у новой остальные поля равны нулю. Поля
+    auto_now (KPIRecord.updated_at) получают время загрузки и при вставке,
+    и при обновлении.
+    """
+    connection = connections[router.db_for_write(model)]
+    if not connection.features.supports_update_conflicts:
+        raise NotSupportedError('База данных не поддерживает вставку с обновлением по ключу')
+
+    opts = model._meta
+    quote_name = connection.ops.quote_name
+    key_fields = [opts.get_field(name) for name in unique_fields]
+    stamp_fields = [field for field in opts.concrete_fields if getattr(field, 'auto_now', False)]
+    insert_fields = key_fields + [opts.get_field(name) for name in value_fields] + stamp_fields
+    stamps = [field.get_db_prep_save(timezone.now(), connection) for field in stamp_fields]
+
+    # Ключи в пакете повторяются: значения для базы данных готовятся один раз
+    prepared = {field: {} for field in key_fields}
+
+    def prepare(field, value):
+        cache = prepared[field]
+        if value not in cache:
+            cache[value] = field.get_db_prep_save(value, connection)
+        return cache[value]
+
+    groups = defaultdict(list)
+    for row in rows:
+        groups[tuple(sorted(name for name in row if name in value_fields))].append(row)
+
+    for fields, group in groups.items():
+        on_conflict = OnConflict.UPDATE if fields else OnConflict.IGNORE
+        sql = '%s %s (%s) VALUES (%s) %s' % (
+            connection.ops.insert_statement(on_conflict=on_conflict),
+            quote_name(opts.db_table),
+            ', '.join(quote_name(field.column) for field in insert_fields),
+            ', '.join(['%s'] * len(insert_fields)),
+            connection.ops.on_conflict_suffix_sql(
+                insert_fields,
+                on_conflict,
+                [opts.get_field(name).column for name in fields] + [field.column for field in stamp_fields],
+                [field.column for field in key_fields],
+            ),
+        )
+        params = [
+            (
+                *[prepare(field, row[field.attname]) for field in key_fields],
+                *[row.get(name, 0) for name in value_fields],
+                *stamps,
+            )
+            for row in group
+        ]
+        with connection.cursor() as cursor:
+            for start in range(0, len(params), batch_size):
+                cursor.executemany(sql, params[start:start + batch_size])
+    return len(rows)
+
+
+def upsert_kpi_records(rows, batch_size=INGEST_BATCH_SIZE):
+    """
+    Записывает строки KPI с обновлением по цеху и дате.
+
+    Сигналы сохранения не отправляются: агрегаты и кэш обновляет
+    вызывающий код (refresh_kpi_rollups, mark_data_changed).
+
+    Args:
+        rows (list): Словари с shop_id, date и полями значений KPIRecord
+        batch_size (int): Количество строк в одном executemany
+
+    Returns:
+        int: Количество записанных строк
+    """
+    return _upsert(KPIRecord, rows, KPI_VALUE_FIELDS, ['shop', 'date'], batch_size)
+
+
+def upsert_inventory_records(rows, batch_size=INGEST_BATCH_SIZE):
+    """
+    Записывает строки остатков с обновлением по позиции, цеху и дате.
+
+    Сигналы сохранения не отправляются: агрегаты и кэш обновляет
+    вызывающий код (refresh_inventory_rollups, mark_data_changed).
+
+    Args:
+        rows (list): Словари с item_id, shop_id, date и полями значений InventoryRecord
+        batch_size (int): Количество строк в одном executemany
+
+    Returns:
+        int: Количество записанных строк
+    """
+    return _upsert(InventoryRecord, rows, INVENTORY_VALUE_FIELDS, ['item', 'shop', 'date'], batch_size)
+
+
+def iter_ndjson_rows(lines):
+    """
+    Разбирает строки NDJSON.
+
+    Yields:
+        dict | str: Объект строки или текст ошибки разбора
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield f'некорректный JSON: {error}'
+            continue
+        yield row if isinstance(row, dict) else 'строка должна быть JSON-объектом'
+
+
+def iter_csv_rows(lines):
+    """
+    Разбирает строки CSV с заголовком.
+
+    Yields:
+        dict: Значения строки по заголовкам
+    """
+    lines = codecs.iterdecode(lines, 'utf-8-sig')
+    header = next(lines, '')
+    if not header.strip():
+        return
+    delimiter = max((',', ';', '\t'), key=header.count)
+    columns = [column.strip() for column in next(csv.reader([header], delimiter=delimiter))]
+    for values in csv.reader(lines, delimiter=delimiter):
+        if values:
+            yield dict(zip(columns, values))
+
+
+def read_rows(lines, payload_format):
+    """
+    Читает строки тела запроса.
+
+    Args:
+        lines (iterable): Строки тела запроса (bytes)
+        payload_format (str): 'ndjson' или 'csv'
+
+    Returns:
+        list: Словари строк или тексты ошибок разбора
+
+    Raises:
+        IngestError: Если строк больше INGEST_MAX_ROWS
+    """
+    if payload_format == 'csv':
+        rows = iter_csv_rows(lines)
+    else:
+        rows = iter_ndjson_rows(line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+
+    result = []
+    try:
+        for row in rows:
+            result.append(row)
+            if len(result) > INGEST_MAX_ROWS:
+                raise IngestError(f'В одном запросе допускается не более {INGEST_MAX_ROWS} строк')
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise IngestError(f'Не удалось разобрать тело запроса: {error}')
+    return result
+
+
+def _to_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else _reject(value)
+
+
+def _to_int(value):
+    number = _to_float(value)
+    if not number.is_integer():
+        raise ValueError('ожидается целое число')
+    return int(number)
+
+
+def _to_float(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        _reject(value)
+    number = float(value.strip().replace(',', '.')) if isinstance(value, str) else float(value)
+    if not math.isfinite(number):
+        raise ValueError('ожидается конечное число')
+    return number
+
+
+def _to_id(value):
+    number = _to_int(value)
+    if number <= 0:
+        raise ValueError('ожидается положительный ID')
+    return number
+
+
+def _to_name(value):
+    if not isinstance(value, str):
+        _reject(value)
+    return value.strip()
+
+
+def _reject(value):
+    raise ValueError(f'некорректное значение {value!r}')
+
+
+class ColumnValidator:
+    """
+    Проверка пакета строк по колонкам.
+
+    Значения колонки приводятся к типу через кэш различных значений;
+    ошибки сохраняются по номеру строки (первая ошибка строки).
+    """
+
+    def __init__(self, rows):
+        self.size = len(rows)
+        self.errors = {}
+        self.records = rows
+        self.columns = set()
+        for index, row in enumerate(rows):
+            if isinstance(row, str):
+                self.errors[index] = row
+            else:
+                self.columns.update(row)
+
+    def reject(self, index, message):
+        """Отклоняет строку (сохраняется первая ошибка)."""
+        self.errors.setdefault(index, message)
+
+    def column(self, name, convert, required=False):
+        """
+        Приводит колонку к типу.
+
+        Args:
+            name (str): Имя колонки
+            convert (callable): Преобразование значения
+            required (bool): Пустое значение - ошибка строки
+
+        Returns:
+            list: Значения по строкам; None для пустых и ошибочных
+        """
+        values = [None] * self.size
+        cache = {}
+        for index, row in enumerate(self.records):
+            if index in self.errors:
+                continue
+            raw = row.get(name)
+            if raw is None or raw == '':
+                if required:
+                    self.reject(index, f'{name}: нет значения')
+                continue
+            try:
+                ok, result = cache[raw]
+            except KeyError:
+                try:
+                    ok, result = True, convert(raw)
+                except (TypeError, ValueError) as error:
+                    ok, result = False, f'{name}: {error}'
+                cache[raw] = ok, result
+            except TypeError:
+                ok, result = False, f'{name}: некорректное значение {raw!r}'
+            if ok:
+                values[index] = result
+            else:
+                self.reject(index, result)
+        return values
+
+    def reference(self, name, id_name, lookup, label):
+        """
+        Сопоставляет колонку названий (или ID) с ID объектов одним запросом.
+
+        Args:
+            name (str): Колонка названия (артикула)
+            id_name (str): Колонка ID
+            lookup (callable): Принимает множество названий, возвращает {название: ID}
+            label (str): Название объекта для текста ошибки
+
+        Returns:
+            list: ID по строкам
+        """
+        if id_name in self.columns:
+            return self.column(id_name, _to_id, required=True)
+
+        names = self.column(name, _to_name, required=True)
+        ids = lookup({value for value in names if value})
+        result = [None] * self.size
+        for index, value in enumerate(names):
+            if value is None:
+                continue
+            if value in ids:
+                result[index] = ids[value]
+            else:
+                self.reject(index, f'{name}: {label} {value!r} не найден')
+        return result
+
+    def values(self, fields, required=()):
+        """Приводит колонки полей значений модели, которые есть в пакете."""
+        return {
+            name: self.column(name, _to_int if integer else _to_float, required=name in required)
+            for name, integer in fields.items()
+            if name in self.columns or name in required
+        }
+
+
+def _shop_ids(names):
+    ids = {}
+    for shop_id, name in Shop.objects.filter(name__in=names).order_by('-id').values_list('id', 'name'):
+        ids[name] = shop_id
+    return ids
+
+
+def _item_ids(skus):
+    return dict(InventoryItem.objects.filter(sku__in=skus).values_list('sku', 'id'))
+
+
+def _required_fields(model, fields):
+    """Поля значений без значения по умолчанию (обязательны в каждой строке)."""
+    return {name for name in fields if not model._meta.get_field(name).has_default()}
+
+
+class _Target:
+    """Описание загружаемой модели."""
+
+    def __init__(self, model, value_fields, keys, upsert, data_source):
+        self.model = model
+        self.value_fields = value_fields
+        self.keys = keys
+        self.upsert = upsert
+        self.data_source = data_source
+        self.required = _required_fields(model, value_fields)
+
+
+INGEST_TARGETS = {
+    'kpi': _Target(KPIRecord, KPI_VALUE_FIELDS, ('shop_id', 'date'), upsert_kpi_records, 'kpi'),
+    'inventory': _Target(
+        InventoryRecord, INVENTORY_VALUE_FIELDS, ('item_id', 'shop_id', 'date'), upsert_inventory_records, 'inventory'
+    ),
+}
+
+
+def validate_rows(target, rows):
+    """
+    Проверяет пакет строк и приводит значения к типам полей.
+
+    Args:
+        target (str): 'kpi' или 'inventory'
+        rows (list): Словари строк или тексты ошибок разбора (read_rows)
+
+    Returns:
+        tuple: (словари для записи, {номер строки: ошибка}, неизвестные колонки)
+    """
+    spec = INGEST_TARGETS[target]
+    validator = ColumnValidator(rows)
+
+    keys = {
+        'shop_id': validator.reference('shop', 'shop_id', _shop_ids, 'цех'),
+        'date': validator.column('date', _to_date, required=True),
+    }
+    if target == 'inventory':
+        keys['item_id'] = validator.reference('sku', 'item_id', _item_ids, 'позиция')
+    values = validator.values(spec.value_fields, spec.required)
+
+    known = {'shop', 'shop_id', 'date', 'sku', 'item_id', *spec.value_fields}
+    ignored = sorted(str(name) for name in validator.columns - known)
+
+    # Повтор ключа в пакете: записывается последняя строка
+    records = {}
+    for index in range(validator.size):
+        if index in validator.errors:
+            continue
+        record = {name: column[index] for name, column in keys.items()}
+        record.update(
+            (name, column[index]) for name, column in values.items() if column[index] is not None
+        )
+        records[tuple(record[name] for name in spec.keys)] = record
+    return list(records.values()), validator.errors, ignored
+
+
+def ingest_rows(target, rows, batch_size=INGEST_BATCH_SIZE):
+    """
+    Проверяет и записывает пакет строк.
+
+    Все записи пакета сохраняются в одной транзакции вместе с пересчетом
+    агрегатов KPI или остатков.
+
+    Args:
+        target (str): 'kpi' или 'inventory'
+        rows (list): Словари строк или тексты ошибок разбора (read_rows)
+        batch_size (int): Количество строк в одном executemany
+
+    Returns:
+        dict: Статистика загрузки (строки, ошибки, время по пакетам)
+    """
+    spec = INGEST_TARGETS[target]
+    started = time.perf_counter()
+    records, errors, ignored = validate_rows(target, rows)
+    validated = time.perf_counter()
+
+    batches = []
+    with transaction.atomic():
+        for start in range(0, len(records), batch_size):
+            batch_started = time.perf_counter()
+            written = spec.upsert(records[start:start + batch_size], batch_size)
+            batches.append({'rows': written, 'seconds': round(time.perf_counter() - batch_started, 4)})
+        # Запись в обход ORM не отправляет сигналы сохранения
+        if target == 'kpi' and records:
+            refresh_kpi_rollups((record['shop_id'], record['date']) for record in records)
+        elif records:
+            refresh_inventory_rollups((record['item_id'], record['shop_id'], record['date']) for record in records)
+    if records:
+        mark_data_changed(spec.data_source)
+
+    return {
+        'target': target,
+        'received': len(rows),
+        'upserted': len(records),
+        'rejected': len(errors),
+        'duplicates': len(rows) - len(errors) - len(records),
+        'errors': [
+            {'row': index + 1, 'error': message}
+            for index, message in sorted(errors.items())[:INGEST_MAX_ERRORS]
+        ],
+        'ignored_columns': ignored,
+        'batches': batches,
+        'validation_seconds': round(validated - started, 4),
+        'seconds': round(time.perf_counter() - started, 4),
+    }
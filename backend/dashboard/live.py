@@ -0,0 +1,308 @@
+"""
+Поток изменений дашборда (Server-Sent Events).
+
+Клиент держит одно соединение и получает только изменения: пересчитанные
+KPI-карточки и графики, когда меняются данные KPI, и новые срабатывания
+уведомлений. Изменение данных KPI определяется по штампу версии
+(caching.get_data_version): он меняется после фиксации любой записи,
+добавления или обновления записи и массовой загрузки. Значения графиков
+считает сервер тем же расчетом, что и ответ дашборда, поэтому обновленные
+записи и средние значения интервалов недели и месяца не искажаются.
+Положение потока передается в поле id события как "<штамп KPI>:<alert_id>",
+поэтому после переподключения браузер сам присылает заголовок
+Last-Event-ID и поток продолжается без пропусков и повторов.
+
+Базу данных опрашивает один LivePoller на процесс (для каждого
+подключения к базе данных): соединения потока читают его состояние, и
+количество запросов опроса не зависит от числа открытых страниц.
+
+Под ASGI поток - асинхронный генератор (dashboard_event_stream): ожидание
+между опросами не занимает поток сервера. Асинхронный генератор под WSGI
+Django 4.2 собирает целиком до отправки ответа, поэтому под WSGI поток -
+синхронный генератор (dashboard_event_stream_sync), который занимает поток
+сервера на все время соединения.
+
+Django 4.2 под ASGI не останавливает генератор при отключении клиента, а
+под WSGI отключение обнаруживается только при следующей записи в
+соединение. Поэтому соединение живет не дольше LIVE_STREAM_MAX_AGE:
+брошенный поток перестает опрашивать базу данных не позже чем через
+минуту, а открытая страница переподключается с Last-Event-ID.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+
+from .caching import get_data_version
+from .models import AlertEvent
+
+
+# Интервал опроса базы данных (секунды)
+LIVE_POLL_INTERVAL = 2
+
+# Интервал комментария-пульса, который держит соединение открытым (секунды)
+LIVE_HEARTBEAT_INTERVAL = 15
+
+# Время жизни одного соединения (секунды): затем браузер переподключается
+# с Last-Event-ID
+LIVE_STREAM_MAX_AGE = 60
+
+# Задержка переподключения для EventSource (миллисекунды)
+LIVE_RETRY_MS = 3000
+
+# Максимальное количество срабатываний в одном событии
+LIVE_BATCH_LIMIT = 500
+
+_STAMP_PATTERN = re.compile(r'[0-9a-f]{1,32}')
+
+
+def parse_stream_position(value):
+    """
+    Разбирает положение потока из Last-Event-ID или параметра запроса.
+
+    Args:
+        value (str): Строка вида "<штамп KPI>:<alert_id>"
+
+    Returns:
+        tuple: (штамп KPI, alert_id) или None для пустого или поврежденного значения
+    """
+    if not value:
+        return None
+    try:
+        version, alert_id = value.split(':')
+        alert_id = int(alert_id)
+    except ValueError:
+        return None
+    if not _STAMP_PATTERN.fullmatch(version) or alert_id < 0:
+        return None
+    return version, alert_id
+
+
+def format_event(event, data, position=None):
+    """
+    Форматирует сообщение SSE.
+
+    Args:
+        event (str): Тип события
+        data (dict): Данные события (сериализуются в JSON)
+        position (tuple): Положение потока для поля id
+
+    Returns:
+        str: Сообщение в формате text/event-stream
+    """
+    lines = [f'event: {event}']
+    if position is not None:
+        lines.append(f'id: {format_stream_position(position)}')
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    lines.append(f'data: {payload}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def latest_alert_id(using=None):
+    """Возвращает ID последнего срабатывания уведомления."""
+    return AlertEvent.objects.using(using).aggregate(last=Max('id'))['last'] or 0
+
+
+def latest_stream_position(using=None):
+    """Возвращает положение потока на текущих данных KPI и последнем срабатывании."""
+    return get_data_version('kpi'), latest_alert_id(using)
+
+
+def format_stream_position(position):
+    """Форматирует положение потока для поля id и параметра after."""
+    return f'{position[0]}:{position[1]}'
+
+
+class LivePoller:
+    """
+    Общий для соединений процесса опрос изменений.
+
+    Положение потока читается из базы данных не чаще LIVE_POLL_INTERVAL;
+    соединения, спросившие его чаще, получают сохраненное значение.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+        self.lock = threading.Lock()
+        self.position = None
+        self.checked = None
+
+    def poll(self):
+        """Возвращает положение потока на последних данных."""
+        with self.lock:
+            if self.checked is None or time.monotonic() - self.checked >= LIVE_POLL_INTERVAL:
+                self.position = latest_stream_position(self.using)
+                self.checked = time.monotonic()
+            return self.position
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_live_poller(using=None):
+    """Возвращает опрос изменений процесса для подключения к базе данных."""
+    with _pollers_lock:
+        if using not in _pollers:
+            _pollers[using] = LivePoller(using)
+        return _pollers[using]
+
+
+def fetch_alert_delta(after_id, shop_ids, using=None):
+    """
+    Выбирает срабатывания уведомлений, созданные после after_id.
+
+    В поток попадают только правила с уведомлением в интерфейсе.
+
+    Args:
+        after_id (int): ID последнего отправленного события
+        shop_ids (list): ID цехов (пустой список - все цехи)
+        using (str): Подключение к базе данных (None - по маршрутизатору)
+
+    Returns:
+        list: Словари событий
+    """
+    events = AlertEvent.objects.using(using).filter(id__gt=after_id)
+    if shop_ids:
+        events = events.filter(shop_id__in=shop_ids)
+    events = events.select_related('rule', 'shop').order_by('id')[:LIVE_BATCH_LIMIT]
+    delta = []
+    for event in events:
+        delta.append({
+            'id': event.id,
+            'rule': str(event.rule),
+            'notify': event.rule.notify_in_app,
+            'shop': event.shop.name,
+            'date': event.date,
+            'value': event.value,
+            'threshold': event.threshold,
+        })
+    return delta
+
+
+class LiveStream:
+    """
+    Состояние потока изменений одного соединения.
+
+    Читает общее положение потока (LivePoller) и формирует сообщения:
+    пересчитанные данные дашборда при смене штампа KPI и новые
+    срабатывания уведомлений. Ожидание между шагами выполняют генераторы
+    dashboard_event_stream и dashboard_event_stream_sync.
+
+    Атрибуты:
+        load_dashboard (callable): Расчет KPI-карточек и графиков
+            (возвращает пару значений, как views._load_dashboard_data)
+    """
+
+    def __init__(self, position, shop_ids, period, load_dashboard, using=None):
+        self.poller = get_live_poller(using)
+        self.version, self.alert_id = position or self.poller.poll()
+        self.shop_ids = shop_ids
+        self.period = period
+        self.load_dashboard = load_dashboard
+        self.using = using
+        self.payload = None
+        self.started = self.last_sent = time.monotonic()
+
+    def opening(self):
+        """Возвращает первые сообщения соединения."""
+        return [
+            f'retry: {LIVE_RETRY_MS}\n\n',
+            format_event('ready', {'period': self.period}, (self.version, self.alert_id)),
+        ]
+
+    def expired(self):
+        """Проверяет, истекло ли время жизни соединения."""
+        return time.monotonic() - self.started >= LIVE_STREAM_MAX_AGE
+
+    def step(self):
+        """
+        Читает изменения и формирует сообщения (выполняет запросы к базе данных).
+
+        Returns:
+            tuple: Сообщения и признак полного пакета (новых срабатываний
+                больше, читать следует сразу)
+        """
+        version, alert_id = self.poller.poll()
+        messages = []
+
+        if version != self.version:
+            kpi_summary, chart_data = self.load_dashboard()
+            self.version = version
+            payload = {'kpi': kpi_summary, 'chart_data': chart_data}
+            # Изменения других цехов не меняют данные выбранных
+            if payload != self.payload:
+                self.payload = payload
+                messages.append(format_event('kpi', payload, (self.version, self.alert_id)))
+                self.last_sent = time.monotonic()
+
+        events = []
+        if alert_id > self.alert_id:
+            events = fetch_alert_delta(self.alert_id, self.shop_ids, self.using)
+            # Срабатывания других цехов сдвигают положение без сообщения
+            self.alert_id = events[-1]['id'] if len(events) == LIVE_BATCH_LIMIT else alert_id
+            notify = [event for event in events if event.pop('notify')]
+            if notify:
+                messages.append(format_event('alert', {'events': notify}, (self.version, self.alert_id)))
+                self.last_sent = time.monotonic()
+
+        if len(events) == LIVE_BATCH_LIMIT:
+            return messages, True
+
+        if time.monotonic() - self.last_sent >= LIVE_HEARTBEAT_INTERVAL:
+            messages.append(f': ping {format_stream_position((self.version, self.alert_id))}\n\n')
+            self.last_sent = time.monotonic()
+        return messages, False
+
+
+async def dashboard_event_stream(position, shop_ids, period, load_dashboard, using=None):
+    """
+    Асинхронный генератор сообщений потока изменений (ASGI).
+
+    Args:
+        position (tuple): Начальное положение (штамп KPI, alert_id); None -
+            с текущих данных
+        shop_ids (list): ID цехов (пустой список - все цехи)
+        period (str): Период дашборда
+        load_dashboard (callable): Расчет KPI-карточек и графиков для
+            фильтров потока
+        using (str): Подключение к базе данных; поток читает данные после
+            выхода из представления, поэтому подключение передается явно
+
+    Yields:
+        str: Сообщения text/event-stream
+    """
+    stream = await sync_to_async(LiveStream)(position, shop_ids, period, load_dashboard, using)
+    for message in stream.opening():
+        yield message
+
+    while not stream.expired():
+        messages, full = await sync_to_async(stream.step)()
+        for message in messages:
+            yield message
+        if not full:
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
+
+
+def dashboard_event_stream_sync(position, shop_ids, period, load_dashboard, using=None):
+    """
+    Синхронный генератор сообщений потока изменений (WSGI).
+
+    Аргументы - как у dashboard_event_stream.
+
+    Yields:
+        str: Сообщения text/event-stream
+    """
+    stream = LiveStream(position, shop_ids, period, load_dashboard, using)
+    yield from stream.opening()
+
+    while not stream.expired():
+        messages, full = stream.step()
+        yield from messages
+        if not full:
+            time.sleep(LIVE_POLL_INTERVAL)
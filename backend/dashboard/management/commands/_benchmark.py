@@ -0,0 +1,122 @@
+"""
+Общие средства команд замера производительности.
+"""
+from django.db import transaction
+from django.db.models import Max, Q
+from dashboard.models import Shop, KPIRecord, InventoryCategory, InventoryItem, InventoryRecord
+from dashboard.caching import mark_data_changed
+from dashboard.rollups import delete_records, rebuild_inventory_rollups
+import random
+import time
+from datetime import date, timedelta
+
+
+# Метки синтетических данных, удаляемых после замера
+BENCHMARK_SHOP_PREFIX = 'Бенчмарк цех '
+BENCHMARK_CATEGORY = 'Бенчмарк'
+
+
+class SyntheticDataMixin:
+    """
+    Примесь для команд замера: генерация и удаление синтетического набора данных.
+    """
+
+    def add_dataset_arguments(self, parser):
+        """
+        Добавляет аргументы размера синтетического набора данных.
+        """
+        parser.add_argument(
+            '--shops',
+            type=int,
+            default=0,
+            help='Сгенерировать данные для указанного количества цехов (0 - использовать текущие данные)'
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=1000,
+            help='Количество складских позиций в сгенерированных данных'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Количество дней в сгенерированных данных'
+        )
+
+    def generate_dataset(self, shops_count, items_count, days):
+        """
+        Генерирует синтетические записи KPI и остатков пакетной вставкой.
+        """
+        self.stdout.write(f'Генерация данных: {shops_count} цехов, {items_count} позиций, {days} дней...')
+        started = time.perf_counter()
+
+        Shop.objects.bulk_create(
+            [Shop(name=f'{BENCHMARK_SHOP_PREFIX}{index}') for index in range(shops_count)]
+        )
+        category = InventoryCategory.objects.create(name=BENCHMARK_CATEGORY)
+        InventoryItem.objects.bulk_create([
+            InventoryItem(category=category, name=f'Позиция {index}', sku=f'BENCH-{index}', unit='pcs')
+            for index in range(items_count)
+        ])
+        shops = list(Shop.objects.filter(name__startswith=BENCHMARK_SHOP_PREFIX))
+        items = list(InventoryItem.objects.filter(sku__startswith='BENCH-'))
+
+        end_date = KPIRecord.objects.aggregate(latest=Max('date'))['latest'] or date.today()
+        dates = [end_date - timedelta(days=offset) for offset in range(days)]
+
+        KPIRecord.objects.bulk_create(
+            [
+                KPIRecord(
+                    shop=shop,
+                    date=day,
+                    output=random.randint(8000, 15000),
+                    downtime_hours=random.uniform(2, 10),
+                    defect_rate=random.uniform(1.0, 5.0),
+                    equipment_load=random.uniform(75, 98),
+                )
+                for shop in shops
+                for day in dates
+            ],
+            batch_size=5000,
+        )
+
+        total = 0
+        for day in dates:
+            batch = [
+                InventoryRecord(
+                    item=item,
+                    shop=shop,
+                    date=day,
+                    quantity=random.randint(0, 1000),
+                    reserved=random.randint(0, 100),
+                    demand=random.randint(0, 1200),
+                    shortage=random.randint(0, 20),
+                )
+                for shop in shops
+                for item in items
+            ]
+            InventoryRecord.objects.bulk_create(batch, batch_size=5000)
+            total += len(batch)
+
+        # Пакетная вставка не вызывает сигналы: агрегаты остатков и кэш обновляются явно
+        rebuild_inventory_rollups(dates[-1], dates[0], [shop.id for shop in shops])
+        mark_data_changed()
+        self.stdout.write(f'Создано {total} записей остатков за {time.perf_counter() - started:.1f} с')
+
+    def cleanup_dataset(self):
+        """
+        Удаляет сгенерированные данные вместе с их агрегатами.
+        """
+        self.stdout.write('Удаление сгенерированных данных...')
+        shops = Shop.objects.filter(name__startswith=BENCHMARK_SHOP_PREFIX)
+        categories = InventoryCategory.objects.filter(name=BENCHMARK_CATEGORY)
+        with transaction.atomic():
+            # Записи удаляются запросами DELETE без сигналов. Их агрегаты
+            # относятся только к цехам, позициям и категории набора и
+            # удаляются каскадом без пересчета
+            delete_records(KPIRecord.objects.filter(shop__in=shops))
+            delete_records(InventoryRecord.objects.filter(Q(shop__in=shops) | Q(item__category__in=categories)))
+            shops.delete()
+            categories.delete()
+        mark_data_changed()
@@ -0,0 +1,149 @@
+"""
+Общие средства пакетной загрузки для команд генерации данных.
+
+Модуль не импортирует модели, поэтому его функции можно использовать как
+инициализатор дочерних процессов до настройки Django.
+"""
+from collections import defaultdict
+import csv
+import io
+
+
+# Размер пакета bulk_create по умолчанию
+DEFAULT_BATCH_SIZE = 5000
+
+
+class BulkInsertMixin:
+    """
+    Примесь для команд генерации: аргумент размера пакета вставки.
+    """
+
+    def add_bulk_arguments(self, parser):
+        """
+        Добавляет аргумент --batch-size.
+        """
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Количество записей в одном INSERT (по умолчанию {DEFAULT_BATCH_SIZE})'
+        )
+
+
+class BatchWriter:
+    """
+    Накопитель объектов моделей с записью через bulk_create.
+
+    Объекты каждой модели копятся в отдельном списке и записываются, как
+    только набирается batch_size штук. Остаток записывается в flush().
+    bulk_create не отправляет сигналы сохранения, поэтому агрегаты и кэш
+    после загрузки обновляет вызывающий код. С ignore_conflicts объекты,
+    нарушающие ограничения уникальности (уже загруженные записи),
+    пропускаются; counts тогда учитывает все переданные объекты.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, ignore_conflicts=False):
+        self.batch_size = batch_size
+        self.ignore_conflicts = ignore_conflicts
+        self.pending = defaultdict(list)
+        self.counts = defaultdict(int)
+
+    def add(self, obj):
+        """Добавляет объект и записывает пакет его модели, если он заполнен."""
+        model = type(obj)
+        batch = self.pending[model]
+        batch.append(obj)
+        if len(batch) >= self.batch_size:
+            self._write(model)
+
+    def flush(self):
+        """Записывает все накопленные объекты."""
+        for model in list(self.pending):
+            self._write(model)
+
+    def _write(self, model):
+        batch = self.pending.pop(model, [])
+        if batch:
+            model.objects.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=self.ignore_conflicts)
+            self.counts[model] += len(batch)
+
+
+def init_worker_process():
+    """
+    Подготавливает дочерний процесс генерации к работе с базой данных.
+
+    При запуске процессов через spawn настраивает Django заново. Ожидание
+    блокировки SQLite увеличено: процессы пишут в один файл по очереди.
+    """
+    import django
+    from django.db import connections
+
+    django.setup()
+    for connection in connections.all():
+        if connection.vendor == 'sqlite':
+            options = connection.settings_dict.setdefault('OPTIONS', {})
+            options['timeout'] = max(options.get('timeout', 0), 600)
+
+
+class ShardWriter:
+    """
+    Запись строк одного шарда данных напрямую в таблицы.
+
+    На PostgreSQL строки передаются командой COPY пакетами по batch_size.
+    На остальных СУБД строки копятся до flush() и пишутся пакетными INSERT:
+    SQLite допускает одного писателя, и блокировка занимается только на
+    время записи, а не на время генерации. Вызывающий код открывает
+    транзакцию вокруг записи шарда.
+    """
+
+    def __init__(self, connection, batch_size=DEFAULT_BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+        self.pending = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.fields = {}
+
+    def _insert_fields(self, model):
+        if model not in self.fields:
+            self.fields[model] = [field for field in model._meta.concrete_fields if not field.primary_key]
+        return self.fields[model]
+
+    def add(self, obj):
+        """Добавляет несохраненный объект модели."""
+        model = type(obj)
+        rows = self.pending[model]
+        # pre_save, как при bulk_create: поля auto_now получают текущее время
+        rows.append(tuple(
+            field.get_db_prep_save(field.pre_save(obj, True), self.connection)
+            for field in self._insert_fields(model)
+        ))
+        if self.use_copy and len(rows) >= self.batch_size:
+            self._write(model)
+
+    def flush(self):
+        """Записывает все накопленные строки."""
+        for model in list(self.pending):
+            self._write(model)
+
+    def _write(self, model):
+        rows = self.pending.pop(model, [])
+        if not rows:
+            return
+
+        quote_name = self.connection.ops.quote_name
+        table = quote_name(model._meta.db_table)
+        columns = ', '.join(quote_name(field.column) for field in self._insert_fields(model))
+
+        with self.connection.cursor() as cursor:
+            if self.use_copy:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(rows[0]))
+                sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+                for start in range(0, len(rows), self.batch_size):
+                    cursor.executemany(sql, rows[start:start + self.batch_size])
+        self.counts[model] += len(rows)
@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from ._benchmark import SyntheticDataMixin
+import asyncio
+import statistics
+import threading
+import time
+
+
+# Запросы по умолчанию: данные склада и AJAX-обновление дашборда
+DEFAULT_TARGETS = (
+    ('/inventory/data/?period=year', False),
+    ('/inventory/data/?period=quarter', False),
+    ('/?period=year', True),
+    ('/?period=quarter', True),
+)
+
+# Кэш ответов - заглушка: каждый запрос считает данные заново
+DUMMY_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+class Command(SyntheticDataMixin, BaseCommand):
+    """
+    Команда управления Django для нагрузочного замера JSON-представлений.
+
+    Одни и те же запросы выполняются через WSGI-обработчик (пул потоков,
+    как у синхронного сервера с --threads потоками) и через ASGI-обработчик
+    (один цикл событий, до --concurrency запросов одновременно). Запросы
+    проходят весь стек middleware и аутентификацию, но без сети, поэтому
+    сравниваются только обработчики и представления.
+    """
+    help = 'Нагрузочный замер JSON-представлений под WSGI и ASGI'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=400,
+            help='Количество запросов в каждом режиме'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Количество одновременных запросов (ASGI)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Количество потоков WSGI-сервера'
+        )
+        parser.add_argument(
+            '--username',
+            help='Пользователь, от имени которого выполняются запросы (по умолчанию первый суперпользователь)'
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=0,
+            help='Задержка каждого SQL-запроса в мс (имитация сетевой СУБД)'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Отключить кэш ответов: каждый запрос считает данные заново'
+        )
+        self.add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('Не найден пользователь для запросов. Создайте суперпользователя или укажите --username.')
+
+        if options['shops']:
+            self.generate_dataset(options['shops'], options['items'], options['days'])
+
+        try:
+            login_client = Client()
+            login_client.force_login(user)
+            self.cookies = login_client.cookies
+
+            # Тестовые клиенты отправляют запросы на хост testserver
+            overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+            if options['no_cache']:
+                overrides['CACHES'] = {**settings.CACHES, 'default': DUMMY_CACHE}
+            self.latency = options['db_latency'] / 1000
+            if self.latency:
+                connection_created.connect(self.add_latency, dispatch_uid='benchmark_db_latency')
+                for connection in connections.all():
+                    self.add_latency(connection=connection)
+            try:
+                with override_settings(**overrides):
+                    results = self.run_modes(options)
+            finally:
+                connection_created.disconnect(dispatch_uid='benchmark_db_latency')
+        finally:
+            if options['shops']:
+                self.cleanup_dataset()
+
+        self.stdout.write(
+            f'{"Режим":<28} {"Запросов/с":>11} {"p50, мс":>9} {"p95, мс":>9} {"Ошибок":>7}'
+        )
+        for label, elapsed, latencies, errors in results:
+            latencies.sort()
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f'{label:<28} {len(latencies) / elapsed:>11.1f} '
+                f'{statistics.median(latencies):>9.1f} {p95:>9.1f} {errors:>7}'
+            )
+
+    def add_latency(self, connection, **kwargs):
+        """
+        Добавляет соединению задержку перед каждым запросом.
+
+        Ожидание освобождает GIL, как ожидание ответа сетевой СУБД.
+        """
+        # Сигнал приходит при каждом переподключении того же объекта соединения
+        if getattr(connection, 'benchmark_latency', False):
+            return
+        connection.benchmark_latency = True
+        latency = self.latency
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        connection.execute_wrappers.append(delay)
+
+    def run_modes(self, options):
+        """
+        Выполняет прогрев и замер в обоих режимах.
+        """
+        total = options['requests']
+        targets = [DEFAULT_TARGETS[index % len(DEFAULT_TARGETS)] for index in range(total)]
+
+        # Прогрев: соединения, шаблоны и кэш версий данных
+        self.run_wsgi(DEFAULT_TARGETS, 1)
+
+        return [
+            (f'WSGI, {options["threads"]} потоков', *self.run_wsgi(targets, options['threads'])),
+            (f'ASGI, {options["concurrency"]} одновременно', *self.run_asgi(targets, options['concurrency'])),
+        ]
+
+    def run_wsgi(self, targets, threads):
+        """
+        Выполняет запросы через WSGI-обработчик в пуле потоков.
+
+        Returns:
+            tuple: (время, список задержек в мс, количество ошибок)
+        """
+        local = threading.local()
+
+        def request(target):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+                client.cookies = self.cookies
+            path, is_ajax = target
+            headers = {'X-Requested-With': 'XMLHttpRequest'} if is_ajax else {}
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(request, targets))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], sum(status != 200 for _, status in results)
+
+    def run_asgi(self, targets, concurrency):
+        """
+        Выполняет запросы через ASGI-приложение проекта в одном цикле событий.
+
+        Returns:
+            tuple: (время, список задержек в мс, количество ошибок)
+        """
+        application = get_asgi_application()
+        cookie = '; '.join(f'{morsel.key}={morsel.coded_value}' for morsel in self.cookies.values())
+
+        async def request(target, semaphore):
+            path, is_ajax = target
+            path, _, query = path.partition('?')
+            headers = [(b'host', b'testserver'), (b'cookie', cookie.encode('ascii'))]
+            if is_ajax:
+                headers.append((b'x-requested-with', b'XMLHttpRequest'))
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode('ascii'),
+                'query_string': query.encode('ascii'),
+                'root_path': '',
+                'headers': headers,
+                'client': ('127.0.0.1', 0),
+                'server': ('testserver', 80),
+            }
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # Клиент не отключается до конца ответа
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return (time.perf_counter() - started) * 1000, status[0]
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            started = time.perf_counter()
+            results = await asyncio.gather(*(request(target, semaphore) for target in targets))
+            return time.perf_counter() - started, results
+
+        elapsed, results = asyncio.run(run())
+        return elapsed, [latency for latency, _ in results], sum(status != 200 for _, status in results)
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+import statistics
+import time
+
+
+# Запросы по умолчанию: данные склада и AJAX-обновление дашборда
+DEFAULT_PATHS = ('/inventory/data/?period=month', '/?period=month')
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для замера затрат на соединение с базой данных.
+
+    Выполняет одни и те же запросы к представлениям с новым соединением на
+    каждый запрос (CONN_MAX_AGE=0) и с постоянным соединением, считает
+    открытые соединения и задержку запроса. Отдельно измеряет время
+    открытия одного соединения.
+    """
+    help = 'Замер задержки запросов с новыми и постоянными соединениями с базой данных'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=300,
+            help='Количество запросов в каждом режиме'
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=600,
+            help='CONN_MAX_AGE постоянного соединения (секунды)'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь запроса (можно указать несколько раз, по умолчанию данные склада и дашборд)'
+        )
+        parser.add_argument(
+            '--username',
+            help='Пользователь, от имени которого выполняются запросы (по умолчанию первый суперпользователь)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('Не найден пользователь для запросов. Создайте суперпользователя или укажите --username.')
+
+        paths = options['path'] or DEFAULT_PATHS
+        targets = [paths[index % len(paths)] for index in range(options['requests'])]
+        connection = connections[DEFAULT_DB_ALIAS]
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+
+        self.opened = 0
+        connection_created.connect(self.count_connection, dispatch_uid='benchmark_connections')
+        try:
+            client = Client()
+            client.force_login(user)
+
+            self.stdout.write(
+                f'СУБД: {connection.vendor}, открытие соединения: {self.measure_connect(connection):.2f} мс '
+                f'(проверка соединений: {connection.settings_dict["CONN_HEALTH_CHECKS"]})'
+            )
+            self.stdout.write(
+                f'{"Режим":<22} {"Соединений":>11} {"Среднее, мс":>12} {"p50, мс":>9} {"p95, мс":>9}'
+            )
+
+            # Тестовый клиент отправляет запросы на хост testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = {}
+                for max_age in (0, options['max_age']):
+                    connection.settings_dict['CONN_MAX_AGE'] = max_age
+                    connections.close_all()
+                    self.run_requests(client, paths)
+
+                    self.opened = 0
+                    latencies = self.run_requests(client, targets)
+                    results[max_age] = statistics.mean(latencies)
+                    latencies.sort()
+                    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+                    self.stdout.write(
+                        f'{f"CONN_MAX_AGE={max_age}":<22} {self.opened:>11} {results[max_age]:>12.2f} '
+                        f'{statistics.median(latencies):>9.2f} {p95:>9.2f}'
+                    )
+        finally:
+            connection_created.disconnect(dispatch_uid='benchmark_connections')
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+            connections.close_all()
+
+        self.stdout.write(
+            f'Экономия на запрос: {results[0] - results[options["max_age"]]:.2f} мс'
+        )
+
+    def count_connection(self, **kwargs):
+        self.opened += 1
+
+    def measure_connect(self, connection, repeat=20):
+        """
+        Возвращает медиану времени открытия соединения и первого запроса (мс).
+        """
+        samples = []
+        for _ in range(repeat):
+            connection.close()
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            samples.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        return statistics.median(samples)
+
+    def run_requests(self, client, paths):
+        """
+        Выполняет запросы по очереди и возвращает задержки (мс).
+        """
+        latencies = []
+        for path in paths:
+            headers = {'X-Requested-With': 'XMLHttpRequest'} if path.startswith('/?') else {}
+            started = time.perf_counter()
+            # Тестовый клиент не закрывает соединения по сигналам начала и
+            # окончания запроса, поэтому делаем это как обработчик сервера
+            close_old_connections()
+            response = client.get(path, headers=headers)
+            close_old_connections()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{path}: ответ {response.status_code}')
+        return latencies
@@ -0,0 +1,117 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Sum
+from dashboard.models import Shop, KPIRecord, InventoryCategory, InventoryRecord
+from ._benchmark import SyntheticDataMixin
+import statistics
+import time
+from datetime import timedelta
+
+
+class Command(SyntheticDataMixin, BaseCommand):
+    """
+    Команда управления Django для замера запросов дашборда с индексами и без них.
+
+    Выполняет типовые запросы представлений (поиск последней даты, фильтр по
+    периоду и цехам, агрегаты склада), выводит план выполнения и медиану времени.
+    Затем временно удаляет составные индексы KPIRecord/InventoryRecord и повторяет
+    замеры. Индексы восстанавливаются, сгенерированные данные удаляются в конце.
+    """
+    help = 'Замер запросов дашборда и склада с составными индексами и без них'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов каждого запроса'
+        )
+        self.add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        if options['shops']:
+            self.generate_dataset(options['shops'], options['items'], options['days'])
+
+        try:
+            self.stdout.write(self.style.MIGRATE_HEADING('С индексами'))
+            with_indexes = self.run_queries(options['repeat'])
+
+            with connection.schema_editor() as schema_editor:
+                for model in (KPIRecord, InventoryRecord):
+                    for index in model._meta.indexes:
+                        schema_editor.remove_index(model, index)
+
+            try:
+                self.stdout.write(self.style.MIGRATE_HEADING('Без индексов'))
+                without_indexes = self.run_queries(options['repeat'])
+            finally:
+                # Восстанавливаем индексы даже при ошибке замера
+                with connection.schema_editor() as schema_editor:
+                    for model in (KPIRecord, InventoryRecord):
+                        for index in model._meta.indexes:
+                            schema_editor.add_index(model, index)
+        finally:
+            if options['shops']:
+                self.cleanup_dataset()
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Итог (медиана, мс): без индексов / с индексами'))
+        for name in with_indexes:
+            before = without_indexes[name]
+            after = with_indexes[name]
+            speedup = before / after if after else 0
+            self.stdout.write(f'{name:<40} {before:>10.2f} {after:>10.2f}   x{speedup:.1f}')
+
+    def run_queries(self, repeat):
+        """
+        Выполняет типовые запросы, печатает план выполнения и возвращает медианы времени.
+        """
+        latest_kpi = KPIRecord.objects.aggregate(latest=Max('date'))['latest']
+        latest_inventory = InventoryRecord.objects.aggregate(latest=Max('date'))['latest']
+        if latest_kpi is None or latest_inventory is None:
+            self.stdout.write(self.style.ERROR('Нет данных для замера. Используйте --shops.'))
+            return {}
+
+        shop_ids = list(KPIRecord.objects.filter(date=latest_kpi).values_list('shop_id', flat=True)[:2])
+        category_id = InventoryRecord.objects.filter(date=latest_inventory).values_list(
+            'item__category_id', flat=True
+        ).first()
+
+        queries = {
+            'KPI: последняя дата': KPIRecord.objects.order_by('-date').values('date')[:1],
+            'KPI: год по цехам, страница отчета': KPIRecord.objects.filter(
+                date__gte=latest_kpi - timedelta(days=365), shop_id__in=shop_ids
+            ).order_by('-date', 'shop__name')[:20],
+            'KPI: месяц по всем цехам': KPIRecord.objects.filter(
+                date__gte=latest_kpi - timedelta(days=30)
+            ).values('date').annotate(output=Sum('output')),
+            'Склад: последняя дата': InventoryRecord.objects.order_by('-date').values('date')[:1],
+            'Склад: месяц по цехам и категории': InventoryRecord.objects.filter(
+                date__range=(latest_inventory - timedelta(days=30), latest_inventory),
+                shop_id__in=shop_ids,
+                item__category_id=category_id,
+            ).values('item_id').annotate(quantity=Sum('quantity')),
+            'Склад: неделя по всем цехам': InventoryRecord.objects.filter(
+                date__range=(latest_inventory - timedelta(days=7), latest_inventory),
+            ).values('date').annotate(quantity=Sum('quantity')),
+        }
+
+        timings = {}
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(queryset.explain())
+
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(samples)
+            self.stdout.write(f'Медиана: {timings[name]:.2f} мс\n')
+
+        return timings
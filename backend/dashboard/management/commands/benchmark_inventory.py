@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from dashboard.charts import chart_max_points
+from dashboard.models import InventoryRecord
+from dashboard.views import INVENTORY_PERIOD_CHOICES, _compose_inventory_payload, _inventory_period_range
+from ._benchmark import SyntheticDataMixin
+import statistics
+import time
+
+
+class Command(SyntheticDataMixin, BaseCommand):
+    """
+    Команда управления Django для замера расчета данных страницы склада.
+
+    Для каждого периода измеряет время построения ответа /inventory/data/
+    (без кэша ответов), количество SQL-запросов и число записей в периоде.
+    """
+    help = 'Замер расчета данных страницы склада по периодам'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов для каждого периода'
+        )
+        self.add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        if options['shops']:
+            self.generate_dataset(options['shops'], options['items'], options['days'])
+
+        try:
+            self.stdout.write(f'{"Период":<10} {"Записей":>10} {"Запросов":>9} {"Медиана, мс":>12}')
+            for period, _ in INVENTORY_PERIOD_CHOICES:
+                filters = {'period': period, 'category_id': None, 'shop_ids': [], 'max_points': chart_max_points()}
+                records = InventoryRecord.objects.filter(date__range=_inventory_period_range(period)).count()
+
+                samples = []
+                for _ in range(options['repeat']):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        _compose_inventory_payload(filters)
+                        samples.append((time.perf_counter() - started) * 1000)
+
+                self.stdout.write(
+                    f'{period:<10} {records:>10} {len(queries.captured_queries):>9} '
+                    f'{statistics.median(samples):>12.1f}'
+                )
+        finally:
+            if options['shops']:
+                self.cleanup_dataset()
@@ -0,0 +1,142 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from dashboard import cube as kpi_cube
+from dashboard.caching import mark_data_changed
+from dashboard.models import KPIRecord, Shop
+from dashboard.charts import chart_max_points
+from dashboard.rollups import PERIOD_GRAINS, load_kpi_rollups, rebuild_kpi_rollups, refresh_kpi_rollups
+from dashboard.views import _dashboard_chart_range, aggregate_kpi_summary, prepare_chart_data
+from ._benchmark import BENCHMARK_SHOP_PREFIX, SyntheticDataMixin
+import random
+import statistics
+import time
+
+
+class Command(SyntheticDataMixin, BaseCommand):
+    """
+    Команда управления Django для сравнения куба KPI с расчетом по агрегатам.
+
+    Для каждого периода дашборда и набора цехов (все цеха, каждый цех по
+    отдельности и случайные наборы) измеряет время расчета KPI-карточек и
+    графиков по агрегатам KPIRollup из базы данных и срезом куба в памяти,
+    а также проверяет, что результаты совпадают: при любом расхождении
+    команда завершается ошибкой. Отдельно измеряются полная загрузка куба
+    и дочитывание одного измененного дня.
+    """
+    help = 'Замер куба KPI в памяти против расчета по агрегатам в базе данных'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Количество повторов для каждого набора'
+        )
+        parser.add_argument(
+            '--subsets',
+            type=int,
+            default=20,
+            help='Количество случайных наборов цехов'
+        )
+        self.add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        if kpi_cube.np is None:
+            raise CommandError('Для куба KPI нужен пакет numpy (pip install numpy)')
+
+        if options['shops']:
+            self.generate_dataset(options['shops'], 0, options['days'])
+            # Пакетная вставка не вызывает сигналы: агрегаты пересчитываются явно
+            rebuild_kpi_rollups(shop_ids=list(
+                Shop.objects.filter(name__startswith=BENCHMARK_SHOP_PREFIX).values_list('id', flat=True)
+            ))
+            mark_data_changed('kpi')
+
+        try:
+            cube = kpi_cube.KPICube()
+            started = time.perf_counter()
+            cube.refresh()
+            self.stdout.write(
+                f'Загрузка куба: {(time.perf_counter() - started) * 1000:.1f} мс, '
+                f'цехов: {cube.counts.shape[0]}, дней: {cube.counts.shape[1]}, '
+                f'объем: {(cube.sums.nbytes + cube.counts.nbytes) / 2 ** 20:.1f} МиБ'
+            )
+            self.measure_refresh(cube)
+
+            shop_ids = [str(shop_id) for shop_id in Shop.objects.order_by('id').values_list('id', flat=True)]
+            rng = random.Random(42)
+            selections = [[]] + [[shop_id] for shop_id in shop_ids] + [
+                rng.sample(shop_ids, rng.randint(1, len(shop_ids)))
+                for _ in range(options['subsets'] if shop_ids else 0)
+            ]
+
+            self.stdout.write(
+                f'{"Период":<10} {"Наборов":>8} {"Агрегаты, мс":>13} {"Куб, мс":>9} '
+                f'{"Ускорение":>10} {"Расхождений":>12}'
+            )
+            total_mismatches = 0
+            for period in PERIOD_GRAINS:
+                orm_samples, cube_samples, mismatches = [], [], 0
+                for selection in selections:
+                    orm_time, expected = self.measure(options['repeat'], lambda: self.orm_answer(period, selection))
+                    cube_time, actual = self.measure(options['repeat'], lambda: self.cube_answer(cube, period, selection))
+                    orm_samples.append(orm_time)
+                    cube_samples.append(cube_time)
+                    # Сравнение вида ответа: значения, типы и порядок ключей
+                    if repr(expected) != repr(actual):
+                        mismatches += 1
+                        self.stderr.write(f'Расхождение: период {period}, цеха {selection or "все"}')
+
+                orm_median, cube_median = statistics.median(orm_samples), statistics.median(cube_samples)
+                self.stdout.write(
+                    f'{period:<10} {len(selections):>8} {orm_median:>13.2f} {cube_median:>9.3f} '
+                    f'{orm_median / cube_median:>9.0f}x {mismatches:>12}'
+                )
+                total_mismatches += mismatches
+        finally:
+            if options['shops']:
+                self.cleanup_dataset()
+
+        if total_mismatches:
+            raise CommandError(f'Результаты куба и агрегатов расходятся: {total_mismatches}')
+
+    def measure_refresh(self, cube):
+        """Измеряет дочитывание куба после изменения записей одного дня."""
+        latest = KPIRecord.objects.aggregate(latest=Max('date'))['latest']
+        if latest is None:
+            return
+        touched = set(KPIRecord.objects.filter(date=latest).values_list('shop_id', 'date'))
+        refresh_kpi_rollups(touched)
+        mark_data_changed('kpi')
+
+        started = time.perf_counter()
+        cube.refresh()
+        self.stdout.write(
+            f'Дочитывание после пересчета {len(touched)} агрегатов: '
+            f'{(time.perf_counter() - started) * 1000:.1f} мс'
+        )
+
+    def measure(self, repeat, answer):
+        """Возвращает медиану времени (мс) и результат расчета."""
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = answer()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), result
+
+    def orm_answer(self, period, shop_ids):
+        start_date, end_date, grain = _dashboard_chart_range(period)
+        rollup_rows = load_kpi_rollups(start_date, end_date, shop_ids, grain=grain)
+        return aggregate_kpi_summary(rollup_rows), prepare_chart_data(rollup_rows, grain, chart_max_points())
+
+    def cube_answer(self, cube, period, shop_ids):
+        start_date, end_date, grain = _dashboard_chart_range(period)
+        selection = cube.select(start_date, end_date, shop_ids)
+        return aggregate_kpi_summary([selection.totals()]), selection.chart_data(grain, chart_max_points())
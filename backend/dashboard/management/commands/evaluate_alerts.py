@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from dashboard.alerting import evaluate_alert_rules
+from dashboard.models import AlertRule
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для проверки правил уведомлений по записям KPI.
+    
+    Правила одного показателя проверяются одним запросом. Срабатывания
+    сохраняются в AlertEvent; уже сохраненные не дублируются, поэтому
+    команду можно повторно запускать за те же даты.
+    
+    Без --start-date/--end-date каждое правило проверяет только записи,
+    добавленные или измененные после его контрольной точки, и контрольная
+    точка сдвигается. С --interval
+    команда работает постоянно и повторяет проверку через заданное время.
+    """
+    help = 'Проверка правил уведомлений по записям KPI'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='Дата начала проверки (ГГГГ-ММ-ДД), без контрольных точек'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            help='Дата окончания проверки (ГГГГ-ММ-ДД), без контрольных точек'
+        )
+        parser.add_argument(
+            '--rule',
+            type=int,
+            action='append',
+            help='ID правила (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Сбросить контрольные точки и проверить все записи заново'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Повторять проверку каждые N секунд (0 - однократный запуск)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+        end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        incremental = start_date is None and end_date is None
+
+        rules = AlertRule.objects.all()
+        if options['rule']:
+            rules = rules.filter(id__in=options['rule'])
+
+        if options['full'] and incremental:
+            rules.update(checked_until=None)
+
+        while True:
+            self.stdout.write('Проверка правил уведомлений...')
+            started = time.perf_counter()
+            stats = evaluate_alert_rules(rules.all(), start_date, end_date, incremental=incremental)
+
+            checkpoint = f", контрольная точка: {stats['checked_until']}" if incremental else ''
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Проверено правил: {stats['rules']}, срабатываний: {stats['matches']}, "
+                f"новых событий: {stats['created']}{checkpoint} ({time.perf_counter() - started:.2f} с)"
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
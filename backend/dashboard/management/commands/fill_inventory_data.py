@@ -1,10 +1,14 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from dashboard.models import Shop, InventoryCategory, InventoryItem, InventoryRecord
+from dashboard.caching import mark_data_changed
+from dashboard.rollups import rebuild_inventory_rollups
+from ._bulk import BatchWriter, BulkInsertMixin
 import random
 from datetime import date, timedelta
 
 
-class Command(BaseCommand):
+class Command(BulkInsertMixin, BaseCommand):
     """
     Команда управления Django для заполнения базы данных фейковыми складскими данными.
     
@@ -12,6 +16,12 @@ class Command(BaseCommand):
     """
     help = 'Заполнение базы данных фейковыми складскими данными'
 
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        self.add_bulk_arguments(parser)
+
     def handle(self, *args, **kwargs):
         """
         Основной метод выполнения команды.
@@ -116,25 +126,32 @@ class Command(BaseCommand):
         end_date = date(2025, 4, 30)
         current_date = start_date
         
-        total_records = 0
-        while current_date <= end_date:
-            for shop in shops:
-                for item in items:
-                    # Генерируем случайные остатки
-                    quantity = random.randint(0, 1000)  # Общее количество
-                    reserved = random.randint(0, quantity // 2)  # Зарезервировано (до половины от общего)
-                    min_threshold = random.randint(10, 100)  # Минимальный порог
+        # Записи вставляются пакетами в одной транзакции
+        writer = BatchWriter(kwargs['batch_size'])
+        with transaction.atomic():
+            while current_date <= end_date:
+                for shop in shops:
+                    for item in items:
+                        # Генерируем случайные остатки
+                        quantity = random.randint(0, 1000)  # Общее количество
+                        reserved = random.randint(0, quantity // 2)  # Зарезервировано (до половины от общего)
+                        min_threshold = random.randint(10, 100)  # Минимальный порог
                     
-                    InventoryRecord.objects.create(
-                        item=item,
-                        shop=shop,
-                        date=current_date,
-                        quantity=quantity,
-                        reserved=reserved,
-                        min_threshold=min_threshold
-                    )
-                    total_records += 1
+                        writer.add(InventoryRecord(
+                            item_id=item.id,
+                            shop_id=shop.id,
+                            date=current_date,
+                            quantity=quantity,
+                            reserved=reserved,
+                            min_threshold=min_threshold
+                        ))
             
-            current_date += timedelta(days=1)
+                current_date += timedelta(days=1)
+            writer.flush()
+
+            # bulk_create не вызывает сигналы: агрегаты и кэш обновляются явно
+            rebuild_inventory_rollups(start_date, end_date, [shop.id for shop in shops])
+        mark_data_changed('inventory')
+        total_records = writer.counts[InventoryRecord]
         
         self.stdout.write(self.style.SUCCESS(f'✅ Создано {total_records} записей остатков для {len(shops)} цехов'))
\ No newline at end of file
@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from dashboard.models import Shop, KPIRecord, InventoryCategory, InventoryItem, InventoryRecord
+from dashboard.caching import mark_data_changed
+from dashboard.rollups import deferred_rollup_refresh, delete_records, rebuild_inventory_rollups
 import random
 from datetime import date, timedelta
 
@@ -45,7 +48,10 @@ class Command(BaseCommand):
         # Очищаем существующие данные, если нужно
         if options['clear']:
             self.stdout.write('Очистка существующих данных...')
-            InventoryRecord.objects.all().delete()
+            with transaction.atomic():
+                delete_records(InventoryRecord.objects.all())
+                rebuild_inventory_rollups()
+            mark_data_changed('inventory')
             self.stdout.write(self.style.SUCCESS('✅ Существующие данные удалены'))
 
         # Получаем все цеха
@@ -68,57 +74,59 @@ class Command(BaseCommand):
         
         day_counter = 0
         total_records = 0
-        while current_date <= end_date:
-            for shop in shops:
-                for item in items:
-                    # Генерируем реалистичные остатки для каждой позиции
-                    # Разные категории имеют разные уровни потребления
-                    category_factor = 1.0
-                    if item.category.name == "Провода и кабели":
-                        category_factor = 1.5  # Провода потребляются больше
-                    elif item.category.name == "Комплектующие для шкафов":
-                        category_factor = 1.2  # Комплектующие тоже востребованы
-                    elif item.category.name == "Измерительные приборы":
-                        category_factor = 0.7   # Приборы потребляются меньше
+        # Агрегаты остатков пересчитываются один раз после генерации
+        with deferred_rollup_refresh():
+            while current_date <= end_date:
+                for shop in shops:
+                    for item in items:
+                        # Генерируем реалистичные остатки для каждой позиции
+                        # Разные категории имеют разные уровни потребления
+                        category_factor = 1.0
+                        if item.category.name == "Провода и кабели":
+                            category_factor = 1.5  # Провода потребляются больше
+                        elif item.category.name == "Комплектующие для шкафов":
+                            category_factor = 1.2  # Комплектующие тоже востребованы
+                        elif item.category.name == "Измерительные приборы":
+                            category_factor = 0.7   # Приборы потребляются меньше
                     
-                    # Генерируем базовые остатки
-                    base_quantity = random.randint(50, 500)
-                    quantity = max(0, int(base_quantity * category_factor * random.uniform(0.8, 1.2)))
+                        # Генерируем базовые остатки
+                        base_quantity = random.randint(50, 500)
+                        quantity = max(0, int(base_quantity * category_factor * random.uniform(0.8, 1.2)))
                     
-                    # Генерируем зарезервированное количество (до трети от общего)
-                    reserved = random.randint(0, quantity // 3)
+                        # Генерируем зарезервированное количество (до трети от общего)
+                        reserved = random.randint(0, quantity // 3)
                     
-                    # Минимальный порог 10% от остатка
-                    min_threshold = max(5, int(quantity * 0.1))
+                        # Минимальный порог 10% от остатка
+                        min_threshold = max(5, int(quantity * 0.1))
                     
-                    # Генерируем потребность (может быть больше, чем остатки)
-                    demand = max(0, int(quantity * random.uniform(0.5, 2.0)))
+                        # Генерируем потребность (может быть больше, чем остатки)
+                        demand = max(0, int(quantity * random.uniform(0.5, 2.0)))
                     
-                    # Рассчитываем дефицит
-                    available = max(0, quantity - reserved)
-                    shortage = max(0, demand - available)
+                        # Рассчитываем дефицит
+                        available = max(0, quantity - reserved)
+                        shortage = max(0, demand - available)
                     
-                    # Создаем запись остатков
-                    InventoryRecord.objects.create(
-                        item=item,
-                        shop=shop,
-                        date=current_date,
-                        quantity=quantity,
-                        reserved=reserved,
-                        min_threshold=min_threshold,
-                        demand=demand,  # Потребность
-                        shortage=shortage  # Дефицит
-                    )
-                    total_records += 1
+                        # Создаем запись остатков
+                        InventoryRecord.objects.create(
+                            item=item,
+                            shop=shop,
+                            date=current_date,
+                            quantity=quantity,
+                            reserved=reserved,
+                            min_threshold=min_threshold,
+                            demand=demand,  # Потребность
+                            shortage=shortage  # Дефицит
+                        )
+                        total_records += 1
             
-            # Переходим к следующему дню
-            current_date += timedelta(days=1)
-            day_counter += 1
+                # Переходим к следующему дню
+                current_date += timedelta(days=1)
+                day_counter += 1
             
-            # Показываем прогресс
-            if day_counter % 5 == 0 or current_date > end_date:
-                progress = int(day_counter / total_days * 100)
-                self.stdout.write(f'Прогресс: {progress}%')
+                # Показываем прогресс
+                if day_counter % 5 == 0 or current_date > end_date:
+                    progress = int(day_counter / total_days * 100)
+                    self.stdout.write(f'Прогресс: {progress}%')
 
         # Выводим сообщение об успешном завершении
         self.stdout.write(self.style.SUCCESS(f'✅ Реалистичные складские данные успешно сгенерированы!'))
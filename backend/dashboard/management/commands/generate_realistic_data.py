@@ -1,16 +1,221 @@
 from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
 from dashboard.models import Shop, KPIRecord, InventoryCategory, InventoryItem, InventoryRecord
+from dashboard.caching import mark_data_changed
+from dashboard.rollups import delete_records, rebuild_inventory_rollups, rebuild_kpi_rollups
+from ._bulk import BatchWriter, BulkInsertMixin, ShardWriter, init_worker_process
+from concurrent.futures import ProcessPoolExecutor
 import random
+import time
 from datetime import date, timedelta
-from decimal import Decimal
 
 
-class Command(BaseCommand):
+# Базовые цеха; при --scale N создается 5 * N цехов по этим образцам
+SHOPS_DATA = [
+    {"name": "Цех №1", "capacity": 15000, "base_downtime": 5.0},
+    {"name": "Цех №2", "capacity": 12000, "base_downtime": 6.5},
+    {"name": "Цех №3", "capacity": 18000, "base_downtime": 4.0},
+    {"name": "Цех №4", "capacity": 10000, "base_downtime": 7.0},
+    {"name": "Цех №5", "capacity": 14000, "base_downtime": 5.5},
+]
+
+CATEGORIES_DATA = [
+    {"name": "Автоматические выключатели", "description": "Автоматические выключатели для защиты электрических цепей"},
+    {"name": "Розетки и выключатели", "description": "Розетки, выключатели и рамки для электромонтажа"},
+    {"name": "Провода и кабели", "description": "Электрические провода и кабели различного сечения"},
+    {"name": "Щитовое оборудование", "description": "Щиты, DIN-рейки, клеммы, предохранители"},
+    {"name": "Осветительное оборудование", "description": "Лампы, светильники, прожекторы"},
+    {"name": "Измерительные приборы", "description": "Мультиметры, амперметры, вольтметры"},
+    {"name": "Комплектующие для шкафов", "description": "Ручки, замки, вентиляторы для шкафов"},
+]
+
+ITEMS_DATA = [
+    # Автоматические выключатели
+    {"category": 0, "name": "Автоматический выключатель 1P 16A", "sku": "AV-1P-16A", "unit": "pcs"},
+    {"category": 0, "name": "Автоматический выключатель 1P 25A", "sku": "AV-1P-25A", "unit": "pcs"},
+    {"category": 0, "name": "Автоматический выключатель 3P 32A", "sku": "AV-3P-32A", "unit": "pcs"},
+    {"category": 0, "name": "Дифференциальный автомат 2P 16A", "sku": "DA-2P-16A", "unit": "pcs"},
+    {"category": 0, "name": "Дифференциальный автомат 4P 25A", "sku": "DA-4P-25A", "unit": "pcs"},
+
+    # Розетки и выключатели
+    {"category": 1, "name": "Розетка однофазная с заземлением", "sku": "RZ-1F-Z", "unit": "pcs"},
+    {"category": 1, "name": "Выключатель одноклавишный", "sku": "VK-1", "unit": "pcs"},
+    {"category": 1, "name": "Выключатель двухклавишный", "sku": "VK-2", "unit": "pcs"},
+    {"category": 1, "name": "Выключатель трехклавишный", "sku": "VK-3", "unit": "pcs"},
+    {"category": 1, "name": "Рамка одноклавишная", "sku": "RK-1", "unit": "pcs"},
+
+    # Провода и кабели
+    {"category": 2, "name": "Провод ВВГнг 3x2.5", "sku": "VVGN-3x2.5", "unit": "m"},
+    {"category": 2, "name": "Провод ВВГнг 5x4", "sku": "VVGN-5x4", "unit": "m"},
+    {"category": 2, "name": "Кабель КГ 3x1.5", "sku": "KG-3x1.5", "unit": "m"},
+    {"category": 2, "name": "Кабель КГ 4x2.5", "sku": "KG-4x2.5", "unit": "m"},
+    {"category": 2, "name": "Провод СИП 4x16", "sku": "SIP-4x16", "unit": "m"},
+
+    # Щитовое оборудование
+    {"category": 3, "name": "Щит распределительный 12 модулей", "sku": "SH-12", "unit": "pcs"},
+    {"category": 3, "name": "DIN-рейка 35мм 1м", "sku": "DIN-1M", "unit": "m"},
+    {"category": 3, "name": "Клеммы Phoenix 2P 10A", "sku": "KL-PH-2P-10A", "unit": "pcs"},
+    {"category": 3, "name": "Предохранитель ножевой ПН2", "sku": "PN-2", "unit": "pcs"},
+    {"category": 3, "name": "Шина PE 32A", "sku": "SH-PE-32A", "unit": "pcs"},
+
+    # Осветительное оборудование
+    {"category": 4, "name": "Лампа светодиодная 12W", "sku": "LED-12W", "unit": "pcs"},
+    {"category": 4, "name": "Лампа светодиодная 20W", "sku": "LED-20W", "unit": "pcs"},
+    {"category": 4, "name": "Светильник точечный", "sku": "SV-TCH", "unit": "pcs"},
+    {"category": 4, "name": "Прожектор светодиодный 50W", "sku": "PR-50W", "unit": "pcs"},
+    {"category": 4, "name": "Лента светодиодная 5м", "sku": "LED-LN-5M", "unit": "m"},
+
+    # Измерительные приборы
+    {"category": 5, "name": "Мультиметр цифровой", "sku": "MM-CIF", "unit": "pcs"},
+    {"category": 5, "name": "Амперметр аналоговый 10A", "sku": "AM-10A", "unit": "pcs"},
+    {"category": 5, "name": "Вольтметр цифровой", "sku": "VM-CIF", "unit": "pcs"},
+    {"category": 5, "name": "Тестер прозвонки", "sku": "TP-PRZ", "unit": "pcs"},
+    {"category": 5, "name": "Измеритель RCD", "sku": "IZM-RCD", "unit": "pcs"},
+
+    # Комплектующие для шкафов
+    {"category": 6, "name": "Ручка дверная", "sku": "RK-DOOR", "unit": "pcs"},
+    {"category": 6, "name": "Замок навесной", "sku": "ZM-NAV", "unit": "pcs"},
+    {"category": 6, "name": "Вентилятор 12V 0.5A", "sku": "VENT-12V", "unit": "pcs"},
+    {"category": 6, "name": "Уголок металлический", "sku": "UG-MET", "unit": "pcs"},
+    {"category": 6, "name": "Крепеж М4x20", "sku": "KR-M4x20", "unit": "pack"},
+]
+
+# Поправочный коэффициент потребления по категориям
+CATEGORY_FACTORS = {
+    "Провода и кабели": 1.5,  # Провода потребляются больше
+    "Комплектующие для шкафов": 1.2,  # Комплектующие тоже востребованы
+    "Измерительные приборы": 0.7,  # Приборы потребляются меньше
+}
+
+
+def build_shop_records(shop, items, start_date, end_date, rng):
+    """
+    Генерирует записи KPI и остатков одного цеха за период.
+
+    Состояние (общий уровень остатков) ведется отдельно для каждого цеха,
+    поэтому цеха можно генерировать независимо друг от друга.
+
+    Args:
+        shop (dict): Параметры цеха (id, name, capacity, base_downtime)
+        items (list): Пары (ID складской позиции, коэффициент категории)
+        start_date (date): Дата начала генерации
+        end_date (date): Дата окончания генерации
+        rng (random.Random): Генератор случайных чисел
+
+    Yields:
+        Model: Несохраненные объекты KPIRecord и InventoryRecord
+    """
+    capacity = shop["capacity"]
+    base_downtime = shop["base_downtime"]
+    shop_inventory = rng.randint(15000, 25000)
+
+    current_date = start_date
+    day_counter = 0
+    while current_date <= end_date:
+        # Добавляем сезонные и случайные колебания
+        seasonal_factor = 1 + 0.1 * abs((current_date.timetuple().tm_yday - 90) / 90)  # Пик в июне
+        random_factor = rng.uniform(0.9, 1.1)
+
+        # Расчет базовых метрик с учетом зависимостей
+        equipment_load = min(98, max(70, 85 + rng.uniform(-5, 5) + (day_counter % 7 == 0) * -5))
+        downtime_hours = max(1, base_downtime * (100 - equipment_load) / 100 * random_factor)
+        output = int(capacity * equipment_load / 100 * seasonal_factor * random_factor)
+
+        # Процент брака зависит от загрузки оборудования и простоя
+        defect_rate = max(0.5, min(8, 2.0 + (100 - equipment_load) / 20 + downtime_hours / 5))
+
+        # Общий уровень остатков на складе
+        inventory_change = int(output * 0.2) - int(output * 0.15)  # Производство минус потребление
+        shop_inventory = max(0, shop_inventory + inventory_change)
+
+        # Выполнение плана, индексы качества и производительности
+        plan_completion = max(0, min(100, equipment_load - (downtime_hours * 1.5)))
+        quality_index = max(0, min(100, 100 - defect_rate * 3))
+        productivity_index = max(0, min(100, equipment_load - downtime_hours * 0.5))
+
+        yield KPIRecord(
+            shop_id=shop["id"],
+            date=current_date,
+            output=output,
+            downtime_hours=round(downtime_hours, 2),
+            defect_rate=round(defect_rate, 2),
+            equipment_load=round(equipment_load, 2),
+            inventory_level=shop_inventory,
+            # Объем ДСЕ (деталей, сборочных единиц) и изготовленные шкафы
+            dse_volume=int(output * rng.uniform(0.8, 1.2)),
+            cabinets_produced=int(output * rng.uniform(0.1, 0.3)),
+            plan_completion=round(plan_completion, 2),
+            quality_index=round(quality_index, 2),
+            productivity_index=round(productivity_index, 2),
+            energy_consumption=round(equipment_load * output / 1000 * rng.uniform(0.95, 1.05), 2),
+            material_utilization=round(max(0, min(100, 90 + (100 - quality_index) * 0.05)), 2),
+        )
+
+        # Складские записи: разные категории имеют разные уровни потребления
+        for item_id, category_factor in items:
+            base_quantity = rng.randint(50, 500)
+            quantity = max(0, int(base_quantity * category_factor * rng.uniform(0.8, 1.2)))
+            yield InventoryRecord(
+                item_id=item_id,
+                shop_id=shop["id"],
+                date=current_date,
+                quantity=quantity,
+                reserved=rng.randint(0, quantity // 3),  # Зарезервировано (до трети от общего)
+                min_threshold=max(5, int(quantity * 0.1)),  # Минимальный порог 10% от остатка
+            )
+
+        current_date += timedelta(days=1)
+        day_counter += 1
+
+
+def shop_random(seed, shop):
+    """
+    Возвращает генератор случайных чисел цеха.
+
+    Зерно зависит только от общего зерна и названия цеха, поэтому данные
+    цеха не зависят от числа процессов и порядка их выполнения.
+    """
+    return random.Random(f'{seed}:{shop["name"]}')
+
+
+def generate_shop_shard(shop, items, start_date, end_date, seed, batch_size):
+    """
+    Генерирует и записывает данные одного цеха в дочернем процессе.
+
+    Args:
+        shop (dict): Параметры цеха (id, name, capacity, base_downtime)
+        items (list): Пары (ID складской позиции, коэффициент категории)
+        start_date (date): Дата начала генерации
+        end_date (date): Дата окончания генерации
+        seed (int): Общее зерно генерации
+        batch_size (int): Размер пакета записи
+
+    Returns:
+        tuple: Количество записанных записей KPI и складских записей
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    writer = ShardWriter(connection, batch_size)
+    try:
+        with transaction.atomic():
+            for record in build_shop_records(shop, items, start_date, end_date, shop_random(seed, shop)):
+                writer.add(record)
+            writer.flush()
+    finally:
+        connection.close()
+    return writer.counts[KPIRecord], writer.counts[InventoryRecord]
+
+
+class Command(BulkInsertMixin, BaseCommand):
     """
     Команда управления Django для генерации реалистичных данных для дашборда.
     
     Создает цеха и заполняет таблицу KPIRecord реалистичными данными с учетом
-    взаимосвязей между различными метриками.
+    взаимосвязей между различными метриками. Записи вставляются пакетами в
+    одной транзакции; агрегаты KPI пересчитываются один раз в конце.
+
+    С --workers N цеха распределяются между N процессами. Каждый процесс
+    пишет свои цеха напрямую: COPY на PostgreSQL, пакетные INSERT на SQLite.
+    Данные цеха определяются зерном --seed и не зависят от числа процессов.
     """
     help = 'Генерация реалистичных данных для дашборда'
 
@@ -35,6 +240,25 @@ class Command(BaseCommand):
             action='store_true',
             help='Очистить существующие данные перед генерацией'
         )
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1,
+            help='Множитель объема: 5 * N цехов и 35 * N складских позиций (по умолчанию 1)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество процессов генерации (цеха распределяются между процессами)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Зерно генерации для воспроизводимых данных (по умолчанию случайное)'
+        )
+        self.add_bulk_arguments(parser)
 
     def handle(self, *args, **options):
         """
@@ -43,48 +267,126 @@ class Command(BaseCommand):
         # Парсим даты
         start_date = date.fromisoformat(options['start_date'])
         end_date = date.fromisoformat(options['end_date'])
+        scale = max(1, options['scale'])
         
         # Очищаем существующие данные, если нужно
         if options['clear']:
             self.stdout.write('Очистка существующих данных...')
-            KPIRecord.objects.all().delete()
-            InventoryRecord.objects.all().delete()
+            with transaction.atomic():
+                delete_records(KPIRecord.objects.all())
+                delete_records(InventoryRecord.objects.all())
+                rebuild_kpi_rollups()
+                rebuild_inventory_rollups()
+            mark_data_changed()
             self.stdout.write(self.style.SUCCESS('✅ Существующие данные удалены'))
 
-        # Создание цехов
+        shops = self.ensure_shops(scale)
+        items = self.ensure_items(scale)
+
+        self.stdout.write(
+            f'Генерация данных с {start_date} по {end_date}: '
+            f'{len(shops)} цехов, {len(items)} складских позиций...'
+        )
+        started = time.perf_counter()
+
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        self.stdout.write(f'Зерно генерации: {seed}')
+
+        if options['workers'] > 1:
+            kpi_count, inventory_count = self.generate_parallel(
+                shops, items, start_date, end_date, seed, options['workers'], options['batch_size']
+            )
+            rebuild_kpi_rollups(start_date, end_date, [shop["id"] for shop in shops])
+            rebuild_inventory_rollups(start_date, end_date, [shop["id"] for shop in shops])
+        else:
+            writer = BatchWriter(options['batch_size'])
+            progress_step = max(1, len(shops) // 10)
+            with transaction.atomic():
+                for index, shop in enumerate(shops, 1):
+                    rng = shop_random(seed, shop)
+                    for record in build_shop_records(shop, items, start_date, end_date, rng):
+                        writer.add(record)
+
+                    # Показываем прогресс
+                    if index % progress_step == 0 or index == len(shops):
+                        self.stdout.write(f'Прогресс: {int(index / len(shops) * 100)}%')
+                writer.flush()
+
+                # bulk_create не вызывает сигналы: агрегаты и кэш обновляются явно
+                rebuild_kpi_rollups(start_date, end_date, [shop["id"] for shop in shops])
+                rebuild_inventory_rollups(start_date, end_date, [shop["id"] for shop in shops])
+            kpi_count, inventory_count = writer.counts[KPIRecord], writer.counts[InventoryRecord]
+        mark_data_changed()
+
+        # Выводим сообщение об успешном завершении
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ Реалистичные данные успешно сгенерированы за {elapsed:.1f} с!'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {kpi_count} записей KPI и {inventory_count} складских записей '
+            f'({(kpi_count + inventory_count) / elapsed:.0f} записей/с)'
+        ))
+
+    def generate_parallel(self, shops, items, start_date, end_date, seed, workers, batch_size):
+        """
+        Генерирует данные цехов в пуле процессов, по одному цеху на задачу.
+
+        Returns:
+            tuple: Количество записанных записей KPI и складских записей
+        """
+        self.stdout.write(f'Процессов генерации: {workers}')
+
+        # Дочерние процессы открывают собственные соединения с базой данных
+        connections.close_all()
+
+        kpi_count = inventory_count = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_process) as pool:
+            futures = [
+                pool.submit(generate_shop_shard, shop, items, start_date, end_date, seed, batch_size)
+                for shop in shops
+            ]
+            for index, future in enumerate(futures, 1):
+                shop_kpi, shop_inventory = future.result()
+                kpi_count += shop_kpi
+                inventory_count += shop_inventory
+                self.stdout.write(f'Цех {index}/{len(shops)}: {shop_kpi} записей KPI, {shop_inventory} складских записей')
+
+        return kpi_count, inventory_count
+
+    def ensure_shops(self, scale):
+        """
+        Возвращает параметры цехов, создавая недостающие цеха одной вставкой.
+        """
         shops_data = [
-            {"name": "Цех №1", "capacity": 15000, "base_downtime": 5.0},
-            {"name": "Цех №2", "capacity": 12000, "base_downtime": 6.5},
-            {"name": "Цех №3", "capacity": 18000, "base_downtime": 4.0},
-            {"name": "Цех №4", "capacity": 10000, "base_downtime": 7.0},
-            {"name": "Цех №5", "capacity": 14000, "base_downtime": 5.5},
+            dict(template, name=f"Цех №{index + 1}")
+            for index, template in enumerate(SHOPS_DATA * scale)
         ]
-        
-        shop_objects = []
-        for shop_data in shops_data:
-            shop, created = Shop.objects.get_or_create(
-                name=shop_data["name"],
-                defaults={
-                    "name": shop_data["name"]
-                }
-            )
-            shop.capacity = shop_data["capacity"]
-            shop.base_downtime = shop_data["base_downtime"]
-            shop_objects.append(shop)
+        names = [shop_data["name"] for shop_data in shops_data]
 
-        # Создание категорий складских позиций (если еще не созданы)
-        categories_data = [
-            {"name": "Автоматические выключатели", "description": "Автоматические выключатели для защиты электрических цепей"},
-            {"name": "Розетки и выключатели", "description": "Розетки, выключатели и рамки для электромонтажа"},
-            {"name": "Провода и кабели", "description": "Электрические провода и кабели различного сечения"},
-            {"name": "Щитовое оборудование", "description": "Щиты, DIN-рейки, клеммы, предохранители"},
-            {"name": "Осветительное оборудование", "description": "Лампы, светильники, прожекторы"},
-            {"name": "Измерительные приборы", "description": "Мультиметры, амперметры, вольтметры"},
-            {"name": "Комплектующие для шкафов", "description": "Ручки, замки, вентиляторы для шкафов"},
+        existing = set(Shop.objects.filter(name__in=names).values_list('name', flat=True))
+        Shop.objects.bulk_create([Shop(name=name) for name in names if name not in existing])
+        shop_ids = dict(Shop.objects.filter(name__in=names).values_list('name', 'id'))
+
+        return [
+            {
+                "id": shop_ids[shop_data["name"]],
+                "name": shop_data["name"],
+                "capacity": shop_data["capacity"],
+                "base_downtime": shop_data["base_downtime"],
+            }
+            for shop_data in shops_data
         ]
-        
+
+    def ensure_items(self, scale):
+        """
+        Возвращает пары (ID позиции, коэффициент категории), создавая
+        недостающие категории и позиции.
+
+        Категории загружаются вместе с позициями, поэтому при генерации
+        записей нет обращений к базе данных за категорией.
+        """
+        # Создание категорий складских позиций (если еще не созданы)
         categories = []
-        for cat_data in categories_data:
+        for cat_data in CATEGORIES_DATA:
             category, created = InventoryCategory.objects.get_or_create(
                 name=cat_data["name"],
                 defaults={
@@ -93,180 +395,30 @@ class Command(BaseCommand):
             )
             categories.append(category)
 
-        # Создание складских позиций (если еще не созданы)
-        items_data = [
-            # Автоматические выключатели
-            {"category": categories[0], "name": "Автоматический выключатель 1P 16A", "sku": "AV-1P-16A", "unit": "pcs"},
-            {"category": categories[0], "name": "Автоматический выключатель 1P 25A", "sku": "AV-1P-25A", "unit": "pcs"},
-            {"category": categories[0], "name": "Автоматический выключатель 3P 32A", "sku": "AV-3P-32A", "unit": "pcs"},
-            {"category": categories[0], "name": "Дифференциальный автомат 2P 16A", "sku": "DA-2P-16A", "unit": "pcs"},
-            {"category": categories[0], "name": "Дифференциальный автомат 4P 25A", "sku": "DA-4P-25A", "unit": "pcs"},
-            
-            # Розетки и выключатели
-            {"category": categories[1], "name": "Розетка однофазная с заземлением", "sku": "RZ-1F-Z", "unit": "pcs"},
-            {"category": categories[1], "name": "Выключатель одноклавишный", "sku": "VK-1", "unit": "pcs"},
-            {"category": categories[1], "name": "Выключатель двухклавишный", "sku": "VK-2", "unit": "pcs"},
-            {"category": categories[1], "name": "Выключатель трехклавишный", "sku": "VK-3", "unit": "pcs"},
-            {"category": categories[1], "name": "Рамка одноклавишная", "sku": "RK-1", "unit": "pcs"},
-            
-            # Провода и кабели
-            {"category": categories[2], "name": "Провод ВВГнг 3x2.5", "sku": "VVGN-3x2.5", "unit": "m"},
-            {"category": categories[2], "name": "Провод ВВГнг 5x4", "sku": "VVGN-5x4", "unit": "m"},
-            {"category": categories[2], "name": "Кабель КГ 3x1.5", "sku": "KG-3x1.5", "unit": "m"},
-            {"category": categories[2], "name": "Кабель КГ 4x2.5", "sku": "KG-4x2.5", "unit": "m"},
-            {"category": categories[2], "name": "Провод СИП 4x16", "sku": "SIP-4x16", "unit": "m"},
-            
-            # Щитовое оборудование
-            {"category": categories[3], "name": "Щит распределительный 12 модулей", "sku": "SH-12", "unit": "pcs"},
-            {"category": categories[3], "name": "DIN-рейка 35мм 1м", "sku": "DIN-1M", "unit": "m"},
-            {"category": categories[3], "name": "Клеммы Phoenix 2P 10A", "sku": "KL-PH-2P-10A", "unit": "pcs"},
-            {"category": categories[3], "name": "Предохранитель ножевой ПН2", "sku": "PN-2", "unit": "pcs"},
-            {"category": categories[3], "name": "Шина PE 32A", "sku": "SH-PE-32A", "unit": "pcs"},
-            
-            # Осветительное оборудование
-            {"category": categories[4], "name": "Лампа светодиодная 12W", "sku": "LED-12W", "unit": "pcs"},
-            {"category": categories[4], "name": "Лампа светодиодная 20W", "sku": "LED-20W", "unit": "pcs"},
-            {"category": categories[4], "name": "Светильник точечный", "sku": "SV-TCH", "unit": "pcs"},
-            {"category": categories[4], "name": "Прожектор светодиодный 50W", "sku": "PR-50W", "unit": "pcs"},
-            {"category": categories[4], "name": "Лента светодиодная 5м", "sku": "LED-LN-5M", "unit": "m"},
-            
-            # Измерительные приборы
-            {"category": categories[5], "name": "Мультиметр цифровой", "sku": "MM-CIF", "unit": "pcs"},
-            {"category": categories[5], "name": "Амперметр аналоговый 10A", "sku": "AM-10A", "unit": "pcs"},
-            {"category": categories[5], "name": "Вольтметр цифровой", "sku": "VM-CIF", "unit": "pcs"},
-            {"category": categories[5], "name": "Тестер прозвонки", "sku": "TP-PRZ", "unit": "pcs"},
-            {"category": categories[5], "name": "Измеритель RCD", "sku": "IZM-RCD", "unit": "pcs"},
-            
-            # Комплектующие для шкафов
-            {"category": categories[6], "name": "Ручка дверная", "sku": "RK-DOOR", "unit": "pcs"},
-            {"category": categories[6], "name": "Замок навесной", "sku": "ZM-NAV", "unit": "pcs"},
-            {"category": categories[6], "name": "Вентилятор 12V 0.5A", "sku": "VENT-12V", "unit": "pcs"},
-            {"category": categories[6], "name": "Уголок металлический", "sku": "UG-MET", "unit": "pcs"},
-            {"category": categories[6], "name": "Крепеж М4x20", "sku": "KR-M4x20", "unit": "pack"},
-        ]
-        
-        items = []
-        for item_data in items_data:
-            item, created = InventoryItem.objects.get_or_create(
-                sku=item_data["sku"],
-                defaults={
-                    "category": item_data["category"],
-                    "name": item_data["name"],
-                    "unit": item_data["unit"]
-                }
-            )
-            items.append(item)
+        # Копии каталога при --scale отличаются суффиксом артикула
+        items_data = []
+        for copy in range(scale):
+            suffix = '' if copy == 0 else f'-{copy + 1}'
+            for item_data in ITEMS_DATA:
+                items_data.append(dict(
+                    item_data,
+                    category=categories[item_data["category"]],
+                    sku=f'{item_data["sku"]}{suffix}',
+                    name=item_data["name"] if copy == 0 else f'{item_data["name"]} (вариант {copy + 1})',
+                ))
+        skus = [item_data["sku"] for item_data in items_data]
 
-        # Генерация KPI с учетом реалистичных зависимостей
-        current_date = start_date
-        total_days = (end_date - start_date).days + 1
-        
-        # Инициализируем базовые значения для каждого цеха
-        shop_inventory = {shop.id: random.randint(15000, 25000) for shop in shop_objects}
-        
-        self.stdout.write(f'Генерация данных с {start_date} по {end_date}...')
-        
-        day_counter = 0
-        total_inventory_records = 0
-        while current_date <= end_date:
-            for shop in shop_objects:
-                # Базовые параметры цеха
-                capacity = shop.capacity
-                base_downtime = shop.base_downtime
-                
-                # Добавляем сезонные и случайные колебания
-                seasonal_factor = 1 + 0.1 * abs((current_date.timetuple().tm_yday - 90) / 90)  # Пик в июне
-                random_factor = random.uniform(0.9, 1.1)
-                
-                # Расчет базовых метрик с учетом зависимостей
-                equipment_load = min(98, max(70, 85 + random.uniform(-5, 5) + (day_counter % 7 == 0) * -5))
-                downtime_hours = max(1, base_downtime * (100 - equipment_load) / 100 * random_factor)
-                output = int(capacity * equipment_load / 100 * seasonal_factor * random_factor)
-                
-                # Процент брака зависит от загрузки оборудования и простоя
-                defect_rate = max(0.5, min(8, 2.0 + (100 - equipment_load) / 20 + downtime_hours / 5))
-                
-                # Общий уровень остатков на складе
-                inventory_change = int(output * 0.2) - int(output * 0.15)  # Производство минус потребление
-                shop_inventory[shop.id] = max(0, shop_inventory[shop.id] + inventory_change)
-                inventory_level = shop_inventory[shop.id]
-                
-                # Объем ДСЕ (деталей, сборочных единиц)
-                dse_volume = int(output * random.uniform(0.8, 1.2))
-                
-                # Количество изготовленных шкафов
-                cabinets_produced = int(output * random.uniform(0.1, 0.3))
-                
-                # Выполнение плана
-                plan_completion = max(0, min(100, equipment_load - (downtime_hours * 1.5)))
-                
-                # Индекс качества
-                quality_index = max(0, min(100, 100 - defect_rate * 3))
-                
-                # Индекс производительности
-                productivity_index = max(0, min(100, equipment_load - downtime_hours * 0.5))
-                
-                # Потребление энергии
-                energy_consumption = equipment_load * output / 1000 * random.uniform(0.95, 1.05)
-                
-                # Использование материалов
-                material_utilization = max(0, min(100, 90 + (100 - quality_index) * 0.05))
-                
-                # Создаем запись KPI
-                KPIRecord.objects.create(
-                    shop=shop,
-                    date=current_date,
-                    output=output,
-                    downtime_hours=round(downtime_hours, 2),
-                    defect_rate=round(defect_rate, 2),
-                    equipment_load=round(equipment_load, 2),
-                    inventory_level=inventory_level,
-                    dse_volume=dse_volume,
-                    cabinets_produced=cabinets_produced,
-                    plan_completion=round(plan_completion, 2),
-                    quality_index=round(quality_index, 2),
-                    productivity_index=round(productivity_index, 2),
-                    energy_consumption=round(energy_consumption, 2),
-                    material_utilization=round(material_utilization, 2)
-                )
-                
-                # Генерация складских записей для текущего дня
-                for item in items:
-                    # Генерируем реалистичные остатки для каждой позиции
-                    # Разные категории имеют разные уровни потребления
-                    category_factor = 1.0
-                    if item.category.name == "Провода и кабели":
-                        category_factor = 1.5  # Провода потребляются больше
-                    elif item.category.name == "Комплектующие для шкафов":
-                        category_factor = 1.2  # Комплектующие тоже востребованы
-                    elif item.category.name == "Измерительные приборы":
-                        category_factor = 0.7   # Приборы потребляются меньше
-                    
-                    # Генерируем остатки с учетом потребления
-                    base_quantity = random.randint(50, 500)
-                    quantity = max(0, int(base_quantity * category_factor * random.uniform(0.8, 1.2)))
-                    reserved = random.randint(0, quantity // 3)  # Зарезервировано (до трети от общего)
-                    min_threshold = max(5, int(quantity * 0.1))  # Минимальный порог 10% от остатка
-                    
-                    InventoryRecord.objects.create(
-                        item=item,
-                        shop=shop,
-                        date=current_date,
-                        quantity=quantity,
-                        reserved=reserved,
-                        min_threshold=min_threshold
-                    )
-                    total_inventory_records += 1
-            
-            # Переходим к следующему дню
-            current_date += timedelta(days=1)
-            day_counter += 1
-            
-            # Показываем прогресс
-            if day_counter % 5 == 0 or current_date > end_date:
-                progress = int(day_counter / total_days * 100)
-                self.stdout.write(f'Прогресс: {progress}%')
+        # Создание складских позиций (если еще не созданы)
+        existing = set(InventoryItem.objects.filter(sku__in=skus).values_list('sku', flat=True))
+        InventoryItem.objects.bulk_create([
+            InventoryItem(**item_data) for item_data in items_data if item_data["sku"] not in existing
+        ])
 
-        # Выводим сообщение об успешном завершении
-        self.stdout.write(self.style.SUCCESS(f'✅ Реалистичные данные успешно сгенерированы!'))
-        self.stdout.write(self.style.SUCCESS(f'Создано {total_inventory_records} складских записей'))
\ No newline at end of file
+        items = {
+            item.sku: item
+            for item in InventoryItem.objects.filter(sku__in=skus).select_related('category')
+        }
+        return [
+            (items[sku].id, CATEGORY_FACTORS.get(items[sku].category.name, 1.0))
+            for sku in skus
+        ]
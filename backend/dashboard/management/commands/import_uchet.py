@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.caching import mark_data_changed
+from dashboard.imports import IMPORT_BATCH_SIZE, UchetImporter, iter_uchet_cabinets, iter_xlsx_rows
+from dashboard.rollups import rebuild_inventory_rollups
+from dashboard.models import Shop
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для загрузки файла учета шкафов (uchet.xlsm).
+
+    Лист читается потоково, шкафы загружаются в складские позиции и записи
+    остатков выбранного цеха на дату среза (см. dashboard/imports.py).
+    Повторная загрузка за ту же дату обновляет записи.
+    """
+    help = 'Загрузка файла учета шкафов (uchet.xlsm) в складские позиции и остатки'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(settings.BASE_DIR / 'main' / 'uchet.xlsm'),
+            help='Файл учета (по умолчанию main/uchet.xlsm)'
+        )
+        parser.add_argument(
+            '--sheet',
+            help='Название листа (по умолчанию первый лист)'
+        )
+        parser.add_argument(
+            '--shop',
+            help='Название цеха для записей остатков (по умолчанию первый цех)'
+        )
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Дата среза остатков (ГГГГ-ММ-ДД, по умолчанию сегодня)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Количество шкафов в одной транзакции (по умолчанию {IMPORT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        shops = Shop.objects.order_by('id')
+        shop = shops.filter(name=options['shop']).first() if options['shop'] else shops.first()
+        if shop is None:
+            raise CommandError('Не найден цех для записей остатков. Сначала создайте цеха.')
+
+        snapshot_date = date.fromisoformat(options['date']) if options['date'] else date.today()
+
+        self.stdout.write(f'Загрузка {options["path"]} в цех "{shop.name}" на {snapshot_date}...')
+        started = time.perf_counter()
+        self.rows = 0
+        try:
+            importer = UchetImporter(shop, snapshot_date, options['batch_size'])
+            stats = importer.load(iter_uchet_cabinets(self.count_rows(
+                iter_xlsx_rows(options['path'], options['sheet'])
+            )))
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать файл учета: {error}')
+        elapsed = time.perf_counter() - started
+
+        # bulk_create не отправляет сигналы сохранения
+        rebuild_inventory_rollups(snapshot_date, snapshot_date, [shop.id])
+        mark_data_changed('inventory')
+
+        self.stdout.write(
+            f'Строк листа: {self.rows}, шкафов: {stats["cabinets"]}, '
+            f'новых позиций: {stats["items_created"]}, записей остатков: {stats["records"]}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Загрузка завершена за {elapsed:.2f} с ({self.rows / elapsed:.0f} строк/с)'
+        ))
+
+    def count_rows(self, rows):
+        for row in rows:
+            self.rows += 1
+            yield row
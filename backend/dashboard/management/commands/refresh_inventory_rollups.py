@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from dashboard.caching import mark_data_changed
+from dashboard.rollups import rebuild_inventory_rollups
+from datetime import date
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для пересчета агрегатов остатков.
+
+    Без аргументов полностью перестраивает таблицы InventoryRollup и
+    InventoryDailyTotal. С аргументами --start-date/--end-date пересчитывает
+    только интервалы, пересекающиеся с указанным диапазоном.
+    """
+    help = 'Пересчет предрассчитанных агрегатов остатков (неделя/месяц и дневные суммы по категориям)'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='Дата начала пересчета (ГГГГ-ММ-ДД)'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            help='Дата окончания пересчета (ГГГГ-ММ-ДД)'
+        )
+        parser.add_argument(
+            '--shop',
+            type=int,
+            action='append',
+            help='ID цеха (можно указать несколько раз)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+        end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+
+        self.stdout.write('Пересчет агрегатов остатков...')
+        created = rebuild_inventory_rollups(start_date, end_date, options['shop'])
+        mark_data_changed('inventory')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Записано {created} агрегатов остатков'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from dashboard.rollups import rebuild_kpi_rollups
+from datetime import date
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для пересчета агрегатов KPI.
+    
+    Без аргументов полностью перестраивает таблицу KPIRollup. С аргументами
+    --start-date/--end-date пересчитывает только интервалы, пересекающиеся
+    с указанным диапазоном.
+    """
+    help = 'Пересчет предрассчитанных агрегатов KPI (день/неделя/месяц)'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='Дата начала пересчета (ГГГГ-ММ-ДД)'
+        )
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            help='Дата окончания пересчета (ГГГГ-ММ-ДД)'
+        )
+        parser.add_argument(
+            '--shop',
+            type=int,
+            action='append',
+            help='ID цеха (можно указать несколько раз)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+        end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+
+        self.stdout.write('Пересчет агрегатов KPI...')
+        created = rebuild_kpi_rollups(start_date, end_date, options['shop'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Записано {created} агрегатов KPI'))
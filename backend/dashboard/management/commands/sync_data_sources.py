@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dashboard.models import DataSource
+from dashboard.sync import SYNC_BATCH_SIZE, source_is_due, sync_data_source
+import time
+
+
+class Command(BaseCommand):
+    """
+    Команда управления Django для синхронизации источников данных 1С и Access.
+
+    Источник синхронизируется, если он включен и с последней синхронизации
+    прошел интервал его расписания (см. dashboard/sync.py). Читаются только
+    строки выгрузки после водяного знака источника. С --interval команда
+    работает постоянно и проверяет расписания через заданное время.
+    """
+    help = 'Синхронизация источников данных 1С и Access по расписанию'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+        """
+        parser.add_argument(
+            '--source',
+            choices=[kind for kind, _ in DataSource.KIND_CHOICES],
+            action='append',
+            help='Тип источника (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Синхронизировать включенные источники без учета расписания'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Сбросить водяные знаки и прочитать выгрузки включенных источников с начала'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SYNC_BATCH_SIZE,
+            help=f'Количество строк в одной транзакции (по умолчанию {SYNC_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Проверять расписания каждые N секунд (0 - однократный запуск)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Основной метод выполнения команды.
+        """
+        sources = DataSource.objects.filter(enabled=True).exclude(path='')
+        if options['source']:
+            sources = sources.filter(kind__in=options['source'])
+
+        full = options['full']
+        while True:
+            now = timezone.now()
+            due = [source for source in sources.all() if options['force'] or full or source_is_due(source, now)]
+            if not due:
+                self.stdout.write('Нет источников для синхронизации')
+
+            for source in due:
+                self.stdout.write(f'Синхронизация "{source}" из {source.path}...')
+                run = sync_data_source(source, options['batch_size'], full=full)
+                if run.status == 'error':
+                    self.stdout.write(self.style.ERROR(f'❌ Ошибка: {run.error}'))
+                    continue
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Прочитано строк: {run.rows_read}, записано: {run.rows_written}, '
+                    f'пропущено: {run.rows_skipped}, позиция: {run.position} '
+                    f'({run.duration:.2f} с, {run.rows_per_second:.0f} строк/с)'
+                ))
+
+            if not options['interval']:
+                break
+            # Водяные знаки сбрасываются только при первом запуске
+            full = False
+            time.sleep(options['interval'])
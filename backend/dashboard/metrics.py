@@ -0,0 +1,254 @@
+"""
+Метрики запросов к представлениям дашборда.
+
+RequestMetricsMiddleware (dashboard/middleware.py) измеряет время ответа
+каждого представления из dashboard/urls.py. Для доли запросов
+REQUEST_METRICS_SAMPLE_RATE дополнительно считаются количество и
+суммарное время SQL-запросов, самый долгий запрос и время рендеринга
+шаблонов. Значения отдаются заголовком Server-Timing и накапливаются в
+гистограммах процесса, которые отдает представление metrics в текстовом
+формате Prometheus.
+
+SQL-запросы учитываются обработчиком execute_wrappers, который ставится на
+каждое соединение с базой данных при его открытии, время шаблонов -
+бэкендом шаблонов TimedDjangoTemplates. Текущий запрос хранится в
+contextvars, поэтому учитываются и запросы из потоков sync_to_async
+(_run_concurrently). Текст SQL сохраняется только при
+REQUEST_METRICS_QUERY_TEXT.
+"""
+from contextvars import ContextVar
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# Границы гистограмм длительности (секунды) и количества SQL-запросов
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Длина текста самого долгого запроса в Server-Timing
+QUERY_TEXT_LIMIT = 200
+
+_current = ContextVar('dashboard_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Измерения одного запроса.
+
+    Атрибуты:
+        queries (int): Количество SQL-запросов
+        sql_time (float): Суммарное время SQL-запросов, секунды
+        slowest_time (float): Время самого долгого запроса, секунды
+        slowest_sql (str): Текст самого долгого запроса (при REQUEST_METRICS_QUERY_TEXT)
+        template_time (float): Время рендеринга шаблонов, секунды
+    """
+
+    def __init__(self, keep_query_text=False):
+        self.keep_query_text = keep_query_text
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = ''
+        self.template_time = 0.0
+        # Запросы одного представления могут выполняться в нескольких потоках
+        self.lock = threading.Lock()
+
+    def add_query(self, duration, sql):
+        with self.lock:
+            self.queries += 1
+            self.sql_time += duration
+            if duration > self.slowest_time:
+                self.slowest_time = duration
+                if self.keep_query_text:
+                    self.slowest_sql = sql
+
+    def add_template(self, duration):
+        with self.lock:
+            self.template_time += duration
+
+
+def start_request_metrics():
+    """
+    Начинает измерение текущего запроса.
+
+    Returns:
+        tuple: Измерения и токен для finish_request_metrics()
+    """
+    metrics = RequestMetrics(getattr(settings, 'REQUEST_METRICS_QUERY_TEXT', False))
+    return metrics, _current.set(metrics)
+
+
+def finish_request_metrics(token):
+    """Заканчивает измерение текущего запроса."""
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started, sql)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Ставит учет SQL-запросов на открытое соединение с базой данных."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(Template):
+    """Шаблон, время рендеринга которого учитывается в метриках запроса."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.add_template(time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с учетом времени рендеринга (TimedTemplate)."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    """
+    Гистограмма Prometheus с меткой представления.
+
+    Args:
+        name (str): Имя метрики
+        help_text (str): Описание метрики
+        buckets (tuple): Верхние границы интервалов по возрастанию
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            counts = self.values.get(view)
+            if counts is None:
+                # Количество по интервалам, затем сумма значений и их количество
+                counts = self.values[view] = [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            values = {view: list(counts) for view, counts in self.values.items()}
+        for view, counts in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {counts[-1]}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {round(counts[-2], 6)}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {counts[-1]}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'dashboard_request_duration_seconds',
+    'Время ответа представления (все запросы)',
+    DURATION_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    'dashboard_request_sql_queries',
+    'Количество SQL-запросов за запрос (выборка)',
+    QUERY_COUNT_BUCKETS,
+)
+SQL_DURATION = Histogram(
+    'dashboard_request_sql_duration_seconds',
+    'Суммарное время SQL-запросов за запрос (выборка)',
+    DURATION_BUCKETS,
+)
+SLOWEST_QUERY = Histogram(
+    'dashboard_request_slowest_query_seconds',
+    'Время самого долгого SQL-запроса за запрос (выборка)',
+    DURATION_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    'dashboard_request_template_duration_seconds',
+    'Время рендеринга шаблонов за запрос (выборка)',
+    DURATION_BUCKETS,
+)
+
+HISTOGRAMS = (REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, SLOWEST_QUERY, TEMPLATE_DURATION)
+
+
+def observe_request(view, duration, metrics=None):
+    """
+    Добавляет измерения запроса в гистограммы.
+
+    Args:
+        view (str): Имя представления (имя URL)
+        duration (float): Время ответа, секунды
+        metrics (RequestMetrics): Подробные измерения (для запросов выборки)
+    """
+    REQUEST_DURATION.observe(view, duration)
+    if metrics is not None:
+        SQL_QUERIES.observe(view, metrics.queries)
+        SQL_DURATION.observe(view, metrics.sql_time)
+        SLOWEST_QUERY.observe(view, metrics.slowest_time)
+        TEMPLATE_DURATION.observe(view, metrics.template_time)
+
+
+def server_timing(duration, metrics=None):
+    """
+    Формирует значение заголовка Server-Timing.
+
+    Args:
+        duration (float): Время ответа, секунды
+        metrics (RequestMetrics): Подробные измерения (для запросов выборки)
+
+    Returns:
+        str: Значение заголовка
+    """
+    parts = [f'total;dur={duration * 1000:.1f}']
+    if metrics is not None:
+        parts.append(f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries"')
+        slowest = f'db-slowest;dur={metrics.slowest_time * 1000:.1f}'
+        if metrics.slowest_sql:
+            text = ' '.join(metrics.slowest_sql.split())[:QUERY_TEXT_LIMIT]
+            slowest += ';desc="{}"'.format(text.replace('\\', '\\\\').replace('"', '\\"'))
+        parts.append(slowest)
+        parts.append(f'tpl;dur={metrics.template_time * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def render_metrics():
+    """
+    Возвращает гистограммы процесса в текстовом формате Prometheus.
+
+    Returns:
+        str: Текст для ответа представления metrics
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,170 @@
+"""
+Промежуточные обработчики (middleware) дашборда.
+"""
+import gzip
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .metrics import finish_request_metrics, observe_request, server_timing, start_request_metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Сжимаемые типы ответов
+COMPRESS_CONTENT_TYPES = ('application/json',)
+
+# Ответы меньше этого размера (байты) не сжимаются
+COMPRESS_MIN_SIZE = 1024
+
+# Уровни сжатия: быстрые, ответы сжимаются при каждом запросе
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 5
+
+
+def _accepted_encodings(header):
+    """Возвращает кодировки из Accept-Encoding с ненулевым весом."""
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        weight = params.strip()
+        if weight.startswith('q='):
+            try:
+                if float(weight[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class ResponseCompressionMiddleware:
+    """
+    Сжатие JSON-ответов brotli или gzip по заголовку Accept-Encoding.
+
+    Brotli выбирается, если клиент его принимает и установлен пакет brotli
+    (зависимость whitenoise[brotli]). Потоковые ответы (поток изменений
+    дашборда, выгрузки отчетов) не сжимаются. Включается настройкой
+    RESPONSE_COMPRESSION.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RESPONSE_COMPRESSION', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if response.get('Content-Type', '').split(';')[0].strip() not in COMPRESS_CONTENT_TYPES:
+            return response
+
+        # Ответ зависит от Accept-Encoding, даже если он не сжат
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < COMPRESS_MIN_SIZE:
+            return response
+
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding, content = 'br', brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding, content = 'gzip', gzip.compress(response.content, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            return response
+
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # Сжатый ответ не совпадает побайтно с несжатым (как в GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Метрики запросов к представлениям dashboard/urls.py (dashboard/metrics.py).
+
+    Время ответа учитывается для каждого запроса, SQL-запросы и рендеринг
+    шаблонов - для доли REQUEST_METRICS_SAMPLE_RATE запросов. Результат
+    добавляется в гистограммы процесса и в заголовок Server-Timing. Для
+    потоковых ответов учитывается время до начала передачи. Включается
+    настройкой REQUEST_METRICS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0.1)
+        self.views = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, metrics, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                finish_request_metrics(token)
+        return self.process_response(request, response, started, metrics)
+
+    async def __acall__(self, request):
+        started, metrics, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                finish_request_metrics(token)
+        return self.process_response(request, response, started, metrics)
+
+    def start(self):
+        started = time.perf_counter()
+        if random.random() < self.sample_rate:
+            return (started, *start_request_metrics())
+        return started, None, None
+
+    def dashboard_view(self, request):
+        """Возвращает имя URL представления dashboard/urls.py или None."""
+        if self.views is None:
+            from .urls import urlpatterns
+            self.views = {pattern.callback for pattern in urlpatterns}
+        match = request.resolver_match
+        if match is None or match.func not in self.views or match.url_name == 'metrics':
+            return None
+        return match.url_name
+
+    def process_response(self, request, response, started, metrics):
+        duration = time.perf_counter() - started
+        view = self.dashboard_view(request)
+        if view is not None:
+            observe_request(view, duration, metrics)
+            response['Server-Timing'] = server_timing(duration, metrics)
+        return response
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from datetime import timedelta
+
+
+ROLLUP_FIELDS = (
+    'output', 'downtime_hours', 'defect_rate', 'equipment_load',
+    'inventory_level', 'dse_volume', 'cabinets_produced', 'plan_completion',
+    'quality_index', 'productivity_index', 'energy_consumption', 'material_utilization',
+)
+
+
+def build_rollups(apps, schema_editor):
+    """Заполняет агрегаты KPI по уже существующим записям"""
+    KPIRecord = apps.get_model('dashboard', 'KPIRecord')
+    KPIRollup = apps.get_model('dashboard', 'KPIRollup')
+
+    totals = {}
+    records = KPIRecord.objects.values_list('shop_id', 'date', *ROLLUP_FIELDS)
+    for shop_id, day, *values in records.iterator(chunk_size=2000):
+        starts = {
+            'day': day,
+            'week': day - timedelta(days=day.weekday()),
+            'month': day.replace(day=1),
+        }
+        for grain, period_start in starts.items():
+            bucket = totals.setdefault((shop_id, grain, period_start), [0] * (len(ROLLUP_FIELDS) + 1))
+            bucket[0] += 1
+            for index, value in enumerate(values, start=1):
+                bucket[index] += value
+
+    KPIRollup.objects.bulk_create(
+        [
+            KPIRollup(
+                shop_id=shop_id,
+                grain=grain,
+                period_start=period_start,
+                record_count=bucket[0],
+                **{f'{field}_sum': value for field, value in zip(ROLLUP_FIELDS, bucket[1:])},
+            )
+            for (shop_id, grain, period_start), bucket in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_inventoryrecord_demand_inventoryrecord_shortage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPIRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=5, verbose_name='Гранулярность')),
+                ('period_start', models.DateField(verbose_name='Начало интервала')),
+                ('record_count', models.IntegerField(default=0, verbose_name='Количество записей')),
+                ('output_sum', models.BigIntegerField(default=0, verbose_name='Объем выпуска')),
+                ('downtime_hours_sum', models.FloatField(default=0.0, verbose_name='Часы простоя')),
+                ('defect_rate_sum', models.FloatField(default=0.0, verbose_name='Процент брака')),
+                ('equipment_load_sum', models.FloatField(default=0.0, verbose_name='Загрузка оборудования')),
+                ('inventory_level_sum', models.BigIntegerField(default=0, verbose_name='Уровень остатков')),
+                ('dse_volume_sum', models.BigIntegerField(default=0, verbose_name='Объем ДСЕ')),
+                ('cabinets_produced_sum', models.BigIntegerField(default=0, verbose_name='Изготовлено шкафов')),
+                ('plan_completion_sum', models.FloatField(default=0.0, verbose_name='Выполнение плана')),
+                ('quality_index_sum', models.FloatField(default=0.0, verbose_name='Индекс качества')),
+                ('productivity_index_sum', models.FloatField(default=0.0, verbose_name='Индекс производительности')),
+                ('energy_consumption_sum', models.FloatField(default=0.0, verbose_name='Потребление энергии')),
+                ('material_utilization_sum', models.FloatField(default=0.0, verbose_name='Использование материалов')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.shop', verbose_name='Цех')),
+            ],
+            options={
+                'verbose_name': 'Агрегат KPI',
+                'verbose_name_plural': 'Агрегаты KPI',
+                'unique_together': {('shop', 'grain', 'period_start')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
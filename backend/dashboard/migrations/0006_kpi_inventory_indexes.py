@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_kpirollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryrecord',
+            index=models.Index(fields=['date', 'item', 'shop'], name='inventory_date_item_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryrecord',
+            index=models.Index(fields=['shop', 'date'], name='inventory_shop_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kpirecord',
+            index=models.Index(fields=['-date', 'shop'], name='kpi_date_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kpirecord',
+            index=models.Index(fields=['shop', 'date'], name='kpi_shop_date_idx'),
+        ),
+    ]
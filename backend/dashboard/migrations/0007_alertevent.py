@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_kpi_inventory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('value', models.FloatField(verbose_name='Значение показателя')),
+                ('threshold', models.FloatField(verbose_name='Пороговое значение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время срабатывания')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.kpirecord', verbose_name='Запись KPI')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='dashboard.alertrule', verbose_name='Правило')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.shop', verbose_name='Цех')),
+            ],
+            options={
+                'verbose_name': 'Срабатывание уведомления',
+                'verbose_name_plural': 'Срабатывания уведомлений',
+                'indexes': [models.Index(fields=['-date', 'shop'], name='alert_event_date_shop_idx')],
+                'unique_together': {('rule', 'record')},
+            },
+        ),
+    ]
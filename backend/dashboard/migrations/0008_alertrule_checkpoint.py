@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_alertevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertrule',
+            name='evaluated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последней проверки'),
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='last_record_id',
+            field=models.BigIntegerField(default=0, verbose_name='Последняя проверенная запись KPI'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_alertrule_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('1c', '1С (показатели KPI)'), ('access', 'Access (складские остатки)')], max_length=10, unique=True, verbose_name='Тип источника')),
+                ('enabled', models.BooleanField(default=False, verbose_name='Синхронизация включена')),
+                ('path', models.CharField(blank=True, max_length=500, verbose_name='Путь к файлу выгрузки')),
+                ('schedule', models.CharField(choices=[('manual', 'Вручную'), ('hourly', 'Ежечасно'), ('daily', 'Ежедневно'), ('weekly', 'Еженедельно')], default='daily', max_length=10, verbose_name='Расписание')),
+                ('password', models.CharField(blank=True, max_length=200, verbose_name='Пароль')),
+                ('last_sync_at', models.DateTimeField(blank=True, null=True, verbose_name='Время последней синхронизации')),
+                ('sync_position', models.BigIntegerField(default=0, verbose_name='Позиция последней прочитанной строки')),
+                ('sync_signature', models.CharField(blank=True, max_length=64, verbose_name='Подпись начала файла')),
+            ],
+            options={
+                'verbose_name': 'Источник данных',
+                'verbose_name_plural': 'Источники данных',
+            },
+        ),
+        migrations.CreateModel(
+            name='DataSyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Время начала')),
+                ('duration', models.FloatField(default=0.0, verbose_name='Длительность (с)')),
+                ('status', models.CharField(choices=[('success', 'Успешно'), ('error', 'Ошибка')], max_length=10, verbose_name='Результат')),
+                ('rows_read', models.IntegerField(default=0, verbose_name='Прочитано строк')),
+                ('rows_written', models.IntegerField(default=0, verbose_name='Записано строк')),
+                ('rows_skipped', models.IntegerField(default=0, verbose_name='Пропущено строк')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Позиция после запуска')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='dashboard.datasource', verbose_name='Источник данных')),
+            ],
+            options={
+                'verbose_name': 'Запуск синхронизации',
+                'verbose_name_plural': 'Запуски синхронизации',
+                'indexes': [models.Index(fields=['source', '-started_at'], name='sync_run_source_started_idx')],
+            },
+        ),
+    ]
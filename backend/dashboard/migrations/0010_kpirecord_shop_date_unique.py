@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Количество групп повторов в сообщении об ошибке
+REPORTED_DUPLICATES = 20
+
+
+def check_duplicate_records(apps, schema_editor):
+    """
+    Проверяет, что на цех и дату приходится не больше одной записи KPI.
+
+    Повторы не удаляются автоматически: какая из записей верна, решает
+    пользователь. Миграция завершается ошибкой со списком повторов; после
+    удаления лишних записей (например, в администраторской панели) миграцию
+    нужно запустить снова.
+    """
+    KPIRecord = apps.get_model('dashboard', 'KPIRecord')
+
+    duplicates = list(
+        KPIRecord.objects.order_by('shop_id', 'date')
+        .values('shop_id', 'date')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    if not duplicates:
+        return
+
+    lines = []
+    for row in duplicates[:REPORTED_DUPLICATES]:
+        ids = KPIRecord.objects.filter(shop_id=row['shop_id'], date=row['date']).order_by('id').values_list('id', flat=True)
+        lines.append(f"  цех {row['shop_id']}, {row['date']}: записи {', '.join(map(str, ids))}")
+    if len(duplicates) > REPORTED_DUPLICATES:
+        lines.append(f'  ... и еще {len(duplicates) - REPORTED_DUPLICATES}')
+    raise RuntimeError(
+        f'Найдено {len(duplicates)} повторов записей KPI по цеху и дате:\n'
+        + '\n'.join(lines)
+        + '\nОставьте одну запись на цех и дату и повторите migrate.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_datasource_datasyncrun'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='kpirecord',
+            constraint=models.UniqueConstraint(fields=('shop', 'date'), name='kpi_shop_date_unique'),
+        ),
+        migrations.RemoveIndex(
+            model_name='kpirecord',
+            name='kpi_shop_date_idx',
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:15
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc
+import django.db.models.deletion
+
+
+INVENTORY_ROLLUP_FIELDS = ('quantity', 'reserved', 'demand', 'shortage', 'min_threshold')
+
+
+def build_rollups(apps, schema_editor):
+    """Заполняет агрегаты остатков по уже существующим записям"""
+    InventoryRecord = apps.get_model('dashboard', 'InventoryRecord')
+    InventoryRollup = apps.get_model('dashboard', 'InventoryRollup')
+    InventoryDailyTotal = apps.get_model('dashboard', 'InventoryDailyTotal')
+    records = InventoryRecord.objects.order_by()
+
+    for grain in ('week', 'month'):
+        rows = (
+            records.annotate(period_start=Trunc('date', grain, output_field=DateField()))
+            .values('item_id', 'shop_id', 'period_start')
+            .annotate(
+                record_count=Count('id'),
+                **{f'{field}_sum': Sum(field) for field in INVENTORY_ROLLUP_FIELDS},
+            )
+        )
+        InventoryRollup.objects.bulk_create(
+            (InventoryRollup(grain=grain, **row) for row in rows.iterator(chunk_size=2000)),
+            batch_size=1000,
+        )
+
+    rows = (
+        records.annotate(category_id=F('item__category_id'))
+        .values('shop_id', 'category_id', 'date')
+        .annotate(record_count=Count('id'), quantity_sum=Sum('quantity'), shortage_sum=Sum('shortage'))
+    )
+    InventoryDailyTotal.objects.bulk_create(
+        (InventoryDailyTotal(**row) for row in rows.iterator(chunk_size=2000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_kpirecord_shop_date_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('week', 'Неделя'), ('month', 'Месяц')], max_length=5, verbose_name='Гранулярность')),
+                ('period_start', models.DateField(verbose_name='Начало интервала')),
+                ('record_count', models.IntegerField(default=0, verbose_name='Количество записей')),
+                ('quantity_sum', models.BigIntegerField(default=0, verbose_name='Количество на складе')),
+                ('reserved_sum', models.BigIntegerField(default=0, verbose_name='Зарезервированное количество')),
+                ('demand_sum', models.BigIntegerField(default=0, verbose_name='Потребность')),
+                ('shortage_sum', models.BigIntegerField(default=0, verbose_name='Дефицит')),
+                ('min_threshold_sum', models.BigIntegerField(default=0, verbose_name='Минимальный порог')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.inventoryitem', verbose_name='Складская позиция')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.shop', verbose_name='Цех')),
+            ],
+            options={
+                'verbose_name': 'Агрегат остатков',
+                'verbose_name_plural': 'Агрегаты остатков',
+                'unique_together': {('grain', 'period_start', 'item', 'shop')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('record_count', models.IntegerField(default=0, verbose_name='Количество записей')),
+                ('quantity_sum', models.BigIntegerField(default=0, verbose_name='Количество на складе')),
+                ('shortage_sum', models.BigIntegerField(default=0, verbose_name='Дефицит')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.inventorycategory', verbose_name='Категория')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.shop', verbose_name='Цех')),
+            ],
+            options={
+                'verbose_name': 'Дневные суммы остатков',
+                'verbose_name_plural': 'Дневные суммы остатков',
+                'unique_together': {('date', 'shop', 'category')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
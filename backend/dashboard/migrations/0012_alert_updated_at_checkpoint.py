@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_inventory_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='alertrule',
+            name='last_record_id',
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='checked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Проверены записи KPI, измененные до'),
+        ),
+        migrations.AddField(
+            model_name='kpirecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Время изменения'),
+        ),
+    ]
@@ -39,6 +39,7 @@ class KPIRecord(models.Model):
         productivity_index (float): Индекс производительности (%)
         energy_consumption (float): Потребление энергии (кВт·ч)
         material_utilization (float): Использование материалов (%)
+        updated_at (datetime): Время создания или последнего изменения записи
     """
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name="Цех")
     date = models.DateField(verbose_name="Дата")
@@ -56,6 +57,8 @@ class KPIRecord(models.Model):
     productivity_index = models.FloatField(verbose_name="Индекс производительности (%)", default=0.0)
     energy_consumption = models.FloatField(verbose_name="Потребление энергии (кВт·ч)", default=0.0)
     material_utilization = models.FloatField(verbose_name="Использование материалов (%)", default=0.0)
+    # Контрольная точка проверки правил уведомлений (dashboard/alerting.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Время изменения")
 
     def __str__(self):
         """Возвращает строковое представление записи KPI"""
@@ -64,6 +67,64 @@ class KPIRecord(models.Model):
     class Meta:
         verbose_name = "Запись KPI"
         verbose_name_plural = "Записи KPI"
+        indexes = [
+            # Фильтр по периоду с сортировкой по убыванию даты и поиск последней даты
+            models.Index(fields=['-date', 'shop'], name='kpi_date_shop_idx'),
+        ]
+        constraints = [
+            # Одна запись на цех и дату; ключ загрузки с обновлением, его индекс
+            # также используется фильтром по выбранным цехам внутри периода
+            models.UniqueConstraint(fields=['shop', 'date'], name='kpi_shop_date_unique'),
+        ]
+
+
+class KPIRollup(models.Model):
+    """
+    Предрассчитанные суммы KPI по цеху за день, неделю или месяц.
+    
+    Строки поддерживаются в актуальном состоянии модулем dashboard.rollups:
+    при сохранении или удалении KPIRecord пересчитываются только затронутые
+    интервалы. Средние значения восстанавливаются делением суммы на record_count.
+    
+    Атрибуты:
+        shop (Shop): Ссылка на цех
+        grain (str): Гранулярность интервала (day, week, month)
+        period_start (date): Первый день интервала
+        record_count (int): Количество записей KPI в интервале
+        *_sum: Суммы соответствующих полей KPIRecord за интервал
+    """
+    GRAIN_CHOICES = [
+        ('day', 'День'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+    ]
+    
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name="Цех")
+    grain = models.CharField(max_length=5, choices=GRAIN_CHOICES, verbose_name="Гранулярность")
+    period_start = models.DateField(verbose_name="Начало интервала")
+    record_count = models.IntegerField(verbose_name="Количество записей", default=0)
+    output_sum = models.BigIntegerField(verbose_name="Объем выпуска", default=0)
+    downtime_hours_sum = models.FloatField(verbose_name="Часы простоя", default=0.0)
+    defect_rate_sum = models.FloatField(verbose_name="Процент брака", default=0.0)
+    equipment_load_sum = models.FloatField(verbose_name="Загрузка оборудования", default=0.0)
+    inventory_level_sum = models.BigIntegerField(verbose_name="Уровень остатков", default=0)
+    dse_volume_sum = models.BigIntegerField(verbose_name="Объем ДСЕ", default=0)
+    cabinets_produced_sum = models.BigIntegerField(verbose_name="Изготовлено шкафов", default=0)
+    plan_completion_sum = models.FloatField(verbose_name="Выполнение плана", default=0.0)
+    quality_index_sum = models.FloatField(verbose_name="Индекс качества", default=0.0)
+    productivity_index_sum = models.FloatField(verbose_name="Индекс производительности", default=0.0)
+    energy_consumption_sum = models.FloatField(verbose_name="Потребление энергии", default=0.0)
+    material_utilization_sum = models.FloatField(verbose_name="Использование материалов", default=0.0)
+
+    def __str__(self):
+        """Возвращает строковое представление агрегата KPI"""
+        return f"{self.shop_id} - {self.grain} - {self.period_start}"
+
+    class Meta:
+        verbose_name = "Агрегат KPI"
+        verbose_name_plural = "Агрегаты KPI"
+        # Один агрегат на цех, гранулярность и начало интервала
+        unique_together = ('shop', 'grain', 'period_start')
 
 
 class InventoryCategory(models.Model):
@@ -174,6 +235,89 @@ class InventoryRecord(models.Model):
         verbose_name_plural = "Записи остатков"
         # Уникальность по позиции, цеху и дате
         unique_together = ('item', 'shop', 'date')
+        indexes = [
+            # Фильтр по диапазону дат с группировкой по позициям
+            models.Index(fields=['date', 'item', 'shop'], name='inventory_date_item_shop_idx'),
+            # Фильтр по выбранным цехам внутри диапазона дат
+            models.Index(fields=['shop', 'date'], name='inventory_shop_date_idx'),
+        ]
+
+
+class InventoryRollup(models.Model):
+    """
+    Предрассчитанные суммы остатков по позиции и цеху за неделю или месяц.
+
+    Строки поддерживаются в актуальном состоянии модулем dashboard.rollups
+    так же, как KPIRollup. Таблица страницы склада читает суммы по позициям
+    из агрегатов, а края периода добирает записями InventoryRecord.
+
+    Атрибуты:
+        item (InventoryItem): Складская позиция
+        shop (Shop): Цех
+        grain (str): Гранулярность интервала (week, month)
+        period_start (date): Первый день интервала
+        record_count (int): Количество записей остатков в интервале
+        *_sum: Суммы соответствующих полей InventoryRecord за интервал
+    """
+    GRAIN_CHOICES = [
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+    ]
+
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, verbose_name="Складская позиция")
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name="Цех")
+    grain = models.CharField(max_length=5, choices=GRAIN_CHOICES, verbose_name="Гранулярность")
+    period_start = models.DateField(verbose_name="Начало интервала")
+    record_count = models.IntegerField(verbose_name="Количество записей", default=0)
+    quantity_sum = models.BigIntegerField(verbose_name="Количество на складе", default=0)
+    reserved_sum = models.BigIntegerField(verbose_name="Зарезервированное количество", default=0)
+    demand_sum = models.BigIntegerField(verbose_name="Потребность", default=0)
+    shortage_sum = models.BigIntegerField(verbose_name="Дефицит", default=0)
+    min_threshold_sum = models.BigIntegerField(verbose_name="Минимальный порог", default=0)
+
+    def __str__(self):
+        """Возвращает строковое представление агрегата остатков"""
+        return f"{self.item_id} - {self.shop_id} - {self.grain} - {self.period_start}"
+
+    class Meta:
+        verbose_name = "Агрегат остатков"
+        verbose_name_plural = "Агрегаты остатков"
+        # Один агрегат на позицию, цех, гранулярность и начало интервала;
+        # индекс начинается с интервала, по которому выбирается период
+        unique_together = ('grain', 'period_start', 'item', 'shop')
+
+
+class InventoryDailyTotal(models.Model):
+    """
+    Суммы остатков и дефицита по цеху и категории за день.
+
+    Из этих строк строится тренд страницы склада. Их меньше, чем записей
+    остатков за тот же период, во столько раз, сколько позиций в категории.
+    Строки поддерживаются модулем dashboard.rollups вместе с InventoryRollup.
+
+    Атрибуты:
+        shop (Shop): Цех
+        category (InventoryCategory): Категория позиций
+        date (date): Дата
+        record_count (int): Количество записей остатков
+        quantity_sum (int): Сумма остатков
+        shortage_sum (int): Сумма дефицита
+    """
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name="Цех")
+    category = models.ForeignKey(InventoryCategory, on_delete=models.CASCADE, verbose_name="Категория")
+    date = models.DateField(verbose_name="Дата")
+    record_count = models.IntegerField(verbose_name="Количество записей", default=0)
+    quantity_sum = models.BigIntegerField(verbose_name="Количество на складе", default=0)
+    shortage_sum = models.BigIntegerField(verbose_name="Дефицит", default=0)
+
+    def __str__(self):
+        """Возвращает строковое представление дневных сумм остатков"""
+        return f"{self.shop_id} - {self.category_id} - {self.date}"
+
+    class Meta:
+        verbose_name = "Дневные суммы остатков"
+        verbose_name_plural = "Дневные суммы остатков"
+        unique_together = ('date', 'shop', 'category')
 
 
 class AlertRule(models.Model):
@@ -186,6 +330,8 @@ class AlertRule(models.Model):
         threshold (float): Пороговое значение
         notify_in_app (bool): Флаг уведомления в интерфейсе
         notify_email (bool): Флаг уведомления по email
+        checked_until (datetime): Время изменения последней проверенной записи KPI (контрольная точка)
+        evaluated_at (datetime): Время последней проверки правила
     """
     # Варианты выбора для типа показателя
     INDICATOR_CHOICES = [
@@ -226,6 +372,16 @@ class AlertRule(models.Model):
         default=False, 
         verbose_name="Уведомлять по email"
     )
+    checked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Проверены записи KPI, измененные до"
+    )
+    evaluated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Время последней проверки"
+    )
     
     def __str__(self):
         """Возвращает строковое представление правила уведомления"""
@@ -236,6 +392,50 @@ class AlertRule(models.Model):
         verbose_name_plural = "Правила уведомлений"
 
 
+class AlertEvent(models.Model):
+    """
+    Модель срабатывания правила уведомления на записи KPI.
+    
+    Для пары (правило, запись KPI) хранится не более одного события, поэтому
+    повторная проверка тех же дат не создает дубликатов.
+    
+    Атрибуты:
+        rule (AlertRule): Сработавшее правило
+        record (KPIRecord): Запись KPI, на которой сработало правило
+        shop (Shop): Цех записи
+        date (date): Дата записи
+        value (float): Значение показателя
+        threshold (float): Пороговое значение на момент срабатывания
+        created_at (datetime): Время обнаружения срабатывания
+    """
+    rule = models.ForeignKey(
+        AlertRule,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name="Правило"
+    )
+    record = models.ForeignKey(KPIRecord, on_delete=models.CASCADE, verbose_name="Запись KPI")
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, verbose_name="Цех")
+    date = models.DateField(verbose_name="Дата")
+    value = models.FloatField(verbose_name="Значение показателя")
+    threshold = models.FloatField(verbose_name="Пороговое значение")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время срабатывания")
+
+    def __str__(self):
+        """Возвращает строковое представление срабатывания"""
+        return f"{self.rule} - {self.shop_id} - {self.date}"
+
+    class Meta:
+        verbose_name = "Срабатывание уведомления"
+        verbose_name_plural = "Срабатывания уведомлений"
+        # Одно событие на правило и запись KPI
+        unique_together = ('rule', 'record')
+        indexes = [
+            # История уведомлений по убыванию даты
+            models.Index(fields=['-date', 'shop'], name='alert_event_date_shop_idx'),
+        ]
+
+
 class UserActionLog(models.Model):
     """
     Модель для ведения журнала действий пользователей.
@@ -262,4 +462,119 @@ class UserActionLog(models.Model):
 
     class Meta:
         verbose_name = "Запись журнала действий"
-        verbose_name_plural = "Записи журнала действий"
\ No newline at end of file
+        verbose_name_plural = "Записи журнала действий"
+
+
+class DataSource(models.Model):
+    """
+    Модель внешнего источника данных (файловые выгрузки 1С и Access).
+    
+    Атрибуты:
+        kind (str): Тип источника
+        enabled (bool): Флаг синхронизации
+        path (str): Путь к файлу выгрузки
+        schedule (str): Расписание синхронизации
+        password (str): Пароль базы данных Access
+        last_sync_at (datetime): Время последней успешной синхронизации
+        sync_position (int): Водяной знак - конец прочитанных строк выгрузки
+            (смещение в байтах для CSV, количество записей для XML)
+        sync_signature (str): Подпись начала файла; если она изменилась,
+            выгрузка заменена и читается с начала
+    """
+    # Типы источников
+    KIND_CHOICES = [
+        ('1c', '1С (показатели KPI)'),
+        ('access', 'Access (складские остатки)'),
+    ]
+    
+    # Варианты расписания
+    SCHEDULE_CHOICES = [
+        ('manual', 'Вручную'),
+        ('hourly', 'Ежечасно'),
+        ('daily', 'Ежедневно'),
+        ('weekly', 'Еженедельно'),
+    ]
+    
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        unique=True,
+        verbose_name="Тип источника"
+    )
+    enabled = models.BooleanField(default=False, verbose_name="Синхронизация включена")
+    path = models.CharField(max_length=500, blank=True, verbose_name="Путь к файлу выгрузки")
+    schedule = models.CharField(
+        max_length=10,
+        choices=SCHEDULE_CHOICES,
+        default='daily',
+        verbose_name="Расписание"
+    )
+    password = models.CharField(max_length=200, blank=True, verbose_name="Пароль")
+    last_sync_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Время последней синхронизации"
+    )
+    sync_position = models.BigIntegerField(default=0, verbose_name="Позиция последней прочитанной строки")
+    sync_signature = models.CharField(max_length=64, blank=True, verbose_name="Подпись начала файла")
+
+    def __str__(self):
+        """Возвращает строковое представление источника данных"""
+        return self.get_kind_display()
+
+    class Meta:
+        verbose_name = "Источник данных"
+        verbose_name_plural = "Источники данных"
+
+
+class DataSyncRun(models.Model):
+    """
+    Модель запуска синхронизации источника данных.
+    
+    Атрибуты:
+        source (DataSource): Источник данных
+        started_at (datetime): Время начала
+        duration (float): Длительность (секунды)
+        status (str): Результат запуска
+        rows_read (int): Прочитано новых строк выгрузки
+        rows_written (int): Записано строк в базу данных
+        rows_skipped (int): Пропущено строк с ошибками
+        position (int): Водяной знак после запуска
+        error (str): Текст ошибки
+    """
+    STATUS_CHOICES = [
+        ('success', 'Успешно'),
+        ('error', 'Ошибка'),
+    ]
+    
+    source = models.ForeignKey(
+        DataSource,
+        on_delete=models.CASCADE,
+        related_name='runs',
+        verbose_name="Источник данных"
+    )
+    started_at = models.DateTimeField(verbose_name="Время начала")
+    duration = models.FloatField(default=0.0, verbose_name="Длительность (с)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name="Результат")
+    rows_read = models.IntegerField(default=0, verbose_name="Прочитано строк")
+    rows_written = models.IntegerField(default=0, verbose_name="Записано строк")
+    rows_skipped = models.IntegerField(default=0, verbose_name="Пропущено строк")
+    position = models.BigIntegerField(default=0, verbose_name="Позиция после запуска")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+
+    @property
+    def rows_per_second(self):
+        """Пропускная способность запуска (прочитанных строк в секунду)"""
+        return self.rows_read / self.duration if self.duration else 0.0
+
+    def __str__(self):
+        """Возвращает строковое представление запуска синхронизации"""
+        return f"{self.source} - {self.started_at} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Запуск синхронизации"
+        verbose_name_plural = "Запуски синхронизации"
+        indexes = [
+            # Последние запуски источника
+            models.Index(fields=['source', '-started_at'], name='sync_run_source_started_idx'),
+        ]
@@ -0,0 +1,139 @@
+"""
+Курсорная (keyset) пагинация таблицы отчетов.
+
+Записи KPI упорядочены по (-date, shop__name, id). Вместо номера страницы
+клиент получает непрозрачный курсор с ключом сортировки крайней записи, и
+следующая страница выбирается условием "после этого ключа" с LIMIT. Такой
+запрос не считает COUNT(*) и не пропускает строки через OFFSET, поэтому
+глубокие страницы стоят столько же, сколько первая.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.db.models import Q
+
+
+# Порядок сортировки таблицы отчетов (id делает ключ уникальным)
+KPI_REPORT_ORDERING = ('-date', 'shop__name', 'id')
+KPI_REPORT_REVERSE_ORDERING = ('date', '-shop__name', '-id')
+
+
+def encode_cursor(record, direction):
+    """
+    Кодирует ключ сортировки записи в непрозрачный курсор.
+
+    Args:
+        record (KPIRecord): Крайняя запись страницы
+        direction (str): 'next' - записи после ключа, 'prev' - перед ним
+
+    Returns:
+        str: Курсор для параметра cursor
+    """
+    key = [direction, record.date.isoformat(), record.shop.name, record.pk]
+    raw = json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Разбирает курсор, полученный от encode_cursor().
+
+    Args:
+        token (str): Курсор из параметра запроса
+
+    Returns:
+        tuple: (direction, date, shop_name, id) или None для пустого
+        или поврежденного курсора
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, day, shop_name, pk = json.loads(raw.decode('utf-8'))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, date.fromisoformat(day), str(shop_name), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """
+    Страница записей с курсорами соседних страниц.
+
+    Поддерживает итерацию по записям, как страница Paginator.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.next_cursor = encode_cursor(object_list[-1], 'next') if has_next else None
+        self.previous_cursor = encode_cursor(object_list[0], 'prev') if has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_kpi_records(queryset, token, per_page=20):
+    """
+    Возвращает страницу записей KPI после (или перед) ключом курсора.
+
+    Выбирается per_page + 1 запись: лишняя запись показывает, есть ли
+    страница дальше в направлении чтения.
+
+    Args:
+        queryset (QuerySet): Отфильтрованные записи KPIRecord
+        token (str): Курсор из параметра запроса (пустой - первая страница)
+        per_page (int): Количество записей на странице
+
+    Returns:
+        KeysetPage: Страница записей
+    """
+    queryset = queryset.select_related('shop')
+    cursor = decode_cursor(token)
+
+    if cursor is None:
+        records = list(queryset.order_by(*KPI_REPORT_ORDERING)[:per_page + 1])
+        return KeysetPage(records[:per_page], len(records) > per_page, False)
+
+    # Избыточное условие по дате дает планировщику диапазон по индексу даты
+    direction, day, shop_name, pk = cursor
+    if direction == 'next':
+        condition = (
+            Q(date__lt=day)
+            | Q(date=day, shop__name__gt=shop_name)
+            | Q(date=day, shop__name=shop_name, id__gt=pk)
+        )
+        records = list(
+            queryset.filter(condition, date__lte=day).order_by(*KPI_REPORT_ORDERING)[:per_page + 1]
+        )
+        if not records:
+            return paginate_kpi_records(queryset, None, per_page)
+        return KeysetPage(records[:per_page], len(records) > per_page, True)
+
+    condition = (
+        Q(date__gt=day)
+        | Q(date=day, shop__name__lt=shop_name)
+        | Q(date=day, shop__name=shop_name, id__lt=pk)
+    )
+    records = list(
+        queryset.filter(condition, date__gte=day).order_by(*KPI_REPORT_REVERSE_ORDERING)[:per_page + 1]
+    )
+    has_previous = len(records) > per_page
+    records = records[:per_page][::-1]
+    if not records:
+        return paginate_kpi_records(queryset, None, per_page)
+    return KeysetPage(records, True, has_previous)
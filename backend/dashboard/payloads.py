@@ -0,0 +1,142 @@
+"""
+Сериализация JSON-ответов с данными графиков.
+
+Ответы сериализуются orjson (если пакет установлен) - он в несколько раз
+быстрее json с DjangoJSONEncoder, без него используется json без пробелов.
+
+По параметру format=columnar данные отдаются в колоночном виде: вместо
+списка словарей с повторяющимися ключами - список колонок и массив
+значений для каждой колонки, вместо словарей {дата: значение} для
+нескольких рядов - общая ось дат и массивы значений рядов. Клиент
+восстанавливает исходный вид функцией decodeColumnarPayload (main.js).
+"""
+from decimal import Decimal
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Значение параметра format для колоночного ответа
+COLUMNAR_FORMAT = 'columnar'
+
+
+def wants_columnar(request):
+    """Проверяет, запросил ли клиент колоночный ответ."""
+    return request.GET.get('format') == COLUMNAR_FORMAT
+
+
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+def dumps(payload):
+    """
+    Сериализует данные ответа в JSON.
+
+    Args:
+        payload (dict): Данные ответа
+
+    Returns:
+        bytes: JSON в UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJsonResponse(HttpResponse):
+    """JSON-ответ, сериализованный dumps()."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def columnar_rows(rows):
+    """
+    Преобразует список словарей в колонки.
+
+    Args:
+        rows (list): Строки с одинаковым набором ключей
+
+    Returns:
+        dict: {'columns': [ключи], 'values': [[значения колонки], ...]}
+    """
+    columns = list(rows[0]) if rows else []
+    return {
+        'columns': columns,
+        'values': [[row[column] for row in rows] for column in columns],
+    }
+
+
+def columnar_series(series):
+    """
+    Приводит ряды {подпись: значение} к общей оси подписей.
+
+    Args:
+        series (dict): Ряды по имени; подписи каждого ряда упорядочены
+
+    Returns:
+        dict: {'axis': [подписи], 'series': {имя: [значения]}}; если
+            подписи у рядов не совпадают, отсутствующие значения - null
+    """
+    axis = {}
+    for values in series.values():
+        axis.update(dict.fromkeys(values))
+    if any(len(values) != len(axis) for values in series.values()):
+        axis = dict.fromkeys(sorted(axis))
+    return {
+        'axis': list(axis),
+        'series': {name: [values.get(label) for label in axis] for name, values in series.items()},
+    }
+
+
+def columnar_chart_data(chart_data):
+    """
+    Колоночный вид данных графиков дашборда (prepare_chart_data).
+
+    Ряды по датам и ряды по цехам сводятся к двум общим осям.
+
+    Returns:
+        dict: {'groups': [ряды по датам, ряды по цехам]}
+    """
+    return {
+        'groups': [
+            columnar_series({
+                'production_by_date': chart_data['production_by_date'],
+                'inventory_by_date': chart_data['inventory_by_date'],
+            }),
+            columnar_series({
+                'downtime_by_shop': chart_data['downtime_by_shop'],
+                'plan_by_shop': chart_data['plan_by_shop'],
+            }),
+        ],
+    }
+
+
+def columnar_inventory_payload(payload):
+    """
+    Колоночный вид данных страницы склада (_build_inventory_payload).
+
+    Returns:
+        dict: Данные, в которых ряды графиков и строки таблицы - колонки
+    """
+    return {
+        **payload,
+        'format': COLUMNAR_FORMAT,
+        'charts': {
+            name: columnar_rows(rows) if isinstance(rows, list) else rows
+            for name, rows in payload['charts'].items()
+        },
+        'table': {'rows': columnar_rows(payload['table']['rows'])},
+    }
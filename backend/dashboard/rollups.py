@@ -0,0 +1,554 @@
+"""
+Предрассчитанные агрегаты KPI (модель KPIRollup) и остатков (InventoryRollup,
+InventoryDailyTotal).
+
+Агрегаты KPI хранятся для трех гранулярностей: день, неделя (с понедельника)
+и календарный месяц. При изменении KPIRecord пересчитываются только интервалы,
+в которые попадают измененные записи. Дашборд читает агрегаты самой крупной
+гранулярности, которая подходит для выбранного периода, а края периода
+добирает более мелкими интервалами.
+
+Агрегаты остатков хранятся по позиции и цеху за неделю и месяц, дневной
+гранулярностью для них служат сами записи InventoryRecord. Для тренда
+страницы склада отдельно хранятся дневные суммы по цеху и категории.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import threading
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Trunc
+
+from .caching import deferred_data_changes
+from .models import AlertEvent, InventoryDailyTotal, InventoryRecord, InventoryRollup, KPIRecord, KPIRollup
+
+
+# Гранулярности от мелкой к крупной
+ROLLUP_GRAINS = ('day', 'week', 'month')
+
+# Суммируемые поля KPIRecord
+ROLLUP_FIELDS = (
+    'output',
+    'downtime_hours',
+    'defect_rate',
+    'equipment_load',
+    'inventory_level',
+    'dse_volume',
+    'cabinets_produced',
+    'plan_completion',
+    'quality_index',
+    'productivity_index',
+    'energy_consumption',
+    'material_utilization',
+)
+
+# Суммируемые поля InventoryRecord
+INVENTORY_ROLLUP_FIELDS = ('quantity', 'reserved', 'demand', 'shortage', 'min_threshold')
+
+# Гранулярности агрегатов остатков от мелкой к крупной (дни - сами записи)
+INVENTORY_ROLLUP_GRAINS = ('week', 'month')
+
+# Гранулярность графиков для периодов дашборда
+PERIOD_GRAINS = {
+    'day': 'day',
+    'week': 'day',
+    'month': 'day',
+    'quarter': 'week',
+    'year': 'month',
+}
+
+_deferred = threading.local()
+
+
+def bucket_start(day, grain):
+    """Возвращает первый день интервала гранулярности grain, содержащего day."""
+    if grain == 'week':
+        return day - timedelta(days=day.weekday())
+    if grain == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start, grain):
+    """Возвращает последний день интервала, начинающегося в start."""
+    if grain == 'week':
+        return start + timedelta(days=6)
+    if grain == 'month':
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return start
+
+
+def plan_rollup_buckets(start_date, end_date, grain):
+    """
+    Покрывает диапазон дат непересекающимися интервалами.
+
+    Середина диапазона берется целыми интервалами гранулярности grain,
+    края - более мелкими. Каждый интервал целиком лежит внутри одного
+    интервала grain, поэтому строки можно перегруппировать по grain без потерь.
+
+    Args:
+        start_date (date): Начало диапазона (включительно)
+        end_date (date): Конец диапазона (включительно)
+        grain (str): Самая крупная допустимая гранулярность
+
+    Returns:
+        dict: Списки начал интервалов для каждой гранулярности
+    """
+    buckets = {name: [] for name in ROLLUP_GRAINS}
+    _tile_range(start_date, end_date, ROLLUP_GRAINS.index(grain), buckets)
+    return buckets
+
+
+def _tile_range(start_date, end_date, level, buckets):
+    if start_date > end_date:
+        return
+
+    grain = ROLLUP_GRAINS[level]
+    if grain == 'day':
+        day = start_date
+        while day <= end_date:
+            buckets['day'].append(day)
+            day += timedelta(days=1)
+        return
+
+    cursor = bucket_start(start_date, grain)
+    if cursor < start_date:
+        cursor = bucket_end(cursor, grain) + timedelta(days=1)
+
+    full_buckets = []
+    while cursor <= end_date and bucket_end(cursor, grain) <= end_date:
+        full_buckets.append(cursor)
+        cursor = bucket_end(cursor, grain) + timedelta(days=1)
+
+    if not full_buckets:
+        _tile_range(start_date, end_date, level - 1, buckets)
+        return
+
+    _tile_range(start_date, full_buckets[0] - timedelta(days=1), level - 1, buckets)
+    buckets[grain].extend(full_buckets)
+    _tile_range(cursor, end_date, level - 1, buckets)
+
+
+def load_kpi_rollups(start_date, end_date, shop_ids=None, grain='day'):
+    """
+    Загружает агрегаты, точно покрывающие диапазон дат, одним запросом.
+
+    Args:
+        start_date (date): Начало диапазона (включительно)
+        end_date (date): Конец диапазона (включительно)
+        shop_ids (list): Список ID цехов (пустой - все цеха)
+        grain (str): Самая крупная допустимая гранулярность
+
+    Returns:
+        list: Словари со значениями полей KPIRollup и названием цеха
+    """
+    buckets = plan_rollup_buckets(start_date, end_date, grain)
+
+    condition = Q()
+    for name, starts in buckets.items():
+        if starts:
+            condition |= Q(grain=name, period_start__in=starts)
+    if not condition:
+        return []
+
+    queryset = KPIRollup.objects.filter(condition)
+    if shop_ids:
+        queryset = queryset.filter(shop_id__in=shop_ids)
+
+    return list(queryset.values(
+        'shop_id',
+        'shop__name',
+        'grain',
+        'period_start',
+        'record_count',
+        *[f'{field}_sum' for field in ROLLUP_FIELDS],
+    ))
+
+
+def _insert_rollups(model, rows, columns, grain=None):
+    """
+    Записывает агрегаты одной командой INSERT ... SELECT.
+
+    Суммы не передаются в Python и обратно: база данных вставляет строки
+    группировки напрямую, что для длинных диапазонов в десятки раз быстрее
+    bulk_create.
+
+    Args:
+        model (Model): Модель агрегатов
+        rows (QuerySet): Группировка, столбцы которой названы как поля model
+        columns (list): Поля model, заполняемые из rows (суммы - с окончанием _sum)
+        grain (str): Гранулярность агрегатов (None - у модели нет поля grain)
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    connection = connections[router.db_for_write(model)]
+    select_sql, params = rows.query.get_compiler(connection=connection).as_sql()
+    quote_name = connection.ops.quote_name
+    values = [
+        f'COALESCE({quote_name(column)}, 0)' if column.endswith('_sum') else quote_name(column)
+        for column in columns
+    ]
+    if grain is not None:
+        columns = ['grain', *columns]
+        values = ['%s', *values]
+        params = (grain, *params)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            f'({", ".join(quote_name(column) for column in columns)}) '
+            f'SELECT {", ".join(values)} FROM ({select_sql}) rollup_rows',
+            params,
+        )
+        return cursor.rowcount
+
+
+def rebuild_kpi_rollups(start_date=None, end_date=None, shop_ids=None):
+    """
+    Пересчитывает агрегаты всех гранулярностей в диапазоне дат.
+
+    Диапазон расширяется до границ интервалов. Без аргументов агрегаты
+    перестраиваются полностью.
+
+    Args:
+        start_date (date): Начало диапазона (None - с первой записи)
+        end_date (date): Конец диапазона (None - до последней записи)
+        shop_ids (list): Список ID цехов (None - все цеха)
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    full_rebuild = start_date is None and end_date is None and shop_ids is None
+
+    if start_date is None or end_date is None:
+        records = KPIRecord.objects.all()
+        if shop_ids is not None:
+            records = records.filter(shop_id__in=shop_ids)
+        bounds = records.values_list('date', flat=True).order_by('date')
+        first_date, last_date = bounds.first(), bounds.last()
+        start_date = start_date or first_date
+        end_date = end_date or last_date
+
+    created = 0
+    with transaction.atomic():
+        if full_rebuild:
+            KPIRollup.objects.all().delete()
+        if start_date is None or end_date is None:
+            return created
+
+        for grain in ROLLUP_GRAINS:
+            span_start = bucket_start(start_date, grain)
+            span_end = bucket_end(bucket_start(end_date, grain), grain)
+
+            stale = KPIRollup.objects.filter(grain=grain, period_start__range=(span_start, span_end))
+            records = KPIRecord.objects.filter(date__range=(span_start, span_end))
+            if shop_ids is not None:
+                stale = stale.filter(shop_id__in=shop_ids)
+                records = records.filter(shop_id__in=shop_ids)
+            if not full_rebuild:
+                stale.delete()
+
+            if grain == 'day':
+                bucket = F('date')
+            else:
+                bucket = Trunc('date', grain, output_field=DateField())
+
+            rows = (
+                records.order_by()
+                .annotate(period_start=bucket)
+                .values('shop_id', 'period_start')
+                .annotate(
+                    record_count=Count('id'),
+                    **{f'{field}_sum': Sum(field) for field in ROLLUP_FIELDS},
+                )
+            )
+
+            columns = ['shop_id', 'period_start', 'record_count', *[f'{field}_sum' for field in ROLLUP_FIELDS]]
+            created += _insert_rollups(KPIRollup, rows, columns, grain)
+
+    return created
+
+
+def refresh_kpi_rollups(touched):
+    """
+    Пересчитывает агрегаты, затронутые изменением записей KPI.
+
+    Args:
+        touched (iterable): Пары (shop_id, date) измененных записей
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    touched = set(touched)
+    if not touched:
+        return 0
+
+    shop_ids = sorted({shop_id for shop_id, _ in touched})
+    dates = [day for _, day in touched]
+    return rebuild_kpi_rollups(min(dates), max(dates), shop_ids)
+
+
+def load_inventory_rollups(start_date, end_date, category_id=None, shop_ids=None):
+    """
+    Суммы остатков по позициям за диапазон дат.
+
+    Недели и месяцы, целиком лежащие в диапазоне, читаются из InventoryRollup,
+    остальные дни - из записей InventoryRecord.
+
+    Args:
+        start_date (date): Начало диапазона (включительно)
+        end_date (date): Конец диапазона (включительно)
+        category_id (int): ID категории позиций (None - все категории)
+        shop_ids (list): Список ID цехов (пустой - все цеха)
+
+    Returns:
+        dict: Количество записей (records) и суммы полей по ID позиции
+    """
+    buckets = plan_rollup_buckets(start_date, end_date, 'month')
+
+    condition = Q()
+    for grain in INVENTORY_ROLLUP_GRAINS:
+        if buckets[grain]:
+            condition |= Q(grain=grain, period_start__in=buckets[grain])
+
+    groupings = []
+    if condition:
+        groupings.append((
+            InventoryRollup.objects.filter(condition),
+            {'records': Sum('record_count'), **{field: Sum(f'{field}_sum') for field in INVENTORY_ROLLUP_FIELDS}},
+        ))
+    if buckets['day']:
+        groupings.append((
+            InventoryRecord.objects.filter(date__in=buckets['day']),
+            {'records': Count('id'), **{field: Sum(field) for field in INVENTORY_ROLLUP_FIELDS}},
+        ))
+
+    items = {}
+    for queryset, sums in groupings:
+        if category_id:
+            queryset = queryset.filter(item__category_id=category_id)
+        if shop_ids:
+            queryset = queryset.filter(shop_id__in=shop_ids)
+        for row in queryset.order_by().values('item_id').annotate(**sums):
+            item = items.get(row['item_id'])
+            if item is None:
+                item = items[row['item_id']] = {
+                    'records': 0,
+                    **{field: 0 for field in INVENTORY_ROLLUP_FIELDS},
+                }
+            item['records'] += row['records']
+            for field in INVENTORY_ROLLUP_FIELDS:
+                item[field] += row[field] or 0
+    return items
+
+
+def load_inventory_daily_totals(start_date, end_date, category_id=None, shop_ids=None):
+    """
+    Суммы остатков и дефицита по датам из InventoryDailyTotal.
+
+    Args:
+        start_date (date): Начало диапазона (включительно)
+        end_date (date): Конец диапазона (включительно)
+        category_id (int): ID категории позиций (None - все категории)
+        shop_ids (list): Список ID цехов (пустой - все цеха)
+
+    Returns:
+        dict: Суммы quantity и shortage по дате (только даты с записями)
+    """
+    queryset = InventoryDailyTotal.objects.filter(date__range=(start_date, end_date))
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+    if shop_ids:
+        queryset = queryset.filter(shop_id__in=shop_ids)
+
+    rows = queryset.order_by().values('date').annotate(
+        quantity=Sum('quantity_sum'),
+        shortage=Sum('shortage_sum'),
+    )
+    return {
+        row['date']: {'quantity': row['quantity'] or 0, 'shortage': row['shortage'] or 0}
+        for row in rows
+    }
+
+
+def rebuild_inventory_rollups(start_date=None, end_date=None, shop_ids=None, item_ids=None):
+    """
+    Пересчитывает агрегаты остатков в диапазоне дат.
+
+    Недельные и месячные агрегаты пересчитываются для выбранных позиций
+    с расширением диапазона до границ интервалов. Дневные суммы по
+    категориям пересчитываются за сам диапазон для всех позиций цехов:
+    позиция могла перейти в другую категорию. Без аргументов агрегаты
+    перестраиваются полностью.
+
+    Args:
+        start_date (date): Начало диапазона (None - с первой записи)
+        end_date (date): Конец диапазона (None - до последней записи)
+        shop_ids (list): Список ID цехов (None - все цеха)
+        item_ids (list): Список ID позиций (None - все позиции)
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    full_rebuild = start_date is None and end_date is None and shop_ids is None and item_ids is None
+
+    records = InventoryRecord.objects.order_by()
+    if shop_ids is not None:
+        records = records.filter(shop_id__in=shop_ids)
+
+    if start_date is None or end_date is None:
+        bounds = records if item_ids is None else records.filter(item_id__in=item_ids)
+        bounds = bounds.values_list('date', flat=True).order_by('date')
+        first_date, last_date = bounds.first(), bounds.last()
+        start_date = start_date or first_date
+        end_date = end_date or last_date
+
+    created = 0
+    with transaction.atomic():
+        if full_rebuild:
+            InventoryRollup.objects.all().delete()
+            InventoryDailyTotal.objects.all().delete()
+        if start_date is None or end_date is None:
+            return created
+
+        item_records = records if item_ids is None else records.filter(item_id__in=item_ids)
+        for grain in INVENTORY_ROLLUP_GRAINS:
+            span_start = bucket_start(start_date, grain)
+            span_end = bucket_end(bucket_start(end_date, grain), grain)
+
+            if not full_rebuild:
+                stale = InventoryRollup.objects.filter(grain=grain, period_start__range=(span_start, span_end))
+                if shop_ids is not None:
+                    stale = stale.filter(shop_id__in=shop_ids)
+                if item_ids is not None:
+                    stale = stale.filter(item_id__in=item_ids)
+                stale.delete()
+
+            rows = (
+                item_records.filter(date__range=(span_start, span_end))
+                .annotate(period_start=Trunc('date', grain, output_field=DateField()))
+                .values('item_id', 'shop_id', 'period_start')
+                .annotate(
+                    record_count=Count('id'),
+                    **{f'{field}_sum': Sum(field) for field in INVENTORY_ROLLUP_FIELDS},
+                )
+            )
+            columns = [
+                'item_id', 'shop_id', 'period_start', 'record_count',
+                *[f'{field}_sum' for field in INVENTORY_ROLLUP_FIELDS],
+            ]
+            created += _insert_rollups(InventoryRollup, rows, columns, grain)
+
+        if not full_rebuild:
+            stale = InventoryDailyTotal.objects.filter(date__range=(start_date, end_date))
+            if shop_ids is not None:
+                stale = stale.filter(shop_id__in=shop_ids)
+            stale.delete()
+
+        rows = (
+            records.filter(date__range=(start_date, end_date))
+            .annotate(category_id=F('item__category_id'))
+            .values('shop_id', 'category_id', 'date')
+            .annotate(
+                record_count=Count('id'),
+                quantity_sum=Sum('quantity'),
+                shortage_sum=Sum('shortage'),
+            )
+        )
+        columns = ['shop_id', 'category_id', 'date', 'record_count', 'quantity_sum', 'shortage_sum']
+        created += _insert_rollups(InventoryDailyTotal, rows, columns)
+
+    return created
+
+
+def refresh_inventory_rollups(touched):
+    """
+    Пересчитывает агрегаты, затронутые изменением записей остатков.
+
+    Args:
+        touched (iterable): Тройки (item_id, shop_id, date) измененных записей
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    touched = set(touched)
+    if not touched:
+        return 0
+
+    item_ids = sorted({item_id for item_id, _, _ in touched})
+    shop_ids = sorted({shop_id for _, shop_id, _ in touched})
+    dates = [day for _, _, day in touched]
+    return rebuild_inventory_rollups(min(dates), max(dates), shop_ids, item_ids)
+
+
+def delete_records(queryset):
+    """
+    Удаляет записи KPI или остатков одним запросом DELETE.
+
+    Обработчики post_delete отключают быстрое удаление Django: QuerySet.delete()
+    загружает каждую запись и отправляет сигнал. Здесь записи удаляются без
+    сигналов (вместе со срабатываниями уведомлений по записям KPI), поэтому
+    агрегаты и штампы версий вызывающий код обновляет явно
+    (rebuild_kpi_rollups, rebuild_inventory_rollups, mark_data_changed).
+
+    Args:
+        queryset (QuerySet): Записи KPIRecord или InventoryRecord
+
+    Returns:
+        int: Количество удаленных записей
+    """
+    if queryset.model is KPIRecord:
+        AlertEvent.objects.filter(record__in=queryset).delete()
+    return queryset._raw_delete(queryset.db)
+
+
+def _schedule_refresh(source, key, refresh):
+    pending = getattr(_deferred, 'pending', None)
+    if pending is None:
+        refresh([key])
+    else:
+        pending[source].add(key)
+
+
+def schedule_rollup_refresh(shop_id, day):
+    """
+    Отмечает изменение записи KPI.
+
+    Внутри deferred_rollup_refresh() изменения накапливаются, иначе агрегаты
+    пересчитываются сразу.
+    """
+    _schedule_refresh('kpi', (shop_id, day), refresh_kpi_rollups)
+
+
+def schedule_inventory_rollup_refresh(item_id, shop_id, day):
+    """
+    Отмечает изменение записи остатков (аналог schedule_rollup_refresh).
+    """
+    _schedule_refresh('inventory', (item_id, shop_id, day), refresh_inventory_rollups)
+
+
+@contextmanager
+def deferred_rollup_refresh():
+    """
+    Откладывает пересчет агрегатов KPI и остатков до выхода из блока.
+
+    Используется массовыми загрузками, чтобы пересчитать каждый интервал
+    один раз, а не после каждой сохраненной записи. Штампы версий данных
+    внутри блока тоже откладываются и меняются после пересчета, иначе ответ
+    по прежним агрегатам мог бы закэшироваться под новым штампом.
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    with deferred_data_changes():
+        _deferred.pending = {'kpi': set(), 'inventory': set()}
+        try:
+            yield
+            pending = _deferred.pending
+        finally:
+            _deferred.pending = None
+        refresh_kpi_rollups(pending['kpi'])
+        refresh_inventory_rollups(pending['inventory'])
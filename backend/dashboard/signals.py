@@ -0,0 +1,119 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import mark_data_changed
+from .models import AlertEvent, AlertRule, InventoryCategory, InventoryItem, InventoryRecord, KPIRecord
+from .rollups import rebuild_inventory_rollups, schedule_inventory_rollup_refresh, schedule_rollup_refresh
+
+
+@receiver(pre_save, sender=KPIRecord)
+def remember_kpi_bucket(sender, instance, **kwargs):
+    """Запоминает прежние цех и дату записи KPI, чтобы пересчитать старый интервал"""
+    if instance.pk:
+        instance._rollup_previous = (
+            KPIRecord.objects.filter(pk=instance.pk).values_list('shop_id', 'date').first()
+        )
+
+
+@receiver(post_save, sender=KPIRecord)
+def kpi_record_saved(sender, instance, **kwargs):
+    """Пересчитывает агрегаты KPI после сохранения записи"""
+    schedule_rollup_refresh(instance.shop_id, instance.date)
+
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous and previous != (instance.shop_id, instance.date):
+        schedule_rollup_refresh(*previous)
+    mark_data_changed('kpi')
+
+
+@receiver(post_delete, sender=KPIRecord)
+def kpi_record_deleted(sender, instance, **kwargs):
+    """Пересчитывает агрегаты KPI после удаления записи"""
+    schedule_rollup_refresh(instance.shop_id, instance.date)
+    mark_data_changed('kpi')
+
+
+@receiver(pre_save, sender=InventoryRecord)
+def remember_inventory_bucket(sender, instance, **kwargs):
+    """Запоминает прежние позицию, цех и дату записи остатков"""
+    if instance.pk:
+        instance._rollup_previous = (
+            InventoryRecord.objects.filter(pk=instance.pk).values_list('item_id', 'shop_id', 'date').first()
+        )
+
+
+@receiver(post_save, sender=InventoryRecord)
+def inventory_record_saved(sender, instance, **kwargs):
+    """Пересчитывает агрегаты остатков и сбрасывает закэшированные данные склада"""
+    schedule_inventory_rollup_refresh(instance.item_id, instance.shop_id, instance.date)
+
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous and previous != (instance.item_id, instance.shop_id, instance.date):
+        schedule_inventory_rollup_refresh(*previous)
+    mark_data_changed('inventory')
+
+
+@receiver(pre_save, sender=InventoryItem)
+def remember_item_category(sender, instance, **kwargs):
+    """Запоминает прежнюю категорию позиции"""
+    if instance.pk:
+        instance._previous_category_id = (
+            InventoryItem.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=InventoryItem)
+def inventory_item_saved(sender, instance, **kwargs):
+    """
+    Сбрасывает закэшированные данные склада.
+
+    При смене категории пересчитываются дневные суммы по категориям
+    за все даты записей позиции.
+    """
+    previous = getattr(instance, '_previous_category_id', None)
+    if previous is not None and previous != instance.category_id:
+        rebuild_inventory_rollups(item_ids=[instance.pk])
+    mark_data_changed('inventory')
+
+
+@receiver(post_save, sender=InventoryCategory)
+def inventory_category_saved(sender, instance, **kwargs):
+    """Сбрасывает закэшированные данные склада (названия категорий)"""
+    mark_data_changed('inventory')
+
+
+@receiver(post_delete, sender=InventoryRecord)
+def inventory_record_deleted(sender, instance, **kwargs):
+    """
+    Пересчитывает агрегаты остатков и сбрасывает закэшированные данные
+    склада после удаления записи.
+    
+    Обработчик отключает быстрое удаление записей одним запросом, поэтому
+    массовые удаления выполняются через rollups.delete_records с явным
+    пересчетом агрегатов.
+    """
+    schedule_inventory_rollup_refresh(instance.item_id, instance.shop_id, instance.date)
+    mark_data_changed('inventory')
+
+
+# Поля правила, от которых зависят его срабатывания
+ALERT_RULE_CONDITION_FIELDS = ('indicator', 'condition', 'threshold')
+
+
+@receiver(pre_save, sender=AlertRule)
+def reset_alert_rule_checkpoint(sender, instance, **kwargs):
+    """Сбрасывает контрольную точку правила при изменении его условия"""
+    if not instance.pk:
+        return
+    previous = AlertRule.objects.filter(pk=instance.pk).values(*ALERT_RULE_CONDITION_FIELDS).first()
+    if previous and any(previous[field] != getattr(instance, field) for field in ALERT_RULE_CONDITION_FIELDS):
+        instance.checked_until = None
+        instance._alert_condition_changed = True
+
+
+@receiver(post_save, sender=AlertRule)
+def alert_rule_saved(sender, instance, **kwargs):
+    """Удаляет срабатывания по прежнему условию: правило будет проверено заново"""
+    if getattr(instance, '_alert_condition_changed', False):
+        AlertEvent.objects.filter(rule=instance).delete()
+        instance._alert_condition_changed = False
@@ -0,0 +1,516 @@
+"""
+Синхронизация с файловыми выгрузками 1С и Access (модель DataSource).
+
+Выгрузка 1С содержит показатели KPI по цехам и датам, выгрузка Access -
+складские остатки по артикулам, цехам и датам. Поддерживаются CSV (первая
+строка - заголовки, разделитель ";", "," или табуляция, UTF-8 или
+Windows-1251) и XML (элементы record или row, значения в атрибутах или
+дочерних элементах). Заголовки колонок - имена полей моделей, их
+русские названия или заголовки выгрузки отчета KPI.
+
+Выгрузки считаются дописываемыми: источник хранит водяной знак - конец
+прочитанных строк (смещение в байтах для CSV, количество записей для
+XML), и следующий запуск разбирает только строки после него. Незаконченная
+последняя строка CSV не читается до следующего запуска. Если изменилось
+начало файла или файл стал короче водяного знака, выгрузка заменена и
+читается с начала; запись с обновлением существующих строк делает
+повторное чтение безопасным.
+
+Строки пишутся пакетами; водяной знак сдвигается в той же транзакции, что
+и запись пакета, поэтому после сбоя запуск продолжается с последнего
+записанного пакета. Каждый запуск сохраняется в DataSyncRun с
+количеством строк и длительностью.
+"""
+from datetime import datetime, timedelta
+import csv
+import hashlib
+import os
+import time
+import xml.etree.ElementTree as ET
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import mark_data_changed
+from .exports import REPORT_EXPORT_COLUMNS
+from .ingest import KPI_VALUE_FIELDS, upsert_inventory_records, upsert_kpi_records
+from .models import (
+    DataSource,
+    DataSyncRun,
+    InventoryCategory,
+    InventoryItem,
+    InventoryRecord,
+    KPIRecord,
+    Shop,
+)
+from .rollups import refresh_inventory_rollups, refresh_kpi_rollups
+
+
+# Интервал между запусками для каждого расписания ('manual' - только вручную)
+SYNC_SCHEDULE_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+# Размер пакета записи
+SYNC_BATCH_SIZE = 2000
+
+# Размер начала файла, по которому определяется замена выгрузки (байты)
+SYNC_SIGNATURE_SIZE = 1024
+
+# Теги записей в XML-выгрузке
+SYNC_XML_RECORD_TAGS = {'record', 'row'}
+
+# Форматы дат выгрузок (ISO и формат 1С)
+SYNC_DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d.%m.%Y %H:%M:%S', '%Y-%m-%dT%H:%M:%S')
+
+# Файлы баз данных Access (нужна выгрузка таблицы в CSV или XML)
+SYNC_UNSUPPORTED_EXTENSIONS = {'.accdb', '.mdb'}
+
+# Кодировки CSV в порядке проверки
+SYNC_ENCODINGS = ('utf-8-sig', 'cp1251')
+
+
+class SyncRowError(ValueError):
+    """Строка выгрузки не может быть записана (пропускается)."""
+
+
+def _field_aliases(model, *extra):
+    """Возвращает {заголовок в нижнем регистре: поле} для полей модели."""
+    aliases = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        aliases[field.name.lower()] = field.name
+        aliases[str(field.verbose_name).lower()] = field.name
+    for header, field in extra:
+        aliases[header.lower()] = field
+    return aliases
+
+
+# Колонки выгрузки 1С: поля KPIRecord, цех - по названию
+KPI_SYNC_COLUMNS = _field_aliases(
+    KPIRecord,
+    *((header, 'shop' if field == 'shop__name' else field) for header, field in REPORT_EXPORT_COLUMNS),
+)
+
+# Колонки выгрузки Access: поля InventoryRecord, позиция - по артикулу
+INVENTORY_SYNC_COLUMNS = _field_aliases(
+    InventoryRecord,
+    ('sku', 'sku'),
+    ('артикул', 'sku'),
+    ('name', 'name'),
+    ('название позиции', 'name'),
+    ('category', 'category'),
+    ('категория', 'category'),
+    ('unit', 'unit'),
+    ('единица измерения', 'unit'),
+)
+
+
+def source_is_due(source, now=None):
+    """
+    Проверяет, пора ли синхронизировать источник по его расписанию.
+
+    Args:
+        source (DataSource): Источник данных
+        now (datetime): Текущее время (по умолчанию timezone.now())
+
+    Returns:
+        bool: True для включенного источника с истекшим интервалом
+    """
+    interval = SYNC_SCHEDULE_INTERVALS.get(source.schedule)
+    if not source.enabled or not source.path or interval is None:
+        return False
+    if source.last_sync_at is None:
+        return True
+    return (now or timezone.now()) - source.last_sync_at >= interval
+
+
+def file_signature(path, length=SYNC_SIGNATURE_SIZE):
+    """
+    Возвращает подпись начала файла вида "<длина>:<sha1>".
+
+    Args:
+        path (str): Путь к файлу
+        length (int): Сколько байт начала файла учитывать
+    """
+    with open(path, 'rb') as source:
+        head = source.read(length)
+    return f'{len(head)}:{hashlib.sha1(head).hexdigest()}'
+
+
+def _signature_matches(path, signature):
+    if not signature:
+        return False
+    length = int(signature.split(':', 1)[0])
+    return file_signature(path, length) == signature
+
+
+def _decode(line):
+    for encoding in SYNC_ENCODINGS:
+        try:
+            return line.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return line.decode('utf-8', errors='replace')
+
+
+def _csv_delimiter(header):
+    return max((';', ',', '\t'), key=header.count)
+
+
+def iter_csv_rows(path, position=0):
+    """
+    Читает строки CSV-выгрузки после водяного знака.
+
+    Args:
+        path (str): Путь к файлу
+        position (int): Смещение в байтах первой непрочитанной строки
+
+    Yields:
+        tuple: (словарь {заголовок: значение}, смещение после строки)
+    """
+    with open(path, 'rb') as source:
+        header_line = source.readline()
+        if not header_line.endswith(b'\n'):
+            return
+        header = _decode(header_line).strip('\r\n')
+        delimiter = _csv_delimiter(header)
+        columns = [column.strip().lower() for column in next(csv.reader([header], delimiter=delimiter))]
+
+        position = max(position, source.tell())
+        source.seek(position)
+        for line in source:
+            # Строка, которую источник еще дописывает
+            if not line.endswith(b'\n'):
+                break
+            position += len(line)
+            text = _decode(line).strip('\r\n')
+            if not text.strip():
+                continue
+            values = next(csv.reader([text], delimiter=delimiter))
+            yield dict(zip(columns, (value.strip() for value in values))), position
+
+
+def iter_xml_rows(path, position=0):
+    """
+    Читает записи XML-выгрузки после водяного знака.
+
+    Args:
+        path (str): Путь к файлу
+        position (int): Количество уже прочитанных записей
+
+    Yields:
+        tuple: (словарь {имя: значение}, номер записи)
+    """
+    count = 0
+    root = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        if event != 'end':
+            continue
+        tag = element.tag.rsplit('}', 1)[-1].lower()
+        if tag not in SYNC_XML_RECORD_TAGS:
+            continue
+        count += 1
+        if count > position:
+            values = {name.lower(): value.strip() for name, value in element.attrib.items()}
+            for child in element:
+                values[child.tag.rsplit('}', 1)[-1].lower()] = (child.text or '').strip()
+            yield values, count
+        # Прочитанные записи удаляются из дерева
+        root.clear()
+
+
+def read_export_rows(path, position=0):
+    """
+    Выбирает чтение выгрузки по расширению файла (XML или CSV).
+
+    Raises:
+        ValueError: Для файла базы данных Access вместо выгрузки
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in SYNC_UNSUPPORTED_EXTENSIONS:
+        raise ValueError(
+            f'Файл {extension} не читается напрямую: укажите CSV- или XML-выгрузку таблицы остатков'
+        )
+    if extension == '.xml':
+        return iter_xml_rows(path, position)
+    return iter_csv_rows(path, position)
+
+
+def parse_date(value):
+    """
+    Разбирает дату выгрузки.
+
+    Raises:
+        SyncRowError: Если значение не является датой
+    """
+    value = (value or '').strip()
+    for date_format in SYNC_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise SyncRowError(f'Некорректная дата: {value!r}')
+
+
+def parse_number(value, integer=False):
+    """
+    Разбирает число выгрузки (допускаются десятичная запятая и пробелы в разрядах).
+
+    Raises:
+        SyncRowError: Если значение не является числом
+    """
+    text = (value or '').replace('\xa0', '').replace(' ', '').replace(',', '.')
+    if not text:
+        return 0
+    try:
+        number = float(text)
+    except ValueError:
+        raise SyncRowError(f'Некорректное число: {value!r}')
+    return int(round(number)) if integer else number
+
+
+def _map_row(values, aliases):
+    return {aliases[name]: value for name, value in values.items() if name in aliases}
+
+
+class _SyncWriter:
+    """
+    Накопитель строк одной выгрузки с пакетной записью.
+
+    Цеха загружаются в словарь один раз; неизвестные цеха создаются.
+    """
+
+    columns = None
+    required = ()
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = []
+        self.written = 0
+        self.skipped = 0
+        self.shop_ids = {}
+        for shop_id, name in Shop.objects.order_by('id').values_list('id', 'name'):
+            self.shop_ids.setdefault(name, shop_id)
+
+    def _shop_id(self, name):
+        if not name:
+            raise SyncRowError('Не указан цех')
+        if name not in self.shop_ids:
+            self.shop_ids[name] = Shop.objects.create(name=name).id
+        return self.shop_ids[name]
+
+    def add(self, values):
+        """Разбирает строку выгрузки; строки с ошибками пропускаются."""
+        row = _map_row(values, self.columns)
+        try:
+            missing = [name for name in self.required if not row.get(name)]
+            if missing:
+                raise SyncRowError(f'Нет значений: {", ".join(missing)}')
+            self.pending.append(self.parse(row))
+        except SyncRowError:
+            self.skipped += 1
+        return len(self.pending) >= self.batch_size
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def write(self):
+        """Записывает накопленные строки (вызывается внутри транзакции)."""
+        if self.pending:
+            self.written += self.write_batch(self.pending)
+            self.pending = []
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        """Обновляет агрегаты и кэш после всех пакетов."""
+
+
+class KPISyncWriter(_SyncWriter):
+    """
+    Запись выгрузки 1С в KPIRecord.
+
+    Запись за цех и дату обновляется, если она уже есть, иначе создается
+    (upsert_kpi_records); показатели, которых нет в выгрузке, у новой
+    записи равны нулю.
+    """
+
+    columns = KPI_SYNC_COLUMNS
+    required = ('shop', 'date')
+
+    def __init__(self, batch_size):
+        super().__init__(batch_size)
+        self.touched = set()
+
+    def parse(self, row):
+        record = {
+            'shop_id': self._shop_id(row['shop']),
+            'date': parse_date(row['date']),
+        }
+        for name, integer in KPI_VALUE_FIELDS.items():
+            if name in row:
+                record[name] = parse_number(row[name], integer)
+        return record
+
+    def write_batch(self, rows):
+        # Повторы цеха и даты в пакете: остается последняя строка
+        records = {(row['shop_id'], row['date']): row for row in rows}
+        self.touched.update(records)
+        return upsert_kpi_records(list(records.values()), self.batch_size)
+
+    def finish(self):
+        # bulk_create не отправляет сигналы сохранения
+        if self.touched:
+            refresh_kpi_rollups(self.touched)
+            mark_data_changed('kpi')
+
+
+class InventorySyncWriter(_SyncWriter):
+    """
+    Запись выгрузки Access в InventoryRecord.
+
+    Артикулы сопоставляются с позициями по словарю, загруженному один раз;
+    новые позиции создаются пакетно. Записи вставляются с обновлением при
+    конфликте по ключу (item, shop, date) (upsert_inventory_records).
+    """
+
+    columns = INVENTORY_SYNC_COLUMNS
+    required = ('sku', 'shop', 'date')
+    values = ('quantity', 'reserved', 'min_threshold', 'demand', 'shortage')
+
+    def __init__(self, batch_size):
+        super().__init__(batch_size)
+        self.item_ids = dict(InventoryItem.objects.values_list('sku', 'id'))
+        self.category_ids = {}
+        for category_id, name in InventoryCategory.objects.order_by('id').values_list('id', 'name'):
+            self.category_ids.setdefault(name, category_id)
+        self.units = {code for code, _ in InventoryItem.UNIT_CHOICES}
+        self.touched = set()
+
+    def _category_id(self, name):
+        name = name or 'Без категории'
+        if name not in self.category_ids:
+            self.category_ids[name] = InventoryCategory.objects.create(name=name).id
+        return self.category_ids[name]
+
+    def parse(self, row):
+        record = {
+            'sku': row['sku'][:50],
+            'shop_id': self._shop_id(row['shop']),
+            'date': parse_date(row['date']),
+            'item': row,
+        }
+        for name in self.values:
+            record[name] = parse_number(row.get(name), integer=True)
+        return record
+
+    def write_batch(self, rows):
+        records = {(row['sku'], row['shop_id'], row['date']): row for row in rows}
+
+        new_items = {}
+        for row in records.values():
+            if row['sku'] not in self.item_ids and row['sku'] not in new_items:
+                item = row['item']
+                new_items[row['sku']] = InventoryItem(
+                    sku=row['sku'],
+                    name=(item.get('name') or row['sku'])[:200],
+                    category_id=self._category_id(item.get('category')),
+                    unit=item.get('unit') if item.get('unit') in self.units else 'pcs',
+                )
+        if new_items:
+            InventoryItem.objects.bulk_create(new_items.values(), ignore_conflicts=True)
+            self.item_ids.update(
+                InventoryItem.objects.filter(sku__in=list(new_items)).values_list('sku', 'id')
+            )
+
+        upserts = [
+            {
+                'item_id': self.item_ids[row['sku']],
+                'shop_id': row['shop_id'],
+                'date': row['date'],
+                **{name: row[name] for name in self.values},
+            }
+            for row in records.values()
+        ]
+        self.touched.update((row['item_id'], row['shop_id'], row['date']) for row in upserts)
+        return upsert_inventory_records(upserts, self.batch_size)
+
+    def finish(self):
+        # bulk_create не отправляет сигналы сохранения
+        if self.touched:
+            refresh_inventory_rollups(self.touched)
+            mark_data_changed('inventory')
+
+
+SYNC_WRITERS = {
+    '1c': KPISyncWriter,
+    'access': InventorySyncWriter,
+}
+
+
+def sync_data_source(source, batch_size=SYNC_BATCH_SIZE, full=False):
+    """
+    Синхронизирует источник данных с его выгрузкой.
+
+    Args:
+        source (DataSource): Источник данных
+        batch_size (int): Количество строк в одной транзакции записи
+        full (bool): Прочитать выгрузку с начала, не учитывая водяной знак
+
+    Returns:
+        DataSyncRun: Сохраненный результат запуска
+    """
+    run = DataSyncRun(source=source, started_at=timezone.now(), position=source.sync_position)
+    started = time.perf_counter()
+    writer = None
+    try:
+        if not source.path:
+            raise ValueError('Не указан путь к файлу выгрузки')
+
+        # Замененная или укороченная выгрузка читается с начала
+        position = source.sync_position
+        if full or os.path.getsize(source.path) < position or not _signature_matches(source.path, source.sync_signature):
+            position = 0
+        rows = read_export_rows(source.path, position)
+        writer = SYNC_WRITERS[source.kind](batch_size)
+
+        def commit(position):
+            with transaction.atomic():
+                writer.write()
+                source.sync_position = position
+                source.sync_signature = file_signature(source.path)
+                DataSource.objects.filter(pk=source.pk).update(
+                    sync_position=source.sync_position,
+                    sync_signature=source.sync_signature,
+                )
+
+        for values, position in rows:
+            run.rows_read += 1
+            if writer.add(values):
+                commit(position)
+        commit(position)
+
+        run.status = 'success'
+        source.last_sync_at = timezone.now()
+        DataSource.objects.filter(pk=source.pk).update(last_sync_at=source.last_sync_at)
+    except (OSError, ValueError, ET.ParseError, csv.Error) as error:
+        run.status = 'error'
+        run.error = str(error)
+    finally:
+        # Записанные до ошибки пакеты тоже попадают в агрегаты и кэш
+        if writer is not None:
+            writer.finish()
+            run.rows_written = writer.written
+            run.rows_skipped = writer.skipped
+
+    run.position = source.sync_position
+    run.duration = time.perf_counter() - started
+    run.save()
+    return run
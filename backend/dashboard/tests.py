@@ -0,0 +1,1471 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import gzip
+from io import BytesIO, StringIO
+from contextlib import ExitStack, contextmanager
+import csv
+from functools import partial
+import json
+from pathlib import Path
+from unittest import mock
+import re
+import tempfile
+import threading
+import unittest
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from dashboard import alerting, cube, imports, live, middleware, payloads
+from dashboard.alerting import ALERT_CHECKPOINT_WINDOW, evaluate_alert_rules, rule_condition
+from dashboard.caching import get_data_version, get_latest_kpi_date, mark_data_changed
+from dashboard.charts import bucket_count, chart_grain, chart_max_points, downsample_series, lttb_indices
+from dashboard.exports import EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, REPORT_EXPORT_COLUMNS, stream_xlsx
+from dashboard.imports import excel_date, iter_uchet_cabinets, iter_xlsx_rows
+from dashboard.ingest import ingest_rows
+from dashboard.live import LiveStream, format_stream_position, parse_stream_position
+from dashboard.metrics import Histogram, RequestMetrics, server_timing
+from dashboard.middleware import COMPRESS_MIN_SIZE, ResponseCompressionMiddleware, _accepted_encodings
+from dashboard.models import (
+    AlertEvent,
+    AlertRule,
+    DataSource,
+    DataSyncRun,
+    InventoryCategory,
+    InventoryItem,
+    InventoryDailyTotal,
+    InventoryRecord,
+    InventoryRollup,
+    KPIRecord,
+    KPIRollup,
+    Shop,
+)
+from dashboard.pagination import KPI_REPORT_ORDERING, decode_cursor, encode_cursor, paginate_kpi_records
+from dashboard.payloads import columnar_chart_data, columnar_rows, columnar_series, dumps
+from dashboard.rollups import (
+    INVENTORY_ROLLUP_FIELDS,
+    ROLLUP_GRAINS,
+    bucket_start,
+    deferred_rollup_refresh,
+    delete_records,
+    rebuild_inventory_rollups,
+    rebuild_kpi_rollups,
+)
+from dashboard.sync import sync_data_source
+from dashboard.views import (
+    _build_inventory_payload,
+    _compose_inventory_payload,
+    _inventory_period_range,
+    _load_dashboard_data,
+    _run_concurrently,
+)
+
+
+DASHBOARD_PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+
+def create_kpi_records(shops, end_date, days):
+    KPIRecord.objects.bulk_create([
+        KPIRecord(
+            shop=shop,
+            date=end_date - timedelta(days=offset),
+            output=100 + offset,
+            downtime_hours=1.5,
+            defect_rate=2.25,
+            equipment_load=80.0,
+            inventory_level=1000 + offset,
+            plan_completion=95.0,
+            quality_index=90.0,
+        )
+        for shop in shops
+        for offset in range(days)
+    ])
+    # Пакетная вставка не вызывает сигналы: агрегаты строятся явно
+    rebuild_kpi_rollups()
+
+
+def server_timing_queries(response):
+    """Возвращает количество SQL-запросов из заголовка Server-Timing."""
+    return int(re.search(r'db;[^,]*desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+
+@contextmanager
+def connection_max_age(max_age):
+    """Временно задает CONN_MAX_AGE всем подключениям к базе данных."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(mock.patch.dict(connections[alias].settings_dict, CONN_MAX_AGE=max_age))
+        yield
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], KPI_CUBE=False, REQUEST_METRICS=False)
+class DashboardQueryCountTests(TestCase):
+    """
+    Количество SQL-запросов дашборда не зависит от периода и выбора цехов.
+
+    Карточки и графики читают агрегаты KPIRollup одним запросом, поэтому
+    год стоит столько же запросов, сколько день, а выбор цехов меняет
+    только условие запроса. Без постоянных соединений _run_concurrently
+    выполняет запросы в потоке теста, поэтому их учитывает assertNumQueries.
+    """
+
+    # Сессия, пользователь, агрегаты, последнее срабатывание уведомления
+    # (положение потока изменений); штамп версии и последняя дата - в кэше
+    # процесса
+    AJAX_QUERIES = 4
+    # Плюс группа пользователя (роль в base.html) и список цехов для фильтра
+    PAGE_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='viewer')
+        cls.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 4)]
+        create_kpi_records(cls.shops, date(2025, 6, 30), 400)
+
+    def setUp(self):
+        cache.clear()
+        mark_data_changed()
+        self.client.force_login(self.user)
+        self.enterContext(connection_max_age(0))
+
+    def get_dashboard(self, params, ajax=False):
+        headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if ajax else {}
+        response = self.client.get('/', params, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertDashboardQueries(self, count, params, ajax=False):
+        # Первый запрос заполняет кэш штампа версии и последней даты
+        self.get_dashboard(params, ajax)
+        with self.assertNumQueries(count):
+            return self.get_dashboard(params, ajax)
+
+    def test_page_queries_per_period(self):
+        for period in DASHBOARD_PERIODS:
+            with self.subTest(period=period):
+                self.assertDashboardQueries(self.PAGE_QUERIES, {'period': period})
+
+    def test_ajax_queries_per_period(self):
+        for period in DASHBOARD_PERIODS:
+            with self.subTest(period=period):
+                response = self.assertDashboardQueries(self.AJAX_QUERIES, {'period': period}, ajax=True)
+                self.assertEqual(response.json()['kpi']['avg_downtime'], 1.5)
+
+    def test_one_shop_and_all_shops_use_same_queries(self):
+        shop = str(self.shops[0].id)
+        for period in DASHBOARD_PERIODS:
+            with self.subTest(period=period):
+                all_shops = self.assertDashboardQueries(self.AJAX_QUERIES, {'period': period}, ajax=True)
+                one_shop = self.assertDashboardQueries(
+                    self.AJAX_QUERIES, {'period': period, 'shop': shop}, ajax=True
+                )
+                self.assertEqual(
+                    one_shop.json()['kpi']['total_output'] * len(self.shops),
+                    all_shops.json()['kpi']['total_output'],
+                )
+
+    def test_page_queries_for_one_shop(self):
+        self.assertDashboardQueries(self.PAGE_QUERIES, {'period': 'year', 'shop': str(self.shops[0].id)})
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'], KPI_CUBE=False, REQUEST_METRICS=True, REQUEST_METRICS_SAMPLE_RATE=1.0
+)
+class ConcurrentQueryTests(TransactionTestCase):
+    """
+    Одновременный расчет в потоках пула и последовательный расчет в потоке
+    запроса (без постоянных соединений) дают одинаковый ответ.
+
+    Потоки пула открывают свои соединения, поэтому данные сохраняются вне
+    транзакции теста, а запросы считаются по заголовку Server-Timing.
+    """
+
+    def setUp(self):
+        cache.clear()
+        mark_data_changed()
+        self.user = User.objects.create_user('viewer', password='viewer')
+        self.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 3)]
+        create_kpi_records(self.shops, date(2025, 6, 30), 60)
+        self.client.force_login(self.user)
+
+    def run_in_threads(self, max_age):
+        with connection_max_age(max_age):
+            return async_to_sync(_run_concurrently)(threading.get_ident, threading.get_ident)
+
+    def get_dashboard(self, max_age):
+        with connection_max_age(max_age):
+            # Первый запрос заполняет общий кэш последней даты
+            for _ in range(2):
+                cache.clear()
+                response = self.client.get('/', {'period': 'month'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_without_persistent_connections_functions_run_in_request_thread(self):
+        current = threading.get_ident()
+        self.assertEqual(self.run_in_threads(0), [current, current])
+
+    def test_with_persistent_connections_functions_run_in_pool(self):
+        self.assertNotIn(threading.get_ident(), self.run_in_threads(None))
+
+    def test_pool_threads_return_same_dashboard(self):
+        sequential = self.get_dashboard(0)
+        concurrent = self.get_dashboard(None)
+        self.assertEqual(concurrent.json(), sequential.json())
+        self.assertEqual(concurrent.json()['kpi']['avg_downtime'], 1.5)
+        self.assertEqual(server_timing_queries(concurrent), server_timing_queries(sequential))
+
+
+@unittest.skipIf(cube.np is None, 'numpy не установлен')
+class KPICubeTests(TestCase):
+    """Срез куба KPI дает те же карточки и графики, что и агрегаты в базе данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 4)]
+        create_kpi_records(cls.shops, date(2025, 6, 30), 400)
+        # Дробные значения, на которых суммы зависят от порядка сложения
+        KPIRecord.objects.filter(shop=cls.shops[1], date__day__in=(3, 17, 29)).update(
+            defect_rate=3.17, equipment_load=71.3, quality_index=88.45,
+        )
+        rebuild_kpi_rollups()
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(cube, '_cube', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertCubeMatchesRollups(self, shop_ids):
+        for period in DASHBOARD_PERIODS:
+            with self.subTest(period=period, shops=shop_ids):
+                with override_settings(KPI_CUBE=False):
+                    expected = _load_dashboard_data(period, shop_ids)
+                with override_settings(KPI_CUBE=True):
+                    self.assertIsNotNone(cube.get_kpi_cube())
+                    actual = _load_dashboard_data(period, shop_ids)
+                self.assertEqual(actual[0], expected[0])
+                self.assertEqual(actual[1], expected[1])
+
+    def test_all_shops_match_rollups(self):
+        self.assertCubeMatchesRollups([])
+
+    def test_selected_shops_match_rollups(self):
+        self.assertCubeMatchesRollups([str(self.shops[1].id), str(self.shops[2].id)])
+
+
+class KPICubeWithoutNumpyTests(TestCase):
+    """Без numpy включенный куб не используется, и процесс пишет предупреждение."""
+
+    def test_missing_numpy_is_logged_once(self):
+        with override_settings(KPI_CUBE=True), mock.patch.object(cube, 'np', None), \
+                mock.patch.object(cube, '_numpy_warning_logged', False):
+            with self.assertLogs('dashboard.cube', 'WARNING') as logs:
+                self.assertIsNone(cube.get_kpi_cube())
+                self.assertIsNone(cube.get_kpi_cube())
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('numpy', logs.output[0])
+
+    def test_disabled_cube_is_not_logged(self):
+        with override_settings(KPI_CUBE=False), mock.patch.object(cube, 'np', None), \
+                mock.patch.object(cube, '_numpy_warning_logged', False), \
+                mock.patch.object(cube.logger, 'warning') as warning:
+            self.assertIsNone(cube.get_kpi_cube())
+        warning.assert_not_called()
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсоры таблицы отчетов проходят все записи без пропусков и повторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Одинаковые даты у разных цехов и цехи с одинаковым именем: порядок
+        # внутри даты решают имя цеха и id
+        shops = [Shop.objects.create(name=name) for name in ('Цех Б', 'Цех А', 'Цех В', 'Цех А')]
+        create_kpi_records(shops, date(2025, 6, 30), 5)
+        cls.expected = list(KPIRecord.objects.order_by(*KPI_REPORT_ORDERING).values_list('id', flat=True))
+
+    def walk_forward(self, per_page):
+        pages = [paginate_kpi_records(KPIRecord.objects.all(), None, per_page)]
+        while pages[-1].has_next():
+            pages.append(paginate_kpi_records(KPIRecord.objects.all(), pages[-1].next_cursor, per_page))
+        return pages
+
+    def test_cursor_round_trip(self):
+        record = KPIRecord.objects.select_related('shop').get(id=self.expected[3])
+        self.assertEqual(
+            decode_cursor(encode_cursor(record, 'prev')),
+            ('prev', record.date, record.shop.name, record.id),
+        )
+
+    def test_damaged_cursor_is_ignored(self):
+        for token in ('', 'not-base64!', encode_cursor(KPIRecord.objects.first(), 'next')[:-3]):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+
+    def test_forward_pages_cover_ordering_with_ties(self):
+        for per_page in (1, 4, 7, len(self.expected)):
+            with self.subTest(per_page=per_page):
+                pages = self.walk_forward(per_page)
+                self.assertEqual([record.id for page in pages for record in page], self.expected)
+                self.assertFalse(pages[0].has_previous())
+                self.assertTrue(all(page.has_previous() for page in pages[1:]))
+                self.assertEqual(len(pages), -(-len(self.expected) // per_page))
+
+    def test_backward_pages_repeat_forward_pages(self):
+        forward = self.walk_forward(4)
+        backward = [forward[-1]]
+        while backward[-1].has_previous():
+            backward.append(paginate_kpi_records(KPIRecord.objects.all(), backward[-1].previous_cursor, 4))
+        self.assertEqual(
+            [[record.id for record in page] for page in reversed(backward)],
+            [[record.id for record in page] for page in forward],
+        )
+
+    def test_cursor_past_the_end_returns_first_page(self):
+        last = KPIRecord.objects.select_related('shop').get(id=self.expected[-1])
+        page = paginate_kpi_records(KPIRecord.objects.all(), encode_cursor(last, 'next'), 4)
+        self.assertEqual([record.id for record in page], self.expected[:4])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ReportExportTests(TestCase):
+    """Потоковая выгрузка отчета содержит строки таблицы отчетов в ее порядке."""
+
+    XLSX_NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='viewer')
+        # Имя цеха с символами, которые нужно экранировать в CSV и XML
+        cls.shops = [
+            Shop.objects.create(name='Цех "1"; <сборка> & покраска'),
+            Shop.objects.create(name='Цех 2'),
+        ]
+        create_kpi_records(cls.shops, date(2025, 6, 30), 10)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def export(self, export_format, **params):
+        response = self.client.get('/reports/export/', {'format': export_format, 'period': 'week', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def expected_rows(self, shops):
+        return list(
+            KPIRecord.objects.filter(date__gte=date(2025, 6, 23), shop__in=shops)
+            .order_by('-date', 'shop__name', 'id')
+            .values_list(*[field for _, field in REPORT_EXPORT_COLUMNS])
+        )
+
+    def test_csv_rows(self):
+        response, content = self.export('csv')
+        self.assertIn('kpi_report_week_20250630.csv', response['Content-Disposition'])
+        text = content.decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        rows = list(csv.reader(StringIO(text[1:]), delimiter=';'))
+        self.assertEqual(rows[0], [header for header, _ in REPORT_EXPORT_COLUMNS])
+        self.assertEqual(rows[1:], [[str(value) for value in row] for row in self.expected_rows(self.shops)])
+
+    def test_csv_shop_filter(self):
+        _, content = self.export('csv', shop=str(self.shops[1].id))
+        rows = list(csv.reader(StringIO(content.decode('utf-8')[1:]), delimiter=';'))
+        self.assertEqual(len(rows) - 1, len(self.expected_rows(self.shops[1:])))
+        self.assertEqual({row[1] for row in rows[1:]}, {'Цех 2'})
+
+    def test_xlsx_sheet(self):
+        response, content = self.export('xlsx')
+        self.assertEqual(response['Content-Type'], EXPORT_CONTENT_TYPES['xlsx'])
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+        rows = sheet.findall('x:sheetData/x:row', self.XLSX_NS)
+        expected = self.expected_rows(self.shops)
+        self.assertEqual(len(rows), len(expected) + 1)
+
+        first = rows[1].findall('x:c', self.XLSX_NS)
+        # Дата - число дней от 30.12.1899 со стилем даты
+        self.assertEqual(first[0].get('s'), '1')
+        self.assertEqual(
+            first[0].findtext('x:v', namespaces=self.XLSX_NS),
+            str((date(2025, 6, 30) - date(1899, 12, 30)).days),
+        )
+        self.assertEqual(first[1].findtext('x:is/x:t', namespaces=self.XLSX_NS), expected[0][1])
+        self.assertEqual(first[2].findtext('x:v', namespaces=self.XLSX_NS), str(expected[0][2]))
+
+    def test_xlsx_is_streamed_in_parts(self):
+        rows = [
+            (date(2025, 6, 30), f'Цех {number}', number, 1.5, 2.0, 1000, 3, 95.0)
+            for number in range(EXPORT_CHUNK_SIZE)
+        ]
+        parts = list(stream_xlsx(iter(rows)))
+        self.assertGreater(len(parts), 2)
+        with zipfile.ZipFile(BytesIO(b''.join(parts))) as archive:
+            self.assertIsNone(archive.testzip())
+
+    def test_unknown_format(self):
+        response = self.client.get('/reports/export/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], KPI_CUBE=False)
+class LiveStreamTests(TestCase):
+    """Поток изменений присылает пересчитанные данные дашборда и срабатывания уведомлений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='viewer')
+        cls.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 3)]
+        create_kpi_records(cls.shops, date(2025, 6, 30), 10)
+        cls.rule = AlertRule.objects.create(indicator='output', condition='gt', threshold=150)
+
+    def setUp(self):
+        cache.clear()
+        for patcher in (
+            mock.patch.dict(live._pollers, clear=True),
+            mock.patch.object(live, 'LIVE_POLL_INTERVAL', 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_stream(self, shop_ids=()):
+        shop_ids = list(shop_ids)
+        load = partial(_load_dashboard_data, 'month', [str(shop_id) for shop_id in shop_ids])
+        stream = LiveStream(None, shop_ids, 'month', load)
+        stream.opening()
+        return stream
+
+    def parse_messages(self, messages):
+        events = []
+        for message in messages:
+            lines = [line for line in message.strip().split('\n') if line and not line.startswith(':')]
+            fields = dict(line.split(': ', 1) for line in lines)
+            if 'event' in fields:
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+        return events
+
+    def change_kpi(self, shop, output):
+        with self.captureOnCommitCallbacks(execute=True):
+            KPIRecord.objects.filter(shop=shop, date=date(2025, 6, 30)).update(output=output)
+            rebuild_kpi_rollups()
+            mark_data_changed('kpi')
+
+    def client_get_events(self, params):
+        self.client.force_login(self.user)
+        return self.client.get('/dashboard/events/', params)
+
+    def test_position_round_trip(self):
+        self.assertEqual(parse_stream_position(format_stream_position(('0f3a', 12))), ('0f3a', 12))
+        for value in ('', '12', 'zz:1', '0f3a:-1', '0f3a:x', '0f3a:1:2'):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_stream_position(value))
+
+    def test_opening_and_headers(self):
+        with mock.patch.object(live, 'LIVE_STREAM_MAX_AGE', 0):
+            response = self.client_get_events({'after': 'abc:7', 'period': 'week'})
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertTrue(content.startswith(f'retry: {live.LIVE_RETRY_MS}\n\n'))
+        self.assertEqual(self.parse_messages(content.split('\n\n')), [('ready', 'abc:7', {'period': 'week'})])
+
+    def test_changed_data_sends_recomputed_dashboard(self):
+        stream = self.open_stream([self.shops[0].id])
+        self.assertEqual(stream.step(), ([], False))
+
+        self.change_kpi(self.shops[0], 1000)
+        messages, full = stream.step()
+        self.assertFalse(full)
+        [(event, position, payload)] = self.parse_messages(messages)
+        self.assertEqual(event, 'kpi')
+        self.assertEqual(position, format_stream_position((get_data_version('kpi'), 0)))
+        kpi_summary, chart_data = _load_dashboard_data('month', [str(self.shops[0].id)])
+        expected = json.dumps({'kpi': kpi_summary, 'chart_data': chart_data}, cls=DjangoJSONEncoder)
+        self.assertEqual(payload, json.loads(expected))
+        self.assertIn(1000, payload['chart_data']['production_by_date'].values())
+
+    def test_other_shop_changes_are_not_sent(self):
+        stream = self.open_stream([self.shops[0].id])
+        self.change_kpi(self.shops[0], 1000)
+        self.assertEqual(len(stream.step()[0]), 1)
+
+        self.change_kpi(self.shops[1], 2000)
+        self.assertEqual(stream.step()[0], [])
+        self.assertEqual(stream.version, get_data_version('kpi'))
+
+    def test_alert_events_for_selected_shops(self):
+        stream = self.open_stream([self.shops[0].id])
+        silent = AlertRule.objects.create(indicator='output', condition='gt', threshold=150, notify_in_app=False)
+        records = {shop: KPIRecord.objects.get(shop=shop, date=date(2025, 6, 30)) for shop in self.shops}
+        events = [
+            AlertEvent.objects.create(rule=self.rule, record=records[self.shops[0]], shop=self.shops[0],
+                                      date=date(2025, 6, 30), value=200, threshold=150),
+            AlertEvent.objects.create(rule=silent, record=records[self.shops[0]], shop=self.shops[0],
+                                      date=date(2025, 6, 30), value=200, threshold=150),
+            AlertEvent.objects.create(rule=self.rule, record=records[self.shops[1]], shop=self.shops[1],
+                                      date=date(2025, 6, 30), value=200, threshold=150),
+        ]
+
+        [(event, position, payload)] = self.parse_messages(stream.step()[0])
+        self.assertEqual(event, 'alert')
+        self.assertEqual(position, format_stream_position((stream.version, events[-1].id)))
+        self.assertEqual([item['id'] for item in payload['events']], [events[0].id])
+        self.assertEqual(payload['events'][0]['shop'], 'Цех 1')
+        self.assertEqual(stream.step()[0], [])
+
+    def test_full_alert_batch_is_read_without_waiting(self):
+        stream = self.open_stream()
+        record = KPIRecord.objects.first()
+        AlertEvent.objects.bulk_create([
+            AlertEvent(rule=AlertRule.objects.create(indicator='output', condition='gt', threshold=number),
+                       record=record, shop=record.shop, date=record.date, value=200, threshold=number)
+            for number in range(3)
+        ])
+        with mock.patch.object(live, 'LIVE_BATCH_LIMIT', 2):
+            messages, full = stream.step()
+            self.assertTrue(full)
+            self.assertEqual(len(self.parse_messages(messages)[0][2]['events']), 2)
+            messages, full = stream.step()
+            self.assertFalse(full)
+            self.assertEqual(len(self.parse_messages(messages)[0][2]['events']), 1)
+
+    def test_streams_share_one_poll(self):
+        with mock.patch.object(live, 'LIVE_POLL_INTERVAL', 60):
+            first = self.open_stream()
+            with self.assertNumQueries(0):
+                second = self.open_stream([self.shops[1].id])
+                first.step()
+                second.step()
+        self.assertIs(first.poller, second.poller)
+
+
+class ChartPointsTests(TestCase):
+    """Гранулярность и прореживание рядов графиков укладываются в лимит точек."""
+
+    def test_max_points_bounds(self):
+        with override_settings(CHART_MAX_POINTS=120):
+            self.assertEqual(chart_max_points(), 120)
+            self.assertEqual(chart_max_points('abc'), 120)
+            self.assertEqual(chart_max_points('-5'), 120)
+            self.assertEqual(chart_max_points('3'), 10)
+            self.assertEqual(chart_max_points('60'), 60)
+            self.assertEqual(chart_max_points('5000'), 120)
+
+    def test_bucket_count_matches_enumeration(self):
+        start = date(2023, 12, 27)
+        for days in (0, 1, 6, 7, 31, 59, 366, 800):
+            end = start + timedelta(days=days)
+            for grain in ROLLUP_GRAINS:
+                with self.subTest(days=days, grain=grain):
+                    buckets = {bucket_start(start + timedelta(days=offset), grain) for offset in range(days + 1)}
+                    self.assertEqual(bucket_count(start, end, grain), len(buckets))
+        self.assertEqual(bucket_count(date(2025, 6, 2), date(2025, 6, 1), 'day'), 0)
+
+    def test_grain_is_finest_within_limit(self):
+        start = date(2024, 7, 1)
+        self.assertEqual(chart_grain(start, date(2024, 7, 31), 31), 'day')
+        self.assertEqual(chart_grain(start, date(2024, 8, 1), 31), 'week')
+        self.assertEqual(chart_grain(start, date(2025, 6, 30), 52), 'month')
+        self.assertEqual(chart_grain(start, date(2025, 6, 30), 53), 'week')
+        self.assertEqual(chart_grain(start, date(2024, 7, 2), 31, minimum='month'), 'month')
+        # Помесячный ряд длиннее лимита остается помесячным (его прореживает LTTB)
+        self.assertEqual(chart_grain(date(2015, 1, 1), date(2025, 1, 1), 10), 'month')
+
+    def test_lttb_keeps_ends_and_peaks(self):
+        xs = list(range(100))
+        ys = [0.0] * 100
+        ys[37], ys[71] = 50.0, -40.0
+        indices = lttb_indices(xs, ys, 10)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual(indices, sorted(set(indices)))
+        self.assertEqual((indices[0], indices[-1]), (0, 99))
+        self.assertIn(37, indices)
+        self.assertIn(71, indices)
+
+    def test_lttb_short_series_and_small_threshold(self):
+        self.assertEqual(lttb_indices([0, 1, 2], [1, 2, 3], 5), [0, 1, 2])
+        self.assertEqual(lttb_indices(list(range(10)), list(range(10)), 2), list(range(10)))
+
+    def test_downsample_series(self):
+        start = date(2020, 1, 1)
+        series = {(start + timedelta(days=offset)).isoformat(): float(offset % 7) for offset in range(400)}
+        self.assertIs(downsample_series(series, 400), series)
+        sampled = downsample_series(series, 30)
+        self.assertEqual(len(sampled), 30)
+        self.assertEqual(list(sampled), sorted(sampled))
+        self.assertEqual((next(iter(sampled)), list(sampled)[-1]), ('2020-01-01', list(series)[-1]))
+        self.assertTrue(all(series[label] == value for label, value in sampled.items()))
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], KPI_CUBE=False, CHART_MAX_POINTS=120)
+    def test_dashboard_series_respect_points(self):
+        user = User.objects.create_user('viewer', password='viewer')
+        create_kpi_records([Shop.objects.create(name='Цех 1')], date(2025, 6, 30), 120)
+        cache.clear()
+        self.client.force_login(user)
+        for points in ('10', '40', '120'):
+            with self.subTest(points=points):
+                response = self.client.get(
+                    '/', {'period': 'quarter', 'points': points}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+                )
+                chart_data = response.json()['chart_data']
+                self.assertLessEqual(len(chart_data['production_by_date']), int(points))
+                self.assertLessEqual(len(chart_data['inventory_by_date']), int(points))
+
+
+def decode_columnar_series(group):
+    """Восстанавливает ряды {подпись: значение} из columnar_series (как decodeColumnarPayload в main.js)."""
+    return {
+        name: {label: value for label, value in zip(group['axis'], values) if value is not None}
+        for name, values in group['series'].items()
+    }
+
+
+class ColumnarPayloadTests(TestCase):
+    """Колоночный вид ответов восстанавливается в исходные данные."""
+
+    def test_rows(self):
+        rows = [{'name': 'Болт', 'quantity': 5}, {'name': 'Гайка', 'quantity': 7}]
+        self.assertEqual(columnar_rows(rows), {
+            'columns': ['name', 'quantity'],
+            'values': [['Болт', 'Гайка'], [5, 7]],
+        })
+        self.assertEqual(columnar_rows([]), {'columns': [], 'values': []})
+
+    def test_series_with_common_axis(self):
+        series = {'a': {'2025-06-01': 1, '2025-06-02': 2}, 'b': {'2025-06-01': 3, '2025-06-02': 4}}
+        self.assertEqual(columnar_series(series), {
+            'axis': ['2025-06-01', '2025-06-02'],
+            'series': {'a': [1, 2], 'b': [3, 4]},
+        })
+
+    def test_series_with_different_labels(self):
+        series = {'a': {'2025-06-03': 1, '2025-06-01': 2}, 'b': {'2025-06-02': 3}}
+        group = columnar_series(series)
+        self.assertEqual(group['axis'], ['2025-06-01', '2025-06-02', '2025-06-03'])
+        self.assertEqual(group['series'], {'a': [2, None, 1], 'b': [None, 3, None]})
+        self.assertEqual(decode_columnar_series(group), series)
+
+    def test_dumps_without_orjson_matches(self):
+        payload = {'date': date(2025, 6, 30), 'value': Decimal('1.50'), 'name': 'Цех', 'items': [1, 2.5, None]}
+        with mock.patch.object(payloads, 'orjson', None):
+            fallback = dumps(payload)
+        self.assertEqual(json.loads(dumps(payload)), json.loads(fallback))
+        self.assertIn('Цех'.encode('utf-8'), fallback)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'], KPI_CUBE=False)
+    def test_dashboard_columnar_response(self):
+        user = User.objects.create_user('viewer', password='viewer')
+        shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 3)]
+        create_kpi_records(shops, date(2025, 6, 30), 20)
+        cache.clear()
+        self.client.force_login(user)
+
+        def get(params):
+            return self.client.get('/', params, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+
+        plain = get({'period': 'month'})
+        columnar = get({'period': 'month', 'format': 'columnar'})
+        self.assertEqual(columnar['format'], 'columnar')
+        self.assertEqual(columnar['kpi'], plain['kpi'])
+        self.assertEqual(columnar['chart_data'], columnar_chart_data(plain['chart_data']))
+        decoded = {}
+        for group in columnar['chart_data']['groups']:
+            decoded.update(decode_columnar_series(group))
+        self.assertEqual(decoded, plain['chart_data'])
+
+
+@override_settings(RESPONSE_COMPRESSION=True)
+class ResponseCompressionTests(TestCase):
+    """Сжатие JSON-ответов выбирается по Accept-Encoding."""
+
+    PAYLOAD = {'values': list(range(COMPRESS_MIN_SIZE))}
+
+    def compress(self, accept_encoding, response=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        response = response or JsonResponse(self.PAYLOAD)
+        return ResponseCompressionMiddleware(lambda request: response)(request)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(_accepted_encodings('gzip, deflate, br;q=0.5'), {'gzip', 'deflate', 'br'})
+        self.assertEqual(_accepted_encodings('br;q=0, GZIP;q=1.0, x;q=abc'), {'gzip'})
+        self.assertEqual(_accepted_encodings(''), {''})
+
+    def test_gzip(self):
+        with mock.patch.object(middleware, 'brotli', None):
+            response = self.compress('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.PAYLOAD)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli не установлен')
+    def test_brotli_is_preferred(self):
+        response = self.compress('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(middleware.brotli.decompress(response.content)), self.PAYLOAD)
+
+    def test_not_compressed(self):
+        small = self.compress('gzip', JsonResponse({'value': 1}))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', small['Vary'])
+
+        for accept_encoding in ('', 'identity', 'gzip;q=0'):
+            with self.subTest(accept_encoding=accept_encoding), mock.patch.object(middleware, 'brotli', None):
+                self.assertFalse(self.compress(accept_encoding).has_header('Content-Encoding'))
+
+        html = self.compress('gzip', HttpResponse('x' * COMPRESS_MIN_SIZE * 2))
+        self.assertFalse(html.has_header('Content-Encoding'))
+        stream = self.compress('gzip', StreamingHttpResponse(iter([b'{}']), content_type='application/json'))
+        self.assertFalse(stream.has_header('Content-Encoding'))
+
+    def test_etag_becomes_weak(self):
+        response = JsonResponse(self.PAYLOAD)
+        response['ETag'] = '"abc"'
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEqual(self.compress('gzip', response)['ETag'], 'W/"abc"')
+
+
+class DataVersionTests(TestCase):
+    """Штамп версии данных меняется только после фиксации транзакции записи."""
+
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name='Цех 1')
+
+    def create_record(self, day):
+        return KPIRecord.objects.create(
+            shop=self.shop, date=day, output=100, downtime_hours=1.0, defect_rate=1.0, equipment_load=50.0
+        )
+
+    def test_stamp_changes_after_commit(self):
+        version = get_data_version('kpi')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_record(date(2025, 6, 30))
+            self.assertEqual(get_data_version('kpi'), version)
+        self.assertNotEqual(get_data_version('kpi'), version)
+
+    def test_deferred_refresh_changes_stamp_once_after_rollups(self):
+        version = get_data_version('kpi')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with deferred_rollup_refresh():
+                for day in range(1, 4):
+                    self.create_record(date(2025, 6, day))
+                self.assertFalse(KPIRollup.objects.exists())
+            self.assertEqual(KPIRollup.objects.filter(grain='day').count(), 3)
+            self.assertEqual(get_data_version('kpi'), version)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(get_data_version('kpi'), version)
+
+    def test_process_reads_stamp_and_latest_date_without_queries(self):
+        self.create_record(date(2025, 6, 30))
+        get_latest_kpi_date()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_latest_kpi_date(), date(2025, 6, 30))
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fallback'},
+        'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'missing_cache'},
+    })
+    @mock.patch('dashboard.caching._shared_cache_ready', None)
+    def test_missing_cache_table_falls_back_to_process_cache(self):
+        with self.assertLogs('dashboard.caching', 'WARNING'):
+            version = get_data_version('kpi')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_record(date(2025, 6, 30))
+        self.assertNotEqual(get_data_version('kpi'), version)
+        self.assertEqual(get_latest_kpi_date(), date(2025, 6, 30))
+
+
+class InventoryRollupTests(TestCase):
+    """
+    Данные страницы склада из агрегатов совпадают с расчетом по записям.
+
+    Последняя дата - середина месяца, поэтому периоды начинаются и
+    заканчиваются внутри месяцев и недель.
+    """
+
+    END_DATE = date(2025, 6, 18)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 3)]
+        cls.categories = [InventoryCategory.objects.create(name=name) for name in ('Кабели', 'Крепеж')]
+        cls.items = [
+            InventoryItem.objects.create(category=cls.categories[number % 2], name=f'Позиция {number}', sku=f'P-{number}')
+            for number in range(3)
+        ]
+        InventoryRecord.objects.bulk_create([
+            InventoryRecord(
+                item=item,
+                shop=shop,
+                date=cls.END_DATE - timedelta(days=offset),
+                quantity=(offset * 7 + item.id * 13 + shop.id) % 500,
+                reserved=offset % 40,
+                min_threshold=20 + item.id,
+                demand=(offset * 11) % 300,
+                shortage=offset % 9,
+            )
+            for item in cls.items
+            for shop in cls.shops
+            for offset in range(400)
+            # Пропуски дат: в интервалах разное число записей
+            if (offset + item.id) % 5
+        ])
+        rebuild_inventory_rollups()
+
+    def setUp(self):
+        mark_data_changed('inventory')
+
+    def filters(self, period, category_id=None, shop_ids=()):
+        return {
+            'period': period,
+            'category_id': category_id,
+            'shop_ids': list(shop_ids),
+            'max_points': chart_max_points(),
+        }
+
+    def records_payload(self, filters):
+        start_date, end_date = _inventory_period_range(filters['period'])
+        queryset = InventoryRecord.objects.filter(date__range=(start_date, end_date))
+        if filters['category_id']:
+            queryset = queryset.filter(item__category_id=filters['category_id'])
+        if filters['shop_ids']:
+            queryset = queryset.filter(shop_id__in=filters['shop_ids'])
+        sums = {field: Sum(field) for field in INVENTORY_ROLLUP_FIELDS}
+        items = {
+            row['item_id']: {
+                **row,
+                'sku': row['item__sku'],
+                'name': row['item__name'],
+                'category_id': row['item__category_id'],
+                'category_name': row['item__category__name'],
+            }
+            for row in queryset.order_by().values(
+                'item_id', 'item__sku', 'item__name', 'item__category_id', 'item__category__name'
+            ).annotate(records=Count('id'), **sums)
+        }
+        dates = {
+            row['date']: row
+            for row in queryset.order_by().values('date').annotate(quantity=Sum('quantity'), shortage=Sum('shortage'))
+        }
+        return _build_inventory_payload(filters, start_date, end_date, items, dates)
+
+    def assertPayloadMatchesRecords(self, filters):
+        self.assertEqual(_compose_inventory_payload(filters), self.records_payload(filters))
+
+    def test_payload_matches_records(self):
+        for period in ('day', 'week', 'month', 'quarter', 'year'):
+            for category_id, shop_ids in (
+                (None, ()),
+                (self.categories[0].id, ()),
+                (None, (self.shops[1].id,)),
+                (self.categories[1].id, (self.shops[0].id,)),
+            ):
+                with self.subTest(period=period, category_id=category_id, shop_ids=shop_ids):
+                    self.assertPayloadMatchesRecords(self.filters(period, category_id, shop_ids))
+
+    def test_saved_and_deleted_records_refresh_rollups(self):
+        record = InventoryRecord.objects.filter(date=self.END_DATE - timedelta(days=40)).first()
+        record.quantity += 1000
+        record.save()
+        InventoryRecord.objects.filter(date=self.END_DATE - timedelta(days=60)).first().delete()
+        # Перенос записи на другую дату пересчитывает оба интервала
+        moved = InventoryRecord.objects.filter(date=self.END_DATE - timedelta(days=100)).first()
+        moved.date = self.END_DATE + timedelta(days=1)
+        moved.save()
+
+        self.assertPayloadMatchesRecords(self.filters('year'))
+        self.assertPayloadMatchesRecords(self.filters('quarter', self.categories[0].id))
+
+    def test_item_category_change_refreshes_daily_totals(self):
+        item = self.items[0]
+        item.category = self.categories[1]
+        item.save()
+
+        for category in self.categories:
+            self.assertPayloadMatchesRecords(self.filters('year', category.id))
+
+    def test_ingested_rows_refresh_rollups(self):
+        stats = ingest_rows('inventory', [
+            {'sku': 'P-1', 'shop': 'Цех 1', 'date': '2025-05-07', 'quantity': '900', 'shortage': '3'},
+            {'sku': 'P-2', 'shop': 'Цех 2', 'date': '2025-06-19', 'quantity': '50'},
+        ])
+        self.assertEqual(stats['upserted'], 2)
+
+        self.assertPayloadMatchesRecords(self.filters('year'))
+        self.assertPayloadMatchesRecords(self.filters('month', shop_ids=[self.shops[1].id]))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], REQUEST_METRICS=False)
+class BulkDeleteTests(TestCase):
+    """Массовое удаление записей выполняется без сигналов post_delete."""
+
+    END_DATE = date(2025, 6, 18)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = Shop.objects.create(name='Цех 1')
+        category = InventoryCategory.objects.create(name='Кабели')
+        cls.item = InventoryItem.objects.create(category=category, name='Кабель', sku='K-1')
+        create_kpi_records([cls.shop], cls.END_DATE, 10)
+        InventoryRecord.objects.bulk_create([
+            InventoryRecord(item=cls.item, shop=cls.shop, date=cls.END_DATE - timedelta(days=offset), quantity=offset)
+            for offset in range(10)
+        ])
+        rebuild_inventory_rollups()
+        rule = AlertRule.objects.create(indicator='output', condition='gt', threshold=0)
+        record = KPIRecord.objects.first()
+        AlertEvent.objects.create(
+            rule=rule, record=record, shop=cls.shop, date=record.date, value=record.output, threshold=0
+        )
+
+    def setUp(self):
+        self.deleted = []
+        handler = lambda sender, **kwargs: self.deleted.append(sender)
+        post_delete.connect(handler, weak=False)
+        self.addCleanup(post_delete.disconnect, handler)
+
+    def test_delete_records_removes_rows_and_alert_events_without_signals(self):
+        self.assertEqual(delete_records(KPIRecord.objects.filter(shop=self.shop)), 10)
+        self.assertEqual(delete_records(InventoryRecord.objects.all()), 10)
+        self.assertFalse(KPIRecord.objects.exists())
+        self.assertFalse(AlertEvent.objects.exists())
+        self.assertNotIn(KPIRecord, self.deleted)
+        self.assertNotIn(InventoryRecord, self.deleted)
+
+    def test_clear_rebuilds_inventory_rollups(self):
+        call_command(
+            'generate_inventory_data', '--clear', '--start-date', '2025-07-01', '--end-date', '2025-07-01',
+            stdout=StringIO(),
+        )
+        self.assertNotIn(InventoryRecord, self.deleted)
+        record = InventoryRecord.objects.get()
+        self.assertEqual(record.date, date(2025, 7, 1))
+        self.assertEqual(
+            list(InventoryRollup.objects.values_list('grain', 'period_start', 'quantity_sum').order_by('grain')),
+            [('month', date(2025, 7, 1), record.quantity), ('week', date(2025, 6, 30), record.quantity)],
+        )
+        self.assertEqual(
+            list(InventoryDailyTotal.objects.values_list('date', 'quantity_sum')),
+            [(date(2025, 7, 1), record.quantity)],
+        )
+
+
+class AlertEvaluationTests(TestCase):
+    """Пакетная проверка правил находит те же срабатывания, что и проверка каждого правила отдельно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shops = [Shop.objects.create(name=f'Цех {number}') for number in range(1, 3)]
+        create_kpi_records(cls.shops, date(2025, 6, 30), 20)
+        cls.rules = [
+            AlertRule.objects.create(indicator='output', condition='gt', threshold=110),
+            AlertRule.objects.create(indicator='output', condition='lte', threshold=102),
+            AlertRule.objects.create(indicator='output', condition='eq', threshold=105),
+            AlertRule.objects.create(indicator='inventory_level', condition='gte', threshold=1015),
+            AlertRule.objects.create(indicator='downtime', condition='lt', threshold=1),
+        ]
+
+    def expected_events(self, rules):
+        return {
+            (rule.id, record_id)
+            for rule in rules
+            for record_id in KPIRecord.objects.filter(rule_condition(rule)).values_list('id', flat=True)
+        }
+
+    def stored_events(self):
+        return set(AlertEvent.objects.values_list('rule_id', 'record_id'))
+
+    def test_one_query_per_indicator(self):
+        expected = self.expected_events(self.rules)
+        # Два показателя со срабатываниями и простои без них: три выборки,
+        # вставка событий и подсчет новых событий
+        with self.assertNumQueries(5):
+            stats = evaluate_alert_rules(self.rules)
+        self.assertEqual(self.stored_events(), expected)
+        self.assertEqual(stats['matches'], len(expected))
+        self.assertEqual(stats['created'], len(expected))
+
+    def test_events_are_inserted_in_batches(self):
+        expected = self.expected_events(self.rules)
+        with mock.patch.object(alerting, 'ALERT_BATCH_SIZE', 3):
+            stats = evaluate_alert_rules(self.rules)
+        self.assertEqual(self.stored_events(), expected)
+        self.assertEqual(stats['created'], len(expected))
+
+    def test_repeated_evaluation_creates_no_duplicates(self):
+        first = evaluate_alert_rules(self.rules)
+        second = evaluate_alert_rules(self.rules)
+        self.assertEqual(second['matches'], first['matches'])
+        self.assertEqual(second['created'], 0)
+        self.assertEqual(AlertEvent.objects.count(), first['created'])
+
+    def test_date_range_limits_records(self):
+        evaluate_alert_rules(self.rules, start_date=date(2025, 6, 25), end_date=date(2025, 6, 28))
+        self.assertTrue(AlertEvent.objects.exists())
+        self.assertFalse(AlertEvent.objects.exclude(date__range=(date(2025, 6, 25), date(2025, 6, 28))).exists())
+
+    def test_incremental_evaluation_checks_only_new_records(self):
+        evaluate_alert_rules(self.rules, incremental=True)
+        checked = {rule.id: rule.checked_until for rule in AlertRule.objects.all()}
+        self.assertEqual(len(set(checked.values())), 1)
+
+        # Записи окна перед контрольной точкой проверяются повторно без новых событий
+        self.assertEqual(evaluate_alert_rules(self.rules, incremental=True)['created'], 0)
+
+        record = KPIRecord.objects.create(
+            shop=self.shops[0], date=date(2025, 7, 1), output=500,
+            downtime_hours=0.5, defect_rate=1.0, equipment_load=50.0, inventory_level=10,
+        )
+        stats = evaluate_alert_rules(self.rules, incremental=True)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(
+            set(AlertEvent.objects.filter(record=record).values_list('rule_id', flat=True)),
+            {self.rules[0].id, self.rules[4].id},
+        )
+        self.assertGreater(AlertRule.objects.get(id=self.rules[0].id).checked_until, checked[self.rules[0].id])
+
+
+class AlertCheckpointTests(TestCase):
+    """
+    Инкрементальная проверка правил находит обновленные записи и записи,
+    ставшие видимыми после контрольной точки.
+    """
+
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Цех 1')
+        self.rule = AlertRule.objects.create(indicator='output', condition='gt', threshold=150)
+
+    def create_record(self, day, output):
+        return KPIRecord.objects.create(
+            shop=self.shop, date=day, output=output, downtime_hours=1.0, defect_rate=1.0, equipment_load=50.0
+        )
+
+    def evaluate(self):
+        return evaluate_alert_rules([self.rule], incremental=True)
+
+    def test_updated_record_is_checked(self):
+        record = self.create_record(date(2025, 6, 1), 100)
+        self.assertEqual(self.evaluate()['created'], 0)
+
+        record.output = 200
+        record.save()
+        self.assertEqual(self.evaluate()['created'], 1)
+        self.assertEqual(AlertEvent.objects.get().record, record)
+
+    def test_upserted_record_is_checked(self):
+        self.create_record(date(2025, 6, 1), 100)
+        self.assertEqual(self.evaluate()['created'], 0)
+
+        stats = ingest_rows('kpi', [{
+            'shop': 'Цех 1', 'date': '2025-06-01', 'output': '300',
+            'downtime_hours': '1', 'defect_rate': '1', 'equipment_load': '50',
+        }])
+        self.assertEqual(stats['upserted'], 1)
+        self.assertEqual(self.evaluate()['created'], 1)
+
+    def test_late_record_inside_window_is_checked_once(self):
+        self.create_record(date(2025, 6, 1), 200)
+        self.assertEqual(self.evaluate()['created'], 1)
+        checkpoint = self.rule.checked_until
+
+        # Транзакция записи зафиксирована после проверки, время изменения - раньше контрольной точки
+        late = self.create_record(date(2025, 6, 2), 200)
+        KPIRecord.objects.filter(pk=late.pk).update(updated_at=checkpoint - ALERT_CHECKPOINT_WINDOW / 2)
+        stats = self.evaluate()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['matches'], 2)
+        self.assertEqual(AlertEvent.objects.count(), 2)
+
+        self.assertEqual(self.evaluate()['created'], 0)
+        self.assertEqual(AlertEvent.objects.count(), 2)
+
+    def test_condition_change_resets_checkpoint(self):
+        self.create_record(date(2025, 6, 1), 100)
+        self.evaluate()
+        self.assertIsNotNone(AlertRule.objects.get().checked_until)
+
+        self.rule.threshold = 50
+        self.rule.save()
+        self.assertIsNone(AlertRule.objects.get().checked_until)
+        self.assertEqual(self.evaluate()['created'], 1)
+
+
+class DataSourceSettingsTests(TestCase):
+    """Пароль источника данных не выводится на страницу настроек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='admin')
+        DataSource.objects.create(kind='access', path='/data/stock.csv', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def save_sources(self, **fields):
+        data = {'action': 'save_data_sources', 'source_access_enabled': 'on', 'source_access_path': '/data/stock.csv'}
+        data.update(fields)
+        response = self.client.post('/settings/', data)
+        self.assertEqual(response.status_code, 302)
+        return DataSource.objects.get(kind='access')
+
+    def test_context_has_password_flag_only(self):
+        with mock.patch('dashboard.views.render', return_value=HttpResponse()) as render:
+            self.client.get('/settings/')
+        context = render.call_args.args[2]
+        access = context['data_sources']['source_access']
+        self.assertIs(access['password_set'], True)
+        self.assertNotIn('password', access)
+        self.assertNotIn('secret', repr(context['data_sources']))
+
+    def test_blank_password_keeps_stored_value(self):
+        self.assertEqual(self.save_sources(source_access_password='').password, 'secret')
+
+    def test_new_password_replaces_stored_value(self):
+        self.assertEqual(self.save_sources(source_access_password='changed').password, 'changed')
+
+    def test_clear_flag_removes_password(self):
+        self.assertEqual(self.save_sources(source_access_password_clear='on').password, '')
+
+
+class DataSourceSyncTests(TestCase):
+    """Синхронизация с файловыми выгрузками 1С (CSV) и Access (XML)."""
+
+    KPI_HEADER = 'shop;date;output;downtime_hours;defect_rate;equipment_load\n'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, text, mode='w'):
+        path = self.directory / name
+        with open(path, mode, encoding='utf-8', newline='') as export:
+            export.write(text)
+        return str(path)
+
+    def kpi_source(self, text):
+        return DataSource.objects.create(kind='1c', enabled=True, path=self.write('kpi.csv', text))
+
+    def test_kpi_csv_sync_writes_records_and_rollups(self):
+        source = self.kpi_source(
+            self.KPI_HEADER
+            + 'Цех 1;2025-06-01;100;1,5;2.0;80\n'
+            + 'Цех 1;02.06.2025;120;0.5;1.0;85\n'
+        )
+        run = sync_data_source(source)
+
+        self.assertEqual(run.status, 'success')
+        self.assertEqual((run.rows_read, run.rows_written, run.rows_skipped), (2, 2, 0))
+        self.assertEqual(run.position, Path(source.path).stat().st_size)
+        self.assertEqual(KPIRecord.objects.get(date=date(2025, 6, 1)).downtime_hours, 1.5)
+        self.assertEqual(KPIRollup.objects.filter(grain='day').count(), 2)
+        self.assertEqual(KPIRollup.objects.get(grain='month').output_sum, 220)
+
+    def test_kpi_csv_appended_rows_are_read_after_watermark(self):
+        source = self.kpi_source(self.KPI_HEADER + 'Цех 1;2025-06-01;100;1;2;80\n')
+        sync_data_source(source)
+
+        # Незаконченная строка читается только после дописывания
+        self.write('kpi.csv', 'Цех 1;2025-06-02;110;1;2;80\nЦех 1;2025-06-03;1', mode='a')
+        run = sync_data_source(source)
+        self.assertEqual((run.rows_read, run.rows_written), (1, 1))
+
+        self.write('kpi.csv', '30;1;2;80\n', mode='a')
+        run = sync_data_source(source)
+        self.assertEqual((run.rows_read, run.rows_written), (1, 1))
+        self.assertEqual(KPIRecord.objects.get(date=date(2025, 6, 3)).output, 130)
+        self.assertEqual(KPIRecord.objects.count(), 3)
+
+    def test_kpi_csv_invalid_rows_are_skipped(self):
+        source = self.kpi_source(
+            self.KPI_HEADER
+            + 'Цех 1;не дата;100;1;2;80\n'
+            + ';2025-06-01;100;1;2;80\n'
+            + 'Цех 1;2025-06-01;100;1;2;80\n'
+        )
+        run = sync_data_source(source)
+        self.assertEqual((run.rows_read, run.rows_written, run.rows_skipped), (3, 1, 2))
+
+    def test_replaced_export_is_read_from_start(self):
+        source = self.kpi_source(self.KPI_HEADER + 'Цех 1;2025-06-01;100;1;2;80\n')
+        sync_data_source(source)
+
+        self.write('kpi.csv', 'shop;date;output\nЦех 1;2025-06-01;150\nЦех 2;2025-06-01;90\n')
+        run = sync_data_source(source)
+        self.assertEqual((run.rows_read, run.rows_written), (2, 2))
+        self.assertEqual(KPIRecord.objects.get(shop__name='Цех 1').output, 150)
+        self.assertEqual(KPIRecord.objects.count(), 2)
+
+    def test_inventory_xml_sync_creates_items_and_reads_new_records(self):
+        record = '<record sku="A-{0}" name="Позиция {0}" shop="Цех 1" date="2025-06-01"><quantity>{0}</quantity></record>\n'
+        # Начало выгрузки длиннее подписи файла (SYNC_SIGNATURE_SIZE)
+        records = ''.join(record.format(number) for number in range(1, 21))
+        path = self.write('stock.xml', f'<records>\n{records}</records>\n')
+        source = DataSource.objects.create(kind='access', enabled=True, path=path)
+
+        run = sync_data_source(source)
+        self.assertEqual((run.status, run.rows_written, run.position), ('success', 20, 20))
+        self.assertEqual(InventoryItem.objects.get(sku='A-1').name, 'Позиция 1')
+
+        self.write('stock.xml', f'<records>\n{records}{record.format(21)}</records>\n')
+        run = sync_data_source(source)
+        self.assertEqual((run.rows_read, run.rows_written, run.position), (1, 1, 21))
+        self.assertEqual(InventoryRecord.objects.get(item__sku='A-21').quantity, 21)
+        self.assertEqual(InventoryRecord.objects.count(), 21)
+
+    def test_access_database_file_is_reported(self):
+        source = DataSource.objects.create(kind='access', enabled=True, path=self.write('stock.accdb', ''))
+        run = sync_data_source(source)
+        self.assertEqual(run.status, 'error')
+        self.assertIn('.accdb', run.error)
+
+    def test_command_syncs_only_due_sources(self):
+        source = self.kpi_source(self.KPI_HEADER + 'Цех 1;2025-06-01;100;1;2;80\n')
+        DataSource.objects.filter(pk=source.pk).update(schedule='daily', last_sync_at=timezone.now())
+        call_command('sync_data_sources', stdout=StringIO())
+        self.assertFalse(DataSyncRun.objects.exists())
+
+        DataSource.objects.filter(pk=source.pk).update(last_sync_at=timezone.now() - timedelta(days=2))
+        call_command('sync_data_sources', stdout=StringIO())
+        self.assertEqual(DataSyncRun.objects.get().rows_written, 1)
+
+
+class UchetImportTests(TestCase):
+    """Потоковое чтение книги учета шкафов и загрузка остатков."""
+
+    SNAPSHOT = date(2025, 6, 30)
+    HEADER = [
+        'Заказ', 'Здание', 'KKS секции', 'KKS\nшкафа', 'Тип шкафа', 'Срок отгрузки (план)',
+        'Класс безопасности', 'Изготовитель', 'План', 'Факт', 'План', 'Факт', 'План', 'Факт',
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'uchet.xlsm')
+        self.shop = Shop.objects.create(name='Цех 1')
+
+    def serial(self, day):
+        return (day - date(1899, 12, 30)).days if day else None
+
+    def cabinet_row(self, sku, cabinet_type, assembled=None, packed=None, shipped=None):
+        return [
+            'З-1', 'Корпус 1', 'SEC1', sku, cabinet_type, self.serial(date(2025, 8, 1)), '3', 'не указан',
+            None, self.serial(assembled), None, self.serial(packed), None, self.serial(shipped),
+        ]
+
+    def write_workbook(self, rows, sheet_name='Учет'):
+        """Пишет книгу с листом rows: строки в sharedStrings и встроенными, числа - значениями."""
+        shared = []
+        sheet_rows = []
+        for number, values in enumerate(rows, 1):
+            cells = []
+            for column, value in enumerate(values, 1):
+                reference = f'{chr(64 + column)}{number}'
+                if value is None:
+                    continue
+                if isinstance(value, (int, float)):
+                    cells.append(f'<c r="{reference}"><v>{value}</v></c>')
+                elif column % 2:
+                    shared.append(value)
+                    cells.append(f'<c r="{reference}" t="s"><v>{len(shared) - 1}</v></c>')
+                else:
+                    cells.append(f'<c r="{reference}" t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+            sheet_rows.append(f'<row r="{number}">{"".join(cells)}</row>')
+
+        ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        rel_ns = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+        package_ns = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+        with zipfile.ZipFile(self.path, 'w') as archive:
+            archive.writestr('xl/workbook.xml', (
+                f'<workbook {ns} {rel_ns}><sheets>'
+                f'<sheet name="Справка" sheetId="1" r:id="rId1"/>'
+                f'<sheet name="{sheet_name}" sheetId="2" r:id="rId2"/>'
+                f'</sheets></workbook>'
+            ))
+            archive.writestr('xl/_rels/workbook.xml.rels', (
+                f'<Relationships {package_ns}>'
+                f'<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+                f'<Relationship Id="rId2" Target="/xl/worksheets/sheet2.xml"/>'
+                f'</Relationships>'
+            ))
+            archive.writestr('xl/sharedStrings.xml', (
+                f'<sst {ns}>' + ''.join(f'<si><t>{escape(text)}</t></si>' for text in shared) + '</sst>'
+            ))
+            archive.writestr('xl/worksheets/sheet1.xml', (
+                f'<worksheet {ns}><sheetData><row r="1"><c r="A1" t="e"><v>#REF!</v></c>'
+                f'<c r="B1"><v>1</v></c></row></sheetData></worksheet>'
+            ))
+            archive.writestr('xl/worksheets/sheet2.xml', (
+                f'<worksheet {ns}><sheetData>' + ''.join(sheet_rows) + '</sheetData></worksheet>'
+            ))
+
+    def write_uchet(self, cabinets):
+        self.write_workbook([
+            ['Учет шкафов'],
+            [None] * 8 + ['Сборка шкафа', None, 'Упаковывание', None, 'Отгрузка'],
+            self.HEADER,
+            list(range(1, len(self.HEADER) + 1)),
+            ['', 'Пример', '', 'ПРИМЕР-1', 'А'],
+            *cabinets,
+        ])
+
+    def test_rows_by_sheet_name_in_chunks(self):
+        self.write_workbook([['Текст', 'строка', 45838.0], [None, None, None], ['a & b', 'c < d']])
+        with mock.patch.object(imports, '_READ_CHUNK_SIZE', 16):
+            rows = list(iter_xlsx_rows(self.path, 'Учет'))
+        self.assertEqual(rows, [
+            (1, {1: 'Текст', 2: 'строка', 3: '45838.0'}),
+            (3, {1: 'a & b', 2: 'c < d'}),
+        ])
+        # Первый лист по умолчанию, ячейка с ошибкой пропускается
+        self.assertEqual(list(iter_xlsx_rows(self.path)), [(1, {2: '1'})])
+        with self.assertRaises(ValueError):
+            list(iter_xlsx_rows(self.path, 'Нет такого листа'))
+
+    def test_excel_date(self):
+        self.assertEqual(excel_date('45838'), date(2025, 6, 30))
+        self.assertEqual(excel_date('45838.75'), date(2025, 6, 30))
+        for value in (None, '', 'дата', '0'):
+            with self.subTest(value=value):
+                self.assertIsNone(excel_date(value))
+
+    def test_cabinets_skip_header_numbering_and_example(self):
+        self.write_uchet([self.cabinet_row('10ABC01', 'ЩР', assembled=date(2025, 6, 1))])
+        [cabinet] = iter_uchet_cabinets(iter_xlsx_rows(self.path, 'Учет'))
+        self.assertEqual(cabinet['sku'], '10ABC01')
+        self.assertEqual(cabinet['cabinet_type'], 'ЩР')
+        self.assertEqual(cabinet['due_date'], date(2025, 8, 1))
+        self.assertEqual(cabinet['assembled'], date(2025, 6, 1))
+        self.assertIsNone(cabinet['packed'])
+        self.assertIsNone(cabinet['shipped'])
+
+    def test_missing_header(self):
+        self.write_workbook([['Заказ', 'Здание'], ['1', '2']])
+        with self.assertRaises(ValueError):
+            list(iter_uchet_cabinets(iter_xlsx_rows(self.path, 'Учет')))
+
+    def import_uchet(self):
+        call_command(
+            'import_uchet', self.path, sheet='Учет', shop=self.shop.name, date=self.SNAPSHOT.isoformat(),
+            batch_size=2, stdout=StringIO(),
+        )
+
+    def stock(self):
+        return {
+            record.item.sku: (record.quantity, record.reserved, record.demand, record.shortage)
+            for record in InventoryRecord.objects.filter(shop=self.shop, date=self.SNAPSHOT).select_related('item')
+        }
+
+    def test_import_writes_stock_per_stage(self):
+        self.write_uchet([
+            self.cabinet_row('10ABC01', 'ЩР', assembled=date(2025, 6, 1), packed=date(2025, 6, 10)),
+            self.cabinet_row('10ABC02', 'ЩР', assembled=date(2025, 7, 5)),
+            self.cabinet_row('10ABC03', 'не указан', assembled=date(2025, 5, 1), shipped=date(2025, 6, 20)),
+        ])
+        self.import_uchet()
+
+        self.assertEqual(self.stock(), {
+            '10ABC01': (1, 1, 1, 0),
+            '10ABC02': (0, 0, 1, 1),
+            '10ABC03': (0, 0, 0, 0),
+        })
+        self.assertEqual(
+            dict(InventoryItem.objects.values_list('sku', 'category__name')),
+            {'10ABC01': 'Шкафы ЩР', '10ABC02': 'Шкафы ЩР', '10ABC03': 'Шкафы без типа'},
+        )
+        self.assertTrue(InventoryRollup.objects.filter(shop=self.shop, period_start=self.SNAPSHOT).exists())
+
+    def test_reimport_updates_records(self):
+        self.write_uchet([self.cabinet_row('10ABC01', 'ЩР')])
+        self.import_uchet()
+        self.assertEqual(self.stock(), {'10ABC01': (0, 0, 1, 1)})
+
+        self.write_uchet([self.cabinet_row('10ABC01', 'ЩР', assembled=date(2025, 6, 1))])
+        self.import_uchet()
+        self.assertEqual(self.stock(), {'10ABC01': (1, 0, 1, 0)})
+        self.assertEqual(InventoryItem.objects.count(), 1)
+        self.assertEqual(InventoryRecord.objects.count(), 1)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], REQUEST_METRICS=True, REQUEST_METRICS_TOKEN='secret-token')
+class MetricsTests(TestCase):
+    """Метрики запросов: доступ к /metrics/ и текстовый формат Prometheus."""
+
+    def test_access(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        for header in ('Bearer wrong', 'Basic secret-token', 'Bearer', 'Bearer токен'):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION=header).status_code, 403)
+
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='bearer  secret-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        self.client.force_login(User.objects.create_user('viewer', password='viewer'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', password='admin', is_staff=True))
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(REQUEST_METRICS_TOKEN='')
+    def test_empty_token_disables_bearer_access(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_histogram_rendering(self):
+        histogram = Histogram('test_seconds', 'Тестовая гистограмма', (0.1, 1))
+        for value in (0.05, 0.5, 2):
+            histogram.observe('dashboard', value)
+        histogram.observe('reports', 0.1)
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Тестовая гистограмма',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="dashboard",le="0.1"} 1',
+            'test_seconds_bucket{view="dashboard",le="1"} 2',
+            'test_seconds_bucket{view="dashboard",le="+Inf"} 3',
+            'test_seconds_sum{view="dashboard"} 2.55',
+            'test_seconds_count{view="dashboard"} 3',
+            'test_seconds_bucket{view="reports",le="0.1"} 1',
+            'test_seconds_bucket{view="reports",le="1"} 1',
+            'test_seconds_bucket{view="reports",le="+Inf"} 1',
+            'test_seconds_sum{view="reports"} 0.1',
+            'test_seconds_count{view="reports"} 1',
+        ])
+
+    def test_server_timing(self):
+        self.assertEqual(server_timing(0.0123), 'total;dur=12.3')
+        metrics = RequestMetrics(keep_query_text=True)
+        metrics.add_query(0.002, 'SELECT 1')
+        metrics.add_query(0.004, 'SELECT "name"\n  FROM shop')
+        metrics.add_template(0.001)
+        self.assertEqual(
+            server_timing(0.02, metrics),
+            'total;dur=20.0, db;dur=6.0;desc="2 queries", '
+            'db-slowest;dur=4.0;desc="SELECT \\"name\\" FROM shop", tpl;dur=1.0',
+        )
+
+    @override_settings(KPI_CUBE=False, REQUEST_METRICS_SAMPLE_RATE=1.0)
+    def test_dashboard_requests_are_observed(self):
+        self.client.force_login(User.objects.create_user('admin', password='admin', is_staff=True))
+        self.client.get('/', {'period': 'month'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        text = self.client.get('/metrics/').content.decode('utf-8')
+        self.assertRegex(text, r'dashboard_request_duration_seconds_count\{view="dashboard"\} [1-9]')
+        self.assertRegex(text, r'dashboard_request_sql_queries_count\{view="dashboard"\} [1-9]')
+        # Запросы к самим метрикам не учитываются
+        self.assertNotIn('view="metrics"', text)
@@ -12,14 +12,19 @@ urlpatterns = [
     
     # Главная страница (дашборд)
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/events/', views.dashboard_events, name='dashboard_events'),
     
     # Страница отчетов
     path('reports/', views.reports, name='reports'),
+    path('reports/export/', views.reports_export, name='reports_export'),
     
     # Страница склада и данные для фильтров
     path('inventory/data/', views.inventory_data, name='inventory_data'),
     path('inventory/', views.inventory, name='inventory'),
     
+    # Загрузка записей KPI и остатков внешними системами
+    path('ingest/<str:target>/', views.ingest, name='ingest'),
+    
     # Страница настроек (доступна только администраторам)
     path('settings/', views.settings, name='settings'),
     
@@ -28,4 +33,7 @@ urlpatterns = [
     
     # Личный кабинет пользователя
     path('profile/', views.profile, name='profile'),
+    
+    # Метрики запросов в формате Prometheus
+    path('metrics/', views.metrics, name='metrics'),
 ]
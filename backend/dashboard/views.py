@@ -1,20 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial, wraps
+import asyncio
+import base64
+import hmac
 import json
+import math
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.contrib.auth import authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import Group, Permission, User
-from django.contrib.auth.views import LoginView
+from django.contrib.auth.views import LoginView, redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import transaction
-from django.db.models import Avg, FloatField, Max, Sum
-from django.db.models.functions import Coalesce
-from django.http import JsonResponse
+from django.db import close_old_connections, connections, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
-
-from .models import InventoryCategory, InventoryRecord, KPIRecord, Shop
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .alerting import evaluate_alert_rules
+from .caching import (
+    acached_response_payload,
+    cached_response_payload,
+    get_data_version,
+    get_latest_inventory_date,
+    get_latest_kpi_date,
+    response_cache_key,
+)
+from .charts import CHART_DIGITS, chart_grain, chart_max_points, downsample_series, lttb_indices
+from .cube import get_kpi_cube
+from .database import bind_read_database, pin_read_database, read_database, use_read_replica
+from .exports import EXPORT_CONTENT_TYPES, iter_report_rows, stream_csv, stream_xlsx
+from .ingest import INGEST_CONTENT_TYPES, INGEST_TARGETS, IngestError, ingest_rows, read_rows
+from .live import (
+    dashboard_event_stream,
+    dashboard_event_stream_sync,
+    format_stream_position,
+    latest_alert_id,
+    parse_stream_position,
+)
+from .metrics import render_metrics
+from .models import (
+    AlertEvent,
+    AlertRule,
+    DataSource,
+    DataSyncRun,
+    InventoryCategory,
+    InventoryItem,
+    KPIRecord,
+    Shop,
+)
+from .pagination import paginate_kpi_records
+from .payloads import COLUMNAR_FORMAT, FastJsonResponse, columnar_chart_data, columnar_inventory_payload, wants_columnar
+from .rollups import (
+    INVENTORY_ROLLUP_FIELDS,
+    PERIOD_GRAINS,
+    bucket_end,
+    bucket_start,
+    load_inventory_daily_totals,
+    load_inventory_rollups,
+    load_kpi_rollups,
+)
 
 
 class StyledAuthenticationForm(AuthenticationForm):
@@ -46,8 +99,79 @@ class CustomLoginView(LoginView):
     authentication_form = StyledAuthenticationForm
 
 
-@login_required
-def dashboard(request):
+def _async_login_required(view):
+    """
+    Аналог login_required для асинхронных представлений.
+    
+    Пользователь сессии загружается из базы данных в синхронном потоке;
+    дальше request.user доступен без запросов.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+# Потоки для одновременных запросов представлений. Пул общий для всех
+# запросов процесса, поэтому постоянные соединения (CONN_MAX_AGE)
+# переиспользуются и под WSGI, где цикл событий создается на каждый запрос.
+CONCURRENT_QUERY_THREADS = 8
+_query_executor = ThreadPoolExecutor(
+    max_workers=CONCURRENT_QUERY_THREADS,
+    thread_name_prefix='dashboard-query',
+)
+
+
+def _run_in_own_connection(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # Поток пула не получает сигнал окончания запроса
+            close_old_connections()
+    return run
+
+
+def _persistent_connections():
+    """
+    Проверяет, что соединения с базой данных переживают запрос.
+
+    При CONN_MAX_AGE = 0 поток пула открывал бы и закрывал соединение на
+    каждую функцию, и одновременный расчет стоил бы дороже последовательного.
+    """
+    return all(connections[alias].settings_dict['CONN_MAX_AGE'] != 0 for alias in connections)
+
+
+async def _run_concurrently(*funcs):
+    """
+    Выполняет независимые синхронные функции с запросами одновременно.
+    
+    Асинхронный ORM выполняет запросы по очереди в одном потоке, поэтому
+    каждая функция запускается в отдельном потоке пула _query_executor со
+    своим соединением с базой данных. Без постоянных соединений
+    (DB_CONN_MAX_AGE=0) функции выполняются по очереди в потоке запроса
+    через его соединение.
+    
+    Args:
+        *funcs (callable): Функции без аргументов
+        
+    Returns:
+        list: Результаты функций в порядке аргументов
+    """
+    if not _persistent_connections():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(
+        sync_to_async(_run_in_own_connection(func), thread_sensitive=False, executor=_query_executor)()
+        for func in funcs
+    ))
+
+
+@_async_login_required
+@use_read_replica
+async def dashboard(request):
     """
     Представление для отображения дашборда.
     
@@ -63,6 +187,7 @@ def dashboard(request):
     # Получаем параметры фильтрации из GET-запроса
     period = request.GET.get('period', 'month')  # day, week, month, quarter, year
     shop_ids = request.GET.getlist('shop', [])  # список ID цехов
+    max_points = chart_max_points(request.GET.get('points'))  # лимит точек графиков
     # Если индикаторы не переданы, используем все доступные
     indicators = request.GET.getlist('indicator')
     if not indicators:
@@ -73,9 +198,100 @@ def dashboard(request):
     if shop_ids:
         shops = shops.filter(id__in=shop_ids)
     
+    # Штамп данных KPI читается до расчета: если данные изменятся во время
+    # расчета, поток изменений (клиент продолжит его с этого положения)
+    # пришлет пересчитанные значения
+    kpi_version = await sync_to_async(get_data_version)('kpi')
+    (kpi_summary, chart_data), alert_id = await _run_concurrently(
+        lambda: _load_dashboard_data(period, shop_ids, max_points),
+        latest_alert_id,
+    )
+    position = (kpi_version, alert_id)
+    live_position = format_stream_position(position)
+    
+    # Проверяем, является ли запрос AJAX-запросом
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        # Возвращаем JSON-ответ с обновленными данными: значения KPI-карточек
+        # подставляет в разметку страницы клиент (updateKpiCards в main.js)
+        payload = {
+            'kpi': kpi_summary,
+            'chart_data': chart_data,
+            'live_position': live_position,
+        }
+        # По format=columnar ряды графиков отдаются колонками с общими осями
+        if wants_columnar(request):
+            payload.update(format=COLUMNAR_FORMAT, chart_data=columnar_chart_data(chart_data))
+        return FastJsonResponse(payload)
+    
+    # Передаем данные в шаблон
+    context = {
+        **kpi_summary,
+        'shops': shops,
+        'selected_period': period,
+        'selected_shops': [int(id) for id in shop_ids if id.isdigit()],
+        'selected_indicators': indicators,
+        'chart_data': json.dumps(chart_data),
+        'live_position': live_position,
+    }
+    
+    # Шаблон читает список цехов, поэтому рендерится в синхронном потоке
+    return await sync_to_async(render)(request, 'dashboard.html', context)
+
+
+@login_required
+@use_read_replica
+def dashboard_events(request):
+    """
+    Поток изменений дашборда (Server-Sent Events).
+    
+    При изменении данных KPI отправляет пересчитанные KPI-карточки и
+    графики выбранных цехов и периода (клиент заменяет ими текущие), а
+    также новые срабатывания уведомлений. Поток продолжается с позиции из
+    заголовка Last-Event-ID или параметра after; без них - с данных на
+    момент подключения. Под ASGI поток - асинхронный генератор, под WSGI -
+    синхронный (dashboard/live.py).
+    
+    Args:
+        request (HttpRequest): Объект HTTP-запроса
+        
+    Returns:
+        StreamingHttpResponse: Поток text/event-stream
+    """
+    position = parse_stream_position(
+        request.headers.get('Last-Event-ID') or request.GET.get('after')
+    )
+    shop_ids = sorted({int(shop_id) for shop_id in request.GET.getlist('shop') if shop_id.isdigit()})
+    period = request.GET.get('period', 'month')
+    max_points = chart_max_points(request.GET.get('points'))
+    # Данные пересчитываются тем же расчетом, что и ответ дашборда
+    load_dashboard = bind_read_database(
+        partial(_load_dashboard_data, period, [str(shop_id) for shop_id in shop_ids], max_points)
+    )
+    
+    stream = dashboard_event_stream if isinstance(request, ASGIRequest) else dashboard_event_stream_sync
+    response = StreamingHttpResponse(
+        stream(position, shop_ids, period, load_dashboard, using=read_database()),
+        content_type='text/event-stream; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Отключаем буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _dashboard_date_range(period):
+    """
+    Возвращает диапазон дат периода дашборда.
+    
+    Args:
+        period (str): Период (day, week, month, quarter, year)
+        
+    Returns:
+        tuple: Начало и конец диапазона (включительно)
+    """
     # Фильтрация по дате в зависимости от периода
     # Используем максимальную дату из данных как "текущую" для фильтрации
-    max_date = KPIRecord.objects.order_by('-date').first().date if KPIRecord.objects.exists() else datetime.now().date()
+    max_date = get_latest_kpi_date() or datetime.now().date()
     
     if period == 'day':
         start_date = max_date
@@ -90,175 +306,176 @@ def dashboard(request):
     else:
         start_date = max_date - timedelta(days=30)  # по умолчанию месяц
     
-    # Получаем KPI записи с фильтрацией
-    kpi_records = KPIRecord.objects.filter(
-        date__gte=start_date
-    ).select_related('shop')
+    return start_date, max_date
+
+
+def _dashboard_chart_range(period, max_points=None):
+    """
+    Возвращает диапазон дат периода дашборда и гранулярность графиков.
     
-    if shop_ids:
-        kpi_records = kpi_records.filter(shop_id__in=shop_ids)
+    Гранулярность не мельче заданной для периода (PERIOD_GRAINS) и
+    укрупняется, если точек получается больше лимита (chart_grain).
     
-    # Рассчитываем агрегированные KPI
-    total_output = sum([record.output for record in kpi_records])
-    avg_downtime = sum([record.downtime_hours for record in kpi_records]) / max(len(kpi_records), 1)
-    avg_defect_rate = sum([record.defect_rate for record in kpi_records]) / max(len(kpi_records), 1)
-    avg_equipment_load = sum([record.equipment_load for record in kpi_records]) / max(len(kpi_records), 1)
-    total_inventory = sum([record.inventory_level for record in kpi_records])
-    total_cabinets = sum([record.cabinets_produced for record in kpi_records])
-    avg_plan_completion = sum([record.plan_completion for record in kpi_records]) / max(len(kpi_records), 1)
-    avg_quality_index = sum([record.quality_index for record in kpi_records]) / max(len(kpi_records), 1)
+    Args:
+        period (str): Период (day, week, month, quarter, year)
+        max_points (int): Лимит точек графиков
+        
+    Returns:
+        tuple: Начало и конец диапазона (включительно), гранулярность
+    """
+    start_date, end_date = _dashboard_date_range(period)
+    grain = chart_grain(start_date, end_date, max_points, minimum=PERIOD_GRAINS.get(period, 'day'))
+    return start_date, end_date, grain
+
+
+def _load_dashboard_data(period, shop_ids, max_points=None):
+    """
+    Рассчитывает KPI-карточки и графики дашборда.
     
-    # Подготовка данных для графиков
-    chart_data = prepare_chart_data(kpi_records, period)
+    При включенном кубе KPI (KPI_CUBE) значения считаются срезом куба в
+    памяти процесса, иначе - по агрегатам KPIRollup из базы данных.
     
-    # Проверяем, является ли запрос AJAX-запросом
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        # Возвращаем JSON-ответ с обновленными данными
-        from django.http import JsonResponse
-        from django.template.loader import render_to_string
-        
-        # Создаем контекст для рендеринга KPI-карточек
-        context = {
-            'total_output': total_output,
-            'avg_downtime': round(avg_downtime, 1),
-            'avg_defect_rate': round(avg_defect_rate, 2),
-            'avg_equipment_load': round(avg_equipment_load, 1),
-            'total_inventory': total_inventory,
-            'total_cabinets': total_cabinets,
-            'avg_plan_completion': round(avg_plan_completion, 1),
-            'avg_quality_index': round(avg_quality_index, 1),
-        }
-        
-        # Рендерим KPI-карточки в HTML
-        kpi_cards_html = render_to_string('partials/kpi_cards.html', context, request=request)
+    Args:
+        period (str): Период (day, week, month, quarter, year)
+        shop_ids (list): Список ID цехов (пустой - все цеха)
+        max_points (int): Лимит точек графиков по датам
         
-        return JsonResponse({
-            'chart_data': chart_data,
-            'kpi_cards_html': kpi_cards_html,
-        })
+    Returns:
+        tuple: Значения KPI-карточек и данные графиков
+    """
+    max_points = max_points or chart_max_points()
+    start_date, end_date, grain = _dashboard_chart_range(period, max_points)
+    cube = get_kpi_cube()
+    if cube is not None:
+        selection = cube.select(start_date, end_date, [shop_id for shop_id in shop_ids if shop_id.isdigit()])
+        return (
+            aggregate_kpi_summary([selection.totals()]),
+            selection.chart_data(grain, max_points),
+        )
     
-    # Передаем данные в шаблон
-    context = {
-        'total_output': total_output,
-        'avg_downtime': round(avg_downtime, 1),
-        'avg_defect_rate': round(avg_defect_rate, 2),
-        'avg_equipment_load': round(avg_equipment_load, 1),
-        'total_inventory': total_inventory,
-        'total_cabinets': total_cabinets,
-        'avg_plan_completion': round(avg_plan_completion, 1),
-        'avg_quality_index': round(avg_quality_index, 1),
-        'shops': shops,
-        'selected_period': period,
-        'selected_shops': [int(id) for id in shop_ids if id.isdigit()],
-        'selected_indicators': indicators,
-        'chart_data': json.dumps(chart_data),
+    # Агрегаты группируются в базе данных сразу по гранулярности графиков
+    rollup_rows = load_kpi_rollups(start_date, end_date, shop_ids, grain=grain)
+    return aggregate_kpi_summary(rollup_rows), prepare_chart_data(rollup_rows, grain, max_points)
+
+
+def aggregate_kpi_summary(rollup_rows):
+    """
+    Расчет сводных KPI для карточек дашборда.
+    
+    Средние значения восстанавливаются из сумм и количества записей
+    предрассчитанных агрегатов, поэтому совпадают со средними по KPIRecord.
+    Дробные суммы складываются точно (math.fsum): результат не зависит от
+    того, из каких агрегатов собран период, и совпадает со срезом куба KPI.
+    
+    Args:
+        rollup_rows (list): Строки KPIRollup, покрывающие период
+        
+    Returns:
+        dict: Значения KPI-карточек, округленные для отображения
+    """
+    values = {}
+    for row in rollup_rows:
+        for key, value in row.items():
+            if key == 'record_count' or key.endswith('_sum'):
+                values.setdefault(key, []).append(value)
+    totals = {
+        key: math.fsum(items) if any(isinstance(item, float) for item in items) else sum(items)
+        for key, items in values.items()
     }
     
-    return render(request, 'dashboard.html', context)
+    record_count = max(totals.get('record_count', 0), 1)
+    
+    def average(field):
+        return totals.get(f'{field}_sum', 0) / record_count
+    
+    return {
+        'total_output': totals.get('output_sum', 0),
+        'avg_downtime': round(average('downtime_hours'), 1),
+        'avg_defect_rate': round(average('defect_rate'), 2),
+        'avg_equipment_load': round(average('equipment_load'), 1),
+        'total_inventory': totals.get('inventory_level_sum', 0),
+        'total_cabinets': totals.get('cabinets_produced_sum', 0),
+        'avg_plan_completion': round(average('plan_completion'), 1),
+        'avg_quality_index': round(average('quality_index'), 1),
+    }
 
 
-def prepare_chart_data(kpi_records, period):
+def prepare_chart_data(rollup_rows, grain, max_points=None):
     """
-    Подготовка данных для графиков на основе KPI записей
+    Подготовка данных для графиков на основе предрассчитанных агрегатов KPI.
+    
+    Ряды по датам строятся с гранулярностью grain (_dashboard_chart_range):
+    для года точка графика соответствует месяцу, для квартала - неделе.
+    Выпуск за интервал суммируется. Остатки - уровень на дату, поэтому
+    точка интервала - средний уровень: для каждого цеха сумма остатков
+    делится на количество его дней с данными, средние цехов складываются.
+    Ряды длиннее max_points прореживаются (downsample_series).
     """
-    # Группировка данных по цехам для графика простоев
-    downtime_by_shop = {}
-    for record in kpi_records:
-        shop_name = record.shop.name
-        if shop_name not in downtime_by_shop:
-            downtime_by_shop[shop_name] = 0
-        downtime_by_shop[shop_name] += record.downtime_hours
-    
-    # Если нет данных для графика простоев, создаем пустой словарь
-    if not downtime_by_shop:
-        downtime_by_shop = {}
-    
-    # Группировка данных по датам для графика производства
-    # Используем формат YYYY-MM-DD для уникальности дат
-    production_by_date = {}
-    for record in kpi_records:
-        date_str = record.date.strftime('%Y-%m-%d')
-        if date_str not in production_by_date:
-            production_by_date[date_str] = 0
-        production_by_date[date_str] += record.output
-    
-    # Если нет данных для графика производства, создаем пустой словарь
-    if not production_by_date:
-        production_by_date = {}
-    
-    # Группировка данных по цехам для графика выполнения плана
-    plan_by_shop = {}
-    for record in kpi_records:
-        shop_name = record.shop.name
-        if shop_name not in plan_by_shop:
-            plan_by_shop[shop_name] = []
-        plan_by_shop[shop_name].append(record.plan_completion)
-    
-    # Усреднение значений для каждого цеха
-    for shop_name in plan_by_shop:
-        if plan_by_shop[shop_name]:
-            avg_plan = sum(plan_by_shop[shop_name]) / len(plan_by_shop[shop_name])
-            plan_by_shop[shop_name] = round(avg_plan, 1)
-        else:
-            plan_by_shop[shop_name] = 0
     
-    # Если нет данных для графика выполнения плана, создаем пустой словарь
-    if not plan_by_shop:
-        plan_by_shop = {}
+    # Группировка данных по цехам для графиков простоев и выполнения плана
+    downtime_by_shop = {}
+    plan_totals = {}
     
-    # Группировка данных по датам для графика остатков
-    # Используем формат YYYY-MM-DD для уникальности дат
+    # Группировка данных по датам для графиков производства и остатков
+    production_by_date = {}
     inventory_by_date = {}
-    for record in kpi_records:
-        date_str = record.date.strftime('%Y-%m-%d')
-        if date_str not in inventory_by_date:
-            inventory_by_date[date_str] = 0
-        inventory_by_date[date_str] += record.inventory_level
     
-    # Если нет данных для графика остатков, создаем пустой словарь
-    if not inventory_by_date:
-        inventory_by_date = {}
+    for row in sorted(rollup_rows, key=lambda item: (item['period_start'], item['shop__name'])):
+        shop_name = row['shop__name']
+        downtime_by_shop.setdefault(shop_name, []).append(row['downtime_hours_sum'])
+        plan_sums, plan_count = plan_totals.get(shop_name, ([], 0))
+        plan_sums.append(row['plan_completion_sum'])
+        plan_totals[shop_name] = (plan_sums, plan_count + row['record_count'])
+        
+        # Используем формат YYYY-MM-DD для уникальности дат
+        date_str = bucket_start(row['period_start'], grain).strftime('%Y-%m-%d')
+        production_by_date[date_str] = production_by_date.get(date_str, 0) + row['output_sum']
+        inventory = inventory_by_date.setdefault(date_str, {}).setdefault(row['shop_id'], [0, 0])
+        inventory[0] += row['inventory_level_sum']
+        inventory[1] += row['record_count']
+    
+    # Усреднение выполнения плана для каждого цеха (суммы - точные, math.fsum)
+    plan_by_shop = {
+        shop_name: round(math.fsum(plan_sums) / plan_count, CHART_DIGITS) if plan_count else 0
+        for shop_name, (plan_sums, plan_count) in sorted(plan_totals.items())
+    }
+    downtime_by_shop = {
+        shop_name: round(math.fsum(downtime), CHART_DIGITS)
+        for shop_name, downtime in sorted(downtime_by_shop.items())
+    }
+    inventory_by_date = {
+        date_str: int(round(math.fsum(level / count for level, count in shops.values() if count)))
+        for date_str, shops in inventory_by_date.items()
+    }
     
     return {
         'downtime_by_shop': downtime_by_shop,
-        'production_by_date': production_by_date,
+        'production_by_date': downsample_series(production_by_date, max_points),
         'plan_by_shop': plan_by_shop,
-        'inventory_by_date': inventory_by_date
+        'inventory_by_date': downsample_series(inventory_by_date, max_points)
     }
 
 
-@login_required
-def reports(request):
+REPORT_PAGE_SIZE = 20
+
+
+def _parse_report_filters(request):
     """
-    Представление для отображения страницы отчетов.
-    
-    Только аутентифицированные пользователи могут получить доступ к этой странице.
-    Отображает таблицу с отчетами.
-    
+    Разбирает параметры фильтрации отчетов из GET-запроса.
+
     Args:
         request (HttpRequest): Объект HTTP-запроса
-        
+
     Returns:
-        HttpResponse: Отрендеренный шаблон reports.html
+        dict: Период, ID цехов, показатели и начальная дата выборки
     """
-    from django.core.paginator import Paginator
-    from datetime import datetime, timedelta
-    
-    # Получаем параметры фильтрации из GET-запроса
     period = request.GET.get('period', 'month')  # day, week, month, quarter, year
-    shop_ids = request.GET.getlist('shop', [])  # список ID цехов
-    indicators = request.GET.getlist('indicator', ['output', 'downtime', 'defect', 'load'])  # типы показателей
-    page_number = request.GET.get('page', 1)  # номер страницы для пагинации
-    
-    # Фильтрация по цехам
-    shops = Shop.objects.all()
-    if shop_ids:
-        shops = shops.filter(id__in=shop_ids)
-    
-    # Фильтрация по дате в зависимости от периода
+    shop_ids = sorted({int(value) for value in request.GET.getlist('shop') if value.isdigit()})
+    indicators = request.GET.getlist('indicator', ['output', 'downtime', 'defect', 'load'])
+
     # Используем максимальную дату из данных как "текущую" для фильтрации
-    max_date = KPIRecord.objects.order_by('-date').first().date if KPIRecord.objects.exists() else datetime.now().date()
-    
+    max_date = get_latest_kpi_date() or datetime.now().date()
+
     if period == 'day':
         start_date = max_date
     elif period == 'week':
@@ -271,34 +488,119 @@ def reports(request):
         start_date = max_date - timedelta(days=365)
     else:
         start_date = max_date - timedelta(days=30)  # по умолчанию месяц
+
+    return {
+        'period': period,
+        'shop_ids': shop_ids,
+        'indicators': indicators,
+        'start_date': start_date,
+        'end_date': max_date,
+    }
+
+
+def _prepare_report_queryset(filters):
+    """Возвращает записи KPI, отобранные фильтрами отчета (без сортировки)."""
+    kpi_records = KPIRecord.objects.filter(date__gte=filters['start_date'])
+    if filters['shop_ids']:
+        kpi_records = kpi_records.filter(shop_id__in=filters['shop_ids'])
+    return kpi_records
+
+
+def _report_total_count(filters):
+    """
+    Возвращает количество записей отчета по предрассчитанным агрегатам.
+
+    Количество берется из KPIRollup (несколько строк вместо COUNT(*) по
+    всему периоду) и кэшируется до следующего изменения данных KPI.
+    """
+    params = {key: filters[key] for key in ('shop_ids', 'start_date', 'end_date')}
+
+    def count():
+        rows = load_kpi_rollups(filters['start_date'], filters['end_date'], filters['shop_ids'], grain='month')
+        return sum(row['record_count'] for row in rows)
+
+    return cached_response_payload(response_cache_key('report_count', 'kpi', params), count)
+
+
+@login_required
+@use_read_replica
+def reports(request):
+    """
+    Представление для отображения страницы отчетов.
     
-    # Получаем KPI записи с фильтрацией
-    kpi_records = KPIRecord.objects.filter(
-        date__gte=start_date
-    ).select_related('shop')
-    
-    if shop_ids:
-        kpi_records = kpi_records.filter(shop_id__in=shop_ids)
-    
-    # Сортировка по дате и цеху
-    kpi_records = kpi_records.order_by('-date', 'shop__name')
-    
-    # Пагинация
-    paginator = Paginator(kpi_records, 20)  # 20 записей на страницу
-    page_obj = paginator.get_page(page_number)
+    Только аутентифицированные пользователи могут получить доступ к этой странице.
+    Отображает таблицу с отчетами. Таблица листается курсорами (параметр cursor),
+    общее количество записей считается только по запросу (параметр count=1).
     
+    Args:
+        request (HttpRequest): Объект HTTP-запроса
+        
+    Returns:
+        HttpResponse: Отрендеренный шаблон reports.html
+    """
+    filters = _parse_report_filters(request)
+
+    # Фильтрация по цехам
+    shops = Shop.objects.all()
+    if filters['shop_ids']:
+        shops = shops.filter(id__in=filters['shop_ids'])
+
+    page_obj = paginate_kpi_records(
+        _prepare_report_queryset(filters),
+        request.GET.get('cursor'),
+        REPORT_PAGE_SIZE,
+    )
+
+    show_count = request.GET.get('count') == '1'
+
+    # Параметры фильтров для ссылок навигации (без курсора)
+    filter_query = request.GET.copy()
+    filter_query.pop('cursor', None)
+    filter_query.pop('page', None)
+
     # Передаем данные в шаблон
     context = {
         'page_obj': page_obj,
+        'total_count': _report_total_count(filters) if show_count else None,
+        'show_count': show_count,
+        'filter_query': filter_query.urlencode(),
         'shops': shops,
-        'selected_period': period,
-        'selected_shops': [int(id) for id in shop_ids if id.isdigit()],
-        'selected_indicators': indicators,
+        'selected_period': filters['period'],
+        'selected_shops': filters['shop_ids'],
+        'selected_indicators': filters['indicators'],
     }
     
     return render(request, 'reports.html', context)
 
 
+@login_required
+@use_read_replica
+def reports_export(request):
+    """
+    Выгружает отчет KPI с фильтрами страницы отчетов в CSV или XLSX.
+
+    Строки читаются из базы данных порциями и передаются клиенту потоком,
+    поэтому выгрузка за год не загружается в память целиком.
+
+    Args:
+        request (HttpRequest): Объект HTTP-запроса (параметр format: csv или xlsx)
+
+    Returns:
+        StreamingHttpResponse: Файл выгрузки
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+
+    filters = _parse_report_filters(request)
+    rows = iter_report_rows(pin_read_database(_prepare_report_queryset(filters)))
+    stream = stream_csv(rows) if export_format == 'csv' else stream_xlsx(rows)
+
+    response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[export_format])
+    filename = f"kpi_report_{filters['period']}_{filters['end_date']:%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 INVENTORY_PERIOD_CHOICES = [
     ('day', 'День'),
     ('week', 'Неделя'),
@@ -314,7 +616,7 @@ def _resolve_inventory_period(period: str) -> str:
 
 
 def _inventory_period_range(period: str):
-    latest_record_date = InventoryRecord.objects.aggregate(latest=Max('date'))['latest']
+    latest_record_date = get_latest_inventory_date()
     if latest_record_date is None:
         latest_record_date = timezone.localdate()
 
@@ -342,31 +644,16 @@ def _parse_inventory_filters(request):
     category_id = int(category_id) if category_id else None
 
     shop_ids_raw = request.GET.getlist('shop')
-    shop_ids = [int(shop_id) for shop_id in shop_ids_raw if str(shop_id).isdigit()]
+    shop_ids = sorted({int(shop_id) for shop_id in shop_ids_raw if str(shop_id).isdigit()})
 
     return {
         'period': period,
         'category_id': category_id,
         'shop_ids': shop_ids,
+        'max_points': chart_max_points(request.GET.get('points')),
     }
 
 
-def _prepare_inventory_queryset(filters):
-    start_date, end_date = _inventory_period_range(filters['period'])
-
-    queryset = InventoryRecord.objects.select_related('item__category', 'shop').filter(
-        date__range=(start_date, end_date)
-    )
-
-    if filters['category_id']:
-        queryset = queryset.filter(item__category_id=filters['category_id'])
-
-    if filters['shop_ids']:
-        queryset = queryset.filter(shop_id__in=filters['shop_ids'])
-
-    return queryset, start_date, end_date
-
-
 def _number(value, digits=0):
     if value is None:
         return 0 if digits == 0 else 0.0
@@ -376,95 +663,104 @@ def _number(value, digits=0):
     return round(numeric_value, digits)
 
 
-def _compose_inventory_payload(filters):
-    queryset, start_date, end_date = _prepare_inventory_queryset(filters)
+def _inventory_rollup_end(end_date):
+    """
+    Конец диапазона для чтения агрегатов остатков.
+
+    Конец периода - последняя дата с остатками, позже нее записей нет,
+    поэтому последний месяц периода читается из агрегатов целиком, а не
+    добирается неделями и днями.
+    """
+    return bucket_end(bucket_start(end_date, 'month'), 'month')
 
-    aggregates = queryset.aggregate(
-        total_quantity=Coalesce(Sum('quantity', output_field=FloatField()), 0.0),
-        total_reserved=Coalesce(Sum('reserved', output_field=FloatField()), 0.0),
-        total_shortage=Coalesce(Sum('shortage', output_field=FloatField()), 0.0),
-        total_demand=Coalesce(Sum('demand', output_field=FloatField()), 0.0),
+
+def _inventory_item_rows(filters, start_date, end_date):
+    """
+    Суммы остатков по позициям с названиями позиций и категорий.
+
+    Суммы читаются из агрегатов InventoryRollup (load_inventory_rollups),
+    названия - отдельным запросом по справочнику позиций.
+
+    Returns:
+        dict: Количество записей и суммы полей по ID позиции
+    """
+    items = load_inventory_rollups(
+        start_date, _inventory_rollup_end(end_date), filters['category_id'], filters['shop_ids']
     )
 
-    total_available = aggregates['total_quantity'] - aggregates['total_reserved']
-    if total_available < 0:
-        total_available = 0.0
-
-    category_rows = list(
-        queryset.values('item__category__id', 'item__category__name').annotate(
-            quantity=Coalesce(Sum('quantity', output_field=FloatField()), 0.0),
-            reserved=Coalesce(Sum('reserved', output_field=FloatField()), 0.0),
-            demand=Coalesce(Sum('demand', output_field=FloatField()), 0.0),
-            shortage=Coalesce(Sum('shortage', output_field=FloatField()), 0.0),
-        ).order_by('item__category__name')
+    item_details = InventoryItem.objects.filter(id__in=items).values_list(
+        'id', 'sku', 'name', 'category_id', 'category__name'
     )
+    for item_id, sku, name, category_id, category_name in item_details:
+        items[item_id].update({
+            'sku': sku,
+            'name': name,
+            'category_id': category_id,
+            'category_name': category_name or 'Без категории',
+        })
 
-    turnover_values = []
-    inventory_by_category = []
-    shortage_by_category = []
-    turnover_by_category = []
+    return items
 
-    for entry in category_rows:
-        category_name = entry['item__category__name'] or 'Без категории'
-        quantity = float(entry['quantity'] or 0)
-        reserved = float(entry['reserved'] or 0)
-        demand = float(entry['demand'] or 0)
-        shortage = float(entry['shortage'] or 0)
-        available = max(quantity - reserved, 0)
 
-        inventory_by_category.append({
-            'name': category_name,
-            'quantity': _number(quantity),
-        })
+def _inventory_date_rows(filters, start_date, end_date):
+    """
+    Суммы остатков и дефицита по датам из дневных сумм InventoryDailyTotal.
 
-        shortage_by_category.append({
-            'name': category_name,
-            'shortage': _number(shortage),
-        })
+    Returns:
+        dict: Суммы quantity и shortage по дате
+    """
+    return load_inventory_daily_totals(start_date, end_date, filters['category_id'], filters['shop_ids'])
 
-        turnover = demand / available if available else 0
-        turnover_values.append(turnover)
-        turnover_by_category.append({
-            'name': category_name,
-            'turnover': round(turnover, 2),
-        })
 
-    trend_data = list(
-        queryset.values('date').annotate(
-            quantity=Coalesce(Sum('quantity', output_field=FloatField()), 0.0),
-            shortage=Coalesce(Sum('shortage', output_field=FloatField()), 0.0),
-        ).order_by('date')
-    )
+def _compose_inventory_payload(filters):
+    start_date, end_date = _inventory_period_range(filters['period'])
+    items = _inventory_item_rows(filters, start_date, end_date)
+    dates = _inventory_date_rows(filters, start_date, end_date)
+    return _build_inventory_payload(filters, start_date, end_date, items, dates)
 
-    trend = [
-        {
-            'date': record['date'].isoformat(),
-            'quantity': _number(record['quantity']),
-            'shortage': _number(record['shortage']),
-        }
-        for record in trend_data
-    ]
 
-    table_qs = queryset.values(
-        'item__sku',
-        'item__name',
-        'item__category__name',
-    ).annotate(
-        quantity=Coalesce(Sum('quantity', output_field=FloatField()), 0.0),
-        reserved=Coalesce(Sum('reserved', output_field=FloatField()), 0.0),
-        min_threshold=Coalesce(Avg('min_threshold', output_field=FloatField()), 0.0),
-        demand=Coalesce(Sum('demand', output_field=FloatField()), 0.0),
-        shortage=Coalesce(Sum('shortage', output_field=FloatField()), 0.0),
-    ).order_by('item__name')
+async def _acompose_inventory_payload(filters):
+    """
+    Асинхронный расчет данных страницы склада.
+
+    Суммы по позициям (таблица, итоги, категории) и по датам (тренд) -
+    независимые запросы, они выполняются одновременно в разных соединениях.
+    """
+    start_date, end_date = await sync_to_async(_inventory_period_range)(filters['period'])
+    items, dates = await _run_concurrently(
+        lambda: _inventory_item_rows(filters, start_date, end_date),
+        lambda: _inventory_date_rows(filters, start_date, end_date),
+    )
+    return _build_inventory_payload(filters, start_date, end_date, items, dates)
+
 
+def _build_inventory_payload(filters, start_date, end_date, items, dates):
+    totals = {field: 0 for field in INVENTORY_ROLLUP_FIELDS}
+    categories = {}
     table_rows = []
     deficit_positions = 0
-    for row in table_qs:
-        quantity = float(row['quantity'] or 0)
-        reserved = float(row['reserved'] or 0)
-        shortage = float(row['shortage'] or 0)
-        min_threshold = float(row['min_threshold'] or 0)
-        demand = float(row['demand'] or 0)
+
+    for item in sorted(items.values(), key=lambda entry: entry['name']):
+        for field in INVENTORY_ROLLUP_FIELDS:
+            totals[field] += item[field]
+
+        category = categories.get(item['category_id'])
+        if category is None:
+            category = categories[item['category_id']] = {
+                'name': item['category_name'],
+                'quantity': 0,
+                'reserved': 0,
+                'demand': 0,
+                'shortage': 0,
+            }
+        for field in ('quantity', 'reserved', 'demand', 'shortage'):
+            category[field] += item[field]
+
+        quantity = float(item['quantity'])
+        reserved = float(item['reserved'])
+        shortage = float(item['shortage'])
+        demand = float(item['demand'])
+        min_threshold = item['min_threshold'] / item['records'] if item['records'] else 0.0
         available = max(quantity - reserved, 0)
 
         if shortage > 0:
@@ -479,9 +775,9 @@ def _compose_inventory_payload(filters):
             status_class = 'success'
 
         table_rows.append({
-            'sku': row['item__sku'],
-            'name': row['item__name'],
-            'category': row['item__category__name'] or 'Без категории',
+            'sku': item['sku'],
+            'name': item['name'],
+            'category': item['category_name'],
             'quantity': _number(quantity),
             'reserved': _number(reserved),
             'available': _number(available),
@@ -492,6 +788,36 @@ def _compose_inventory_payload(filters):
             'status_class': status_class,
         })
 
+    total_available = max(totals['quantity'] - totals['reserved'], 0)
+
+    turnover_values = []
+    inventory_by_category = []
+    shortage_by_category = []
+    turnover_by_category = []
+
+    for category_id, entry in sorted(categories.items(), key=lambda pair: (pair[1]['name'], pair[0])):
+        available = max(entry['quantity'] - entry['reserved'], 0)
+
+        inventory_by_category.append({
+            'name': entry['name'],
+            'quantity': _number(entry['quantity']),
+        })
+
+        shortage_by_category.append({
+            'name': entry['name'],
+            'shortage': _number(entry['shortage']),
+        })
+
+        turnover = entry['demand'] / available if available else 0
+        turnover_values.append(turnover)
+        turnover_by_category.append({
+            'name': entry['name'],
+            'turnover': round(turnover, 2),
+        })
+
+    trend_grain = chart_grain(start_date, end_date, filters['max_points'])
+    trend = _inventory_trend(dates, trend_grain, filters['max_points'])
+
     average_turnover = round(sum(turnover_values) / len(turnover_values), 2) if turnover_values else 0
 
     payload = {
@@ -501,13 +827,14 @@ def _compose_inventory_payload(filters):
             'shop_ids': filters['shop_ids'],
             'date_from': start_date.isoformat(),
             'date_to': end_date.isoformat(),
+            'max_points': filters['max_points'],
         },
         'summary': {
-            'total_quantity': _number(aggregates['total_quantity']),
-            'total_reserved': _number(aggregates['total_reserved']),
+            'total_quantity': _number(totals['quantity']),
+            'total_reserved': _number(totals['reserved']),
             'total_available': _number(total_available),
-            'total_value': _number(aggregates['total_demand']),
-            'total_shortage': _number(aggregates['total_shortage']),
+            'total_value': _number(totals['demand']),
+            'total_shortage': _number(totals['shortage']),
             'deficit_positions': deficit_positions,
             'average_turnover': average_turnover,
         },
@@ -515,6 +842,7 @@ def _compose_inventory_payload(filters):
             'inventory_by_category': inventory_by_category,
             'shortage_by_category': shortage_by_category,
             'inventory_trend': trend,
+            'inventory_trend_grain': trend_grain,
             'turnover_by_category': turnover_by_category,
         },
         'table': {
@@ -525,10 +853,66 @@ def _compose_inventory_payload(filters):
     return payload
 
 
+def _inventory_trend(dates, grain, max_points):
+    """
+    Ряд тренда остатков и дефицита по датам.
+
+    Остатки - значения на дату, поэтому точка недели или месяца - среднее
+    по дням интервала с данными. Ряд длиннее max_points прореживается
+    по остаткам (LTTB), дефицит берется в тех же точках.
+
+    Args:
+        dates (dict): Суммы остатков и дефицита по дате
+        grain (str): Гранулярность ряда (chart_grain)
+        max_points (int): Лимит точек
+
+    Returns:
+        list: Точки {'date', 'quantity', 'shortage'} по возрастанию дат
+    """
+    buckets = {}
+    for day, values in sorted(dates.items()):
+        bucket = buckets.setdefault(bucket_start(day, grain), [0, 0, 0])
+        bucket[0] += values['quantity']
+        bucket[1] += values['shortage']
+        bucket[2] += 1
+
+    days = list(buckets)
+    quantities = [float(quantity) / count for quantity, _, count in buckets.values()]
+    shortages = [float(shortage) / count for _, shortage, count in buckets.values()]
+    selected = lttb_indices([day.toordinal() for day in days], quantities, max_points)
+    return [
+        {
+            'date': days[index].isoformat(),
+            'quantity': _number(quantities[index]),
+            'shortage': _number(shortages[index]),
+        }
+        for index in selected
+    ]
+
+
+def _inventory_cache_key(filters):
+    return response_cache_key('inventory_payload', 'inventory', filters)
+
+
+def _cached_inventory_payload(filters):
+    return cached_response_payload(
+        _inventory_cache_key(filters),
+        lambda: _compose_inventory_payload(filters),
+    )
+
+
+def _inventory_data_etag(cache_key, columnar=False):
+    # ETag зависит только от фильтров, версии данных склада и вида ответа,
+    # поэтому 304 отдается без расчета данных
+    etag = cache_key.rsplit(':', 2)[-2] + '-' + cache_key.rsplit(':', 1)[-1]
+    return quote_etag(etag + '-columnar' if columnar else etag)
+
+
 @login_required
+@use_read_replica
 def inventory(request):
     filters = _parse_inventory_filters(request)
-    inventory_data = _compose_inventory_payload(filters)
+    inventory_data = _cached_inventory_payload(filters)
 
     categories = InventoryCategory.objects.order_by('name')
     shops = Shop.objects.order_by('name')
@@ -545,11 +929,93 @@ def inventory(request):
     return render(request, 'inventory.html', context)
 
 
-@login_required
-def inventory_data(request):
+@_async_login_required
+@use_read_replica
+async def inventory_data(request):
     filters = _parse_inventory_filters(request)
-    payload = _compose_inventory_payload(filters)
-    return JsonResponse(payload, json_dumps_params={'ensure_ascii': False})
+    columnar = wants_columnar(request)
+    cache_key = await sync_to_async(_inventory_cache_key)(filters)
+    etag = _inventory_data_etag(cache_key, columnar)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    payload = await acached_response_payload(cache_key, lambda: _acompose_inventory_payload(filters))
+    response = FastJsonResponse(columnar_inventory_payload(payload) if columnar else payload)
+    response['ETag'] = etag
+    # Браузер хранит ответ, но перепроверяет его по ETag при каждом запросе
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _ingest_user(request):
+    """
+    Возвращает пользователя запроса загрузки: пользователя сессии или
+    пользователя из заголовка Authorization (Basic) для внешних систем.
+    """
+    if request.user.is_authenticated:
+        return request.user
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+@csrf_exempt
+@require_POST
+def ingest(request, target):
+    """
+    Загрузка пакета записей KPI или остатков (NDJSON или CSV).
+
+    Строки записываются с обновлением существующих записей по ключу (см.
+    dashboard/ingest.py), в ответе - статистика загрузки и ошибки строк.
+    Проверка CSRF отключена для внешних систем; тело принимается только с
+    типом NDJSON или CSV, который браузер не отправит с другого сайта без
+    предварительного запроса.
+
+    Args:
+        request (HttpRequest): POST-запрос с телом NDJSON или CSV
+        target (str): 'kpi' или 'inventory'
+    """
+    if target not in INGEST_TARGETS:
+        return JsonResponse({'error': 'Неизвестный тип записей'}, status=404)
+
+    user = _ingest_user(request)
+    if user is None:
+        response = JsonResponse({'error': 'Требуется авторизация'}, status=401)
+        response['WWW-Authenticate'] = 'Basic realm="ingest"'
+        return response
+    model = INGEST_TARGETS[target].model._meta
+    if not user.has_perms([f'{model.app_label}.add_{model.model_name}', f'{model.app_label}.change_{model.model_name}']):
+        return JsonResponse({'error': 'Недостаточно прав для загрузки записей'}, status=403)
+
+    payload_format = INGEST_CONTENT_TYPES.get(request.content_type)
+    if payload_format is None:
+        return JsonResponse(
+            {'error': f'Тип содержимого должен быть одним из: {", ".join(INGEST_CONTENT_TYPES)}'},
+            status=415,
+        )
+
+    try:
+        # Тело читается потоково, без ограничения DATA_UPLOAD_MAX_MEMORY_SIZE
+        rows = read_rows(request, payload_format)
+    except IngestError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    stats = ingest_rows(target, rows)
+    status = 400 if stats['rejected'] and not stats['upserted'] else 200
+    return JsonResponse(stats, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+# Префиксы полей формы источников данных на странице настроек
+DATA_SOURCE_FORM_PREFIXES = {
+    '1c': 'source_1c',
+    'access': 'source_access',
+}
 
 
 @login_required
@@ -673,23 +1139,28 @@ def settings(request):
                 messages.success(request, f'Группа {name} успешно удалена.')
 
             elif action == 'save_data_sources':
-                data_sources_payload = {
-                    'source_1c': {
-                        'enabled': request.POST.get('source_1c_enabled') == 'on',
-                        'path': request.POST.get('source_1c_path', '').strip(),
-                        'schedule': request.POST.get('source_1c_schedule', 'daily'),
-                        'last_sync': request.POST.get('source_1c_last_sync', '').strip(),
-                    },
-                    'source_access': {
-                        'enabled': request.POST.get('source_access_enabled') == 'on',
-                        'path': request.POST.get('source_access_path', '').strip(),
-                        'password': request.POST.get('source_access_password', '').strip(),
-                        'last_sync': request.POST.get('source_access_last_sync', '').strip(),
-                    },
-                }
-
-                request.session['data_sources'] = data_sources_payload
-                request.session.modified = True
+                # Настройки хранятся в DataSource: по ним работает sync_data_sources
+                schedules = {code for code, _ in DataSource.SCHEDULE_CHOICES}
+                for kind, prefix in DATA_SOURCE_FORM_PREFIXES.items():
+                    source, _ = DataSource.objects.get_or_create(kind=kind)
+                    path = request.POST.get(f'{prefix}_path', '').strip()
+                    if path != source.path:
+                        # Новый файл читается с начала
+                        source.sync_position = 0
+                        source.sync_signature = ''
+                    source.enabled = request.POST.get(f'{prefix}_enabled') == 'on'
+                    source.path = path
+                    schedule = request.POST.get(f'{prefix}_schedule', source.schedule)
+                    if schedule in schedules:
+                        source.schedule = schedule
+                    # Пароль не выводится в форму: пустое поле оставляет сохраненный
+                    password = request.POST.get(f'{prefix}_password', '').strip()
+                    if password:
+                        source.password = password
+                    elif request.POST.get(f'{prefix}_password_clear') == 'on':
+                        source.password = ''
+                    source.save()
+
                 messages.success(request, 'Настройки источников данных сохранены.')
 
             else:
@@ -706,20 +1177,18 @@ def settings(request):
     users = User.objects.prefetch_related('groups').order_by('username')
     groups = Group.objects.prefetch_related('user_set', 'permissions').order_by('name')
     permissions = Permission.objects.select_related('content_type').order_by('content_type__app_label', 'codename')
-    data_sources = request.session.get('data_sources', {
-        'source_1c': {
-            'enabled': True,
-            'path': '',
-            'schedule': 'daily',
-            'last_sync': '',
-        },
-        'source_access': {
-            'enabled': False,
-            'path': '',
-            'password': '',
-            'last_sync': '',
-        },
-    })
+    sources = {source.kind: source for source in DataSource.objects.all()}
+    data_sources = {}
+    for kind, prefix in DATA_SOURCE_FORM_PREFIXES.items():
+        source = sources.get(kind) or DataSource(kind=kind, enabled=kind == '1c')
+        data_sources[prefix] = {
+            'enabled': source.enabled,
+            'path': source.path,
+            'schedule': source.schedule,
+            'password_set': bool(source.password),
+            'last_sync': timezone.localtime(source.last_sync_at).strftime('%d.%m.%Y %H:%M') if source.last_sync_at else '',
+        }
+    sync_runs = DataSyncRun.objects.select_related('source').order_by('-started_at')[:10]
 
     permissions_by_app = []
     last_key = None
@@ -755,18 +1224,25 @@ def settings(request):
         'permissions_by_app': permissions_by_app,
         'db_path': db_path,
         'db_size': db_size_formatted,
+        'data_sources': data_sources,
+        'sync_runs': sync_runs,
     }
 
     return render(request, 'settings.html', context)
 
 
+# Количество последних срабатываний на странице уведомлений
+ALERT_HISTORY_SIZE = 50
+
+
 @login_required
 def alerts(request):
     """
     Представление для отображения страницы уведомлений.
     
     Только аутентифицированные пользователи могут получить доступ к этой странице.
-    Отображает настройки порогов и историю уведомлений.
+    Отображает настройки порогов и историю уведомлений. Новый порог
+    сохраняется POST-запросом и сразу проверяется по записям KPI.
     
     Args:
         request (HttpRequest): Объект HTTP-запроса
@@ -774,8 +1250,38 @@ def alerts(request):
     Returns:
         HttpResponse: Отрендеренный шаблон alerts.html
     """
-    # TODO: Реализовать страницу уведомлений
-    return render(request, 'alerts.html')
+    # Сохранение нового порога и проверка его по имеющимся данным
+    if request.method == 'POST':
+        indicator = request.POST.get('indicator')
+        condition = request.POST.get('condition')
+        try:
+            threshold = float(request.POST.get('threshold', '').replace(',', '.'))
+        except ValueError:
+            messages.error(request, 'Укажите числовое пороговое значение.')
+            return redirect('alerts')
+
+        if indicator not in dict(AlertRule.INDICATOR_CHOICES) or condition not in dict(AlertRule.CONDITION_CHOICES):
+            messages.error(request, 'Выберите показатель и условие из списка.')
+            return redirect('alerts')
+
+        rule = AlertRule.objects.create(
+            indicator=indicator,
+            condition=condition,
+            threshold=threshold,
+            notify_in_app=bool(request.POST.get('notify_in_app')),
+            notify_email=bool(request.POST.get('notify_email')),
+        )
+        stats = evaluate_alert_rules([rule], incremental=True)
+        messages.success(request, f'Порог «{rule}» сохранен. Срабатываний по имеющимся данным: {stats["created"]}.')
+        return redirect('alerts')
+
+    context = {
+        'rules': AlertRule.objects.all(),
+        'events': AlertEvent.objects.select_related('rule', 'shop').order_by('-date', 'shop')[:ALERT_HISTORY_SIZE],
+        'indicator_choices': AlertRule.INDICATOR_CHOICES,
+        'condition_choices': AlertRule.CONDITION_CHOICES,
+    }
+    return render(request, 'alerts.html', context)
 
 
 @login_required
@@ -794,3 +1300,31 @@ def profile(request):
     """
     # TODO: Реализовать личный кабинет пользователя
     return render(request, 'profile.html')
+
+
+def metrics(request):
+    """
+    Метрики запросов к представлениям в текстовом формате Prometheus.
+    
+    Доступны персоналу или по заголовку Authorization: Bearer с токеном
+    REQUEST_METRICS_TOKEN (для сборщика метрик). Гистограммы накапливаются
+    в каждом процессе отдельно (dashboard/metrics.py).
+    
+    Args:
+        request (HttpRequest): Объект HTTP-запроса
+        
+    Returns:
+        HttpResponse: Метрики text/plain или 403
+    """
+    # Имя settings в модуле занято представлением страницы настроек
+    from django.conf import settings
+    
+    token = settings.REQUEST_METRICS_TOKEN
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    # Заголовок может содержать не-ASCII символы: compare_digest сравнивает их только как байты
+    authorized = bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        credentials.strip().encode('utf-8'), token.encode('utf-8')
+    )
+    if not (authorized or request.user.is_staff):
+        return HttpResponse('Доступ запрещен', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
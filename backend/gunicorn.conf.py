@@ -0,0 +1,44 @@
+"""
+Настройки gunicorn для production-запуска (init.sh при DEBUG=0).
+
+Файл читается gunicorn автоматически из текущего каталога. Все параметры
+задаются переменными окружения:
+
+    WEB_BIND              адрес и порт (0.0.0.0:8000)
+    WEB_WORKERS           количество процессов (2 * CPU + 1)
+    WEB_WORKER_CLASS      класс воркера: uvicorn (ASGI, по умолчанию) или gthread (WSGI)
+    WEB_THREADS           потоков в процессе для gthread (4)
+    WEB_KEEPALIVE         ожидание следующего запроса keep-alive, секунды (5)
+    WEB_TIMEOUT           время ответа воркера до перезапуска, секунды (60)
+    WEB_MAX_REQUESTS      перезапуск процесса после N запросов (1000, 0 - без перезапуска)
+"""
+import multiprocessing
+import os
+
+
+# Классы воркеров: ASGI нужен для асинхронных представлений и потока изменений дашборда
+WORKER_CLASSES = {
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+    'gthread': 'gthread',
+}
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = WORKER_CLASSES[os.environ.get('WEB_WORKER_CLASS', 'uvicorn')]
+threads = int(os.environ.get('WEB_THREADS', 4))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+
+# Плавный перезапуск процессов ограничивает рост памяти; разброс не дает
+# всем процессам перезапуститься одновременно
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Приложение загружается до запуска воркеров: процессы делят память кода
+preload_app = True
+
+wsgi_app = 'backend.asgi:application' if worker_class != 'gthread' else 'backend.wsgi:application'
+
+accesslog = '-'
+errorlog = '-'
@@ -174,6 +174,7 @@ function fetchInventoryData(form, endpoint, applyButton) {
     }
 
     const params = new URLSearchParams(new FormData(form));
+    params.set('format', 'columnar');
 
     if (applyButton) {
         applyButton.disabled = true;
@@ -192,7 +193,7 @@ function fetchInventoryData(form, endpoint, applyButton) {
             return response.json();
         })
         .then(data => {
-            renderInventoryData(data);
+            renderInventoryData(decodeColumnarPayload(data));
             showToast('Данные обновлены', 'success');
         })
         .catch(() => {
@@ -206,6 +207,54 @@ function fetchInventoryData(form, endpoint, applyButton) {
         });
 }
 
+// Восстанавливает колоночный ответ (format=columnar, dashboard/payloads.py)
+// в исходный вид: колонки - в список объектов, ряды с общей осью - в объекты
+// {подпись: значение}
+function decodeColumnarPayload(payload) {
+    if (!payload || payload.format !== 'columnar') {
+        return payload;
+    }
+
+    const decode = value => {
+        if (Array.isArray(value) || value === null || typeof value !== 'object') {
+            return value;
+        }
+        if (Array.isArray(value.columns) && Array.isArray(value.values)) {
+            const length = value.values.length ? value.values[0].length : 0;
+            return Array.from({ length }, (_, row) => {
+                const item = {};
+                value.columns.forEach((column, index) => {
+                    item[column] = value.values[index][row];
+                });
+                return item;
+            });
+        }
+        if (Array.isArray(value.groups)) {
+            const series = {};
+            value.groups.forEach(group => {
+                Object.entries(group.series).forEach(([name, values]) => {
+                    series[name] = {};
+                    group.axis.forEach((label, index) => {
+                        if (values[index] !== null) {
+                            series[name][label] = values[index];
+                        }
+                    });
+                });
+            });
+            return series;
+        }
+        const decoded = {};
+        Object.entries(value).forEach(([key, item]) => {
+            decoded[key] = decode(item);
+        });
+        return decoded;
+    };
+
+    const decoded = decode(payload);
+    delete decoded.format;
+    return decoded;
+}
+
 function renderInventoryData(data) {
     if (!data) {
         return;
@@ -1110,6 +1159,12 @@ function updateDashboardData() {
     
     selectedShops.forEach(shop => params.append('shop', shop));
     
+    // Лимит точек графиков сохраняется из адреса страницы
+    const points = new URLSearchParams(window.location.search).get('points');
+    if (points) {
+        params.set('points', points);
+    }
+    
     // Добавляем индикаторы только если они отличаются от всех выбранных
     const allIndicators = ['output', 'downtime', 'defect', 'load'];
     if (JSON.stringify(indicators.sort()) !== JSON.stringify(allIndicators.sort())) {
@@ -1119,8 +1174,12 @@ function updateDashboardData() {
     // Формируем новый URL
     const newUrl = params.toString() ? url + '?' + params.toString() : url;
     
+    // Ряды графиков запрашиваются колонками, адрес страницы остается прежним
+    const dataParams = new URLSearchParams(params);
+    dataParams.set('format', 'columnar');
+    
     // Добавляем заголовок для AJAX-запроса
-    fetch(newUrl, {
+    fetch(url + '?' + dataParams.toString(), {
         headers: {
             'X-Requested-With': 'XMLHttpRequest'
         }
@@ -1131,15 +1190,21 @@ function updateDashboardData() {
             }
             return response.json();
         })
+        .then(decodeColumnarPayload)
         .then(data => {
             // Обновляем KPI-карточки
-            document.querySelector('.kpi-cards').innerHTML = data.kpi_cards_html;
+            updateKpiCards(data.kpi);
             
             // Обновляем графики с новыми данными
             if (window.updateChartsWithData) {
                 window.updateChartsWithData(data.chart_data);
             }
             
+            // Переподключаем поток изменений под новые фильтры
+            if (window.startLiveUpdates) {
+                window.startLiveUpdates(data.live_position);
+            }
+            
             // Обновляем URL без перезагрузки
             window.history.pushState({}, '', newUrl);
             
@@ -1157,6 +1222,27 @@ function updateDashboardData() {
         });
 }
 
+// Подставляет значения KPI в карточки (partials/kpi_cards.html): элемент
+// с data-kpi получает значение поля, форматированное как в шаблоне
+function updateKpiCards(kpi) {
+    if (!kpi) {
+        return;
+    }
+    
+    document.querySelectorAll('.kpi-cards [data-kpi]').forEach(element => {
+        const value = kpi[element.dataset.kpi];
+        if (value === undefined || value === null) {
+            return;
+        }
+        if (element.dataset.kpiFormat === 'integer') {
+            element.textContent = String(Math.round(value));
+        } else {
+            // Средние значения - дробные числа: 80 выводится как 80.0
+            element.textContent = Number.isInteger(value) ? value.toFixed(1) : String(value);
+        }
+    });
+}
+
 // Показываем индикатор загрузки
 function showLoadingIndicator() {
     // Создаем оверлей с индикатором загрузки
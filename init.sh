@@ -1,9 +1,16 @@
 #!/bin/bash
 # Скрипт инициализации для Docker
+set -e
+
+# Команды управления запускаются из каталога с manage.py
+cd "$(dirname "$0")/backend"
 
 echo "Применение миграций..."
 python manage.py migrate
 
+echo "Создание таблицы общего кэша..."
+python manage.py createcachetable
+
 echo "Заполнение базы данных фейковыми данными..."
 python manage.py fill_fake_data
 
@@ -13,5 +20,13 @@ python manage.py setup_roles
 echo "Создание суперпользователя..."
 python manage.py shell < ../create_superuser.py
 
-echo "Запуск сервера разработки..."
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+if [ "${DEBUG:-1}" = "1" ]; then
+    echo "Запуск сервера разработки..."
+    exec python manage.py runserver 0.0.0.0:8000
+fi
+
+echo "Сборка статических файлов..."
+python manage.py collectstatic --noinput
+
+echo "Запуск сервера приложения (gunicorn, настройки в gunicorn.conf.py)..."
+exec gunicorn
\ No newline at end of file